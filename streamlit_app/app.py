@@ -26,6 +26,7 @@ with col1:
         - 📄 **Bio** – a short professional profile + highlights  
         - 📊 **Charts Gallery** – exploratory data analysis with multiple chart types  
         - 📈 **Dashboard** – interactive filters, KPIs, and linked visuals  
+        - 📉 **Trends** – cohort trends and short forecasts (datasets with a year column)  
         - 🧭 **Future Work** – roadmap & reflections
 
         """
@@ -48,7 +49,7 @@ st.markdown(
     """
     ### How to Navigate
 
-    - Use the **sidebar or the 'Pages' menu** to switch between Bio, Charts Gallery, Dashboard, and Future Work.
+    - Use the **sidebar or the 'Pages' menu** to switch between Bio, Charts Gallery, Dashboard, Trends, and Future Work.
     - On the **Charts Gallery** page, each chart includes:
       - A question it answers  
       - A “How to read this chart” explainer  
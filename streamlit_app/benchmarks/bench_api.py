@@ -0,0 +1,169 @@
+# benchmarks/bench_api.py
+"""
+Load test of the JSON KPI API (core/api.py): requests and queries per second.
+
+Starts ``python -m core.api`` on a free local port (or targets ``--url``), then runs
+each scenario for ``--seconds`` with ``--clients`` client threads:
+  - get           : one Dashboard-style query per GET, connection kept alive
+  - get-reconnect : the same, opening a new connection for every request
+  - batch-N       : N queries per POST, connection kept alive
+Queries are random filter selections over the dataset's filter values and score
+range; every response is checked for status 200 and one result per query.
+Reports requests/s, queries/s and the median and 99th-percentile latency.
+
+Run from the streamlit_app folder:
+    python benchmarks/bench_api.py --clients 8 --batch 10 100
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from core.data import CSV_PATH
+from core.registry import inspect_csv
+
+
+def random_query(rng, values, score_range):
+    categories = {col: rng.sample(options, rng.randint(0, len(options))) for col, options in values.items()}
+    low = rng.randint(*score_range)
+    return {"categories": categories, "range": [low, rng.randint(low, score_range[1])]}
+
+
+def get_path(dataset, query):
+    params = [("dataset", dataset)] + [(col, v) for col, vs in query["categories"].items() for v in vs]
+    params += [("min", query["range"][0]), ("max", query["range"][1])]
+    return "/api/kpis?" + urlencode(params)
+
+
+def request(conn, method, path, body=None):
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    payload = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{method} {path[:80]} -> {response.status}: {payload[:200]!r}")
+    return json.loads(payload)
+
+
+def client(url, scenario, batch, dataset, values, score_range, deadline, seed, out):
+    rng = random.Random(seed)
+    host = urlsplit(url)
+    latencies, queries = [], 0
+    conn = http.client.HTTPConnection(host.hostname, host.port)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        if scenario == "batch":
+            batch_queries = [random_query(rng, values, score_range) for _ in range(batch)]
+            body = json.dumps({"dataset": dataset, "queries": batch_queries}).encode("utf-8")
+            result = request(conn, "POST", "/api/kpis", body)
+        else:
+            if scenario == "get-reconnect":
+                conn.close()
+                conn = http.client.HTTPConnection(host.hostname, host.port)
+            result = request(conn, "GET", get_path(dataset, random_query(rng, values, score_range)))
+        latencies.append(time.perf_counter() - start)
+        expected = batch if scenario == "batch" else 1
+        if len(result["results"]) != expected:
+            raise RuntimeError(f"Expected {expected} results, got {len(result['results'])}.")
+        queries += expected
+    conn.close()
+    out.append((latencies, queries))
+
+
+def run(url, scenario, batch, clients, seconds, dataset, values, score_range):
+    out, deadline = [], time.perf_counter() + seconds
+    threads = [
+        threading.Thread(target=client, args=(url, scenario, batch, dataset, values, score_range, deadline, i, out))
+        for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = np.concatenate([np.asarray(lat) for lat, _ in out]) * 1000
+    return {
+        "requests/s": len(latencies) / elapsed,
+        "queries/s": sum(q for _, q in out) / elapsed,
+        "p50 ms": float(np.percentile(latencies, 50)),
+        "p99 ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def wait_until_up(url, timeout=60):
+    host = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host.hostname, host.port, timeout=5)
+            request(conn, "GET", "/api/health")
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"The API at {url} did not come up within {timeout} s.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="an API that is already running (default: start one)")
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--csv", default=str(CSV_PATH), help="dataset to query (its name is the file stem)")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--batch", type=int, nargs="+", default=[10, 100])
+    args = parser.parse_args()
+
+    info = inspect_csv(args.csv)
+    sample = pd.read_csv(info.path, usecols=info.filters + [info.primary_score], nrows=100_000)
+    values = {col: sorted(sample[col].dropna().astype(str).unique()) for col in info.filters}
+    score_range = (int(sample[info.primary_score].min()), int(sample[info.primary_score].max()))
+
+    server = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        data_dir = str(Path(args.csv).resolve().parent)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "core.api", "--port", str(args.port)],
+            cwd=Path(__file__).resolve().parent.parent,
+            env={**os.environ, "APP_DATA_DIR": data_dir},
+            stdout=subprocess.DEVNULL,
+        )
+    try:
+        wait_until_up(url)
+        # The first query loads the dataset; not part of the measurement.
+        conn = http.client.HTTPConnection(urlsplit(url).hostname, urlsplit(url).port)
+        warm = request(conn, "GET", get_path(info.name, {"categories": {}, "range": list(score_range)}))
+        conn.close()
+        print(f"{url} • {info.name}: {warm['rows']:,} rows • {args.clients} clients • {args.seconds:g} s per scenario")
+        print(f"{'scenario':>14} {'requests/s':>11} {'queries/s':>11} {'p50 ms':>8} {'p99 ms':>8}")
+        scenarios = [("get", 1), ("get-reconnect", 1)] + [("batch", size) for size in args.batch]
+        for scenario, batch in scenarios:
+            stats = run(url, scenario, batch, args.clients, args.seconds, info.name, values, score_range)
+            label = f"batch-{batch}" if scenario == "batch" else scenario
+            print(
+                f"{label:>14} {stats['requests/s']:11.0f} {stats['queries/s']:11.0f} "
+                f"{stats['p50 ms']:8.2f} {stats['p99 ms']:8.2f}"
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_load.py
+"""
+Cold vs warm load time: plain CSV parsing vs the typed columnar sidecar.
+
+Builds a StudentsPerformance-schema CSV of the requested size with the synthetic
+generator (core/synthetic.py), then times:
+  - csv (default dtypes) : the original pd.read_csv(...) path
+  - csv (typed)          : read_typed_csv, no sidecar
+  - sidecar cold         : load_typed with no sidecar (parse + write sidecar)
+  - sidecar warm         : load_typed with a fresh sidecar (memory-mapped read)
+
+Run from the streamlit_app folder:
+    python benchmarks/bench_load.py --rows 1000000
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+
+from core import columnar
+from core.data import load_typed, read_typed_csv
+from core.synthetic import write_dataset
+
+
+def make_csv(rows, folder, seed=0):
+    return write_dataset(Path(folder) / f"students_{rows}.csv", rows, seed=seed)["csv"]
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_load_")
+    try:
+        path = make_csv(args.rows, folder)
+        size_mb = path.stat().st_size / 1e6
+
+        def cold():
+            shutil.rmtree(columnar.sidecar_dir(path), ignore_errors=True)
+            load_typed(path)
+
+        results = {
+            "csv (default dtypes)": best_of(lambda: pd.read_csv(path), args.repeat),
+            "csv (typed)": best_of(lambda: read_typed_csv(path), args.repeat),
+            "sidecar cold": best_of(cold, args.repeat),
+            "sidecar warm": best_of(lambda: load_typed(path), args.repeat),
+        }
+
+        print(f"{args.rows:,} rows, {size_mb:.1f} MB CSV (best of {args.repeat})")
+        baseline = results["csv (default dtypes)"]
+        for name, seconds in results.items():
+            print(f"  {name:<22} {seconds * 1000:9.1f} ms   {baseline / seconds:6.1f}x")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
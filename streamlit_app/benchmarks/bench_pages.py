@@ -0,0 +1,277 @@
+# benchmarks/bench_pages.py
+"""
+Headless page benchmark: script-pass latency, peak RSS and figure payload bytes.
+
+Runs app.py, the Dashboard and the Charts Gallery with ``streamlit.testing.v1.AppTest``
+against synthetic StudentsPerformance-schema datasets of each requested size, and
+replays a fixed set of widget interactions per page. Widget changes inside a
+``@st.fragment(key=...)`` rerun only that fragment, as they would in the browser.
+Every step records:
+
+  - rerun          : "full" (whole script) or "fragment"
+  - wall_ms        : time for the script pass (AppTest.run)
+  - cpu_ms         : process CPU time for the pass (server work, all threads)
+  - peak_rss_mb    : peak resident set size during the step (Linux: VmHWM after
+                     resetting it through /proc/self/clear_refs; elsewhere the
+                     process-wide ru_maxrss)
+  - payload_bytes  : total size of the Plotly figure specs the pass emitted
+
+Results are written as JSON (with the git commit) so runs can be compared:
+
+    python benchmarks/bench_pages.py --sizes 1000 100000 --output before.json
+    python benchmarks/bench_pages.py --sizes 1000 100000 --compare before.json
+
+Run from the streamlit_app folder. The default sizes include 1M and 10M rows, which
+need several GB of RAM and a few minutes to generate.
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000, 10_000_000]
+TIMEOUT_SECONDS = 1800
+
+
+# ---------- Synthetic data ----------
+def write_dataset(rows, folder, seed=0):
+    """Writes ``students_<rows>.csv`` from the synthetic generator (core/synthetic.py)."""
+    # Imported here: core reads APP_DATA_DIR at import, which main() points at ``folder``.
+    from core.data import read_typed_csv
+    from core.synthetic import SyntheticModel, write_dataset as write_synthetic
+
+    model = SyntheticModel.fit(read_typed_csv(APP_DIR / "data" / "StudentsPerformance.csv"))
+    return write_synthetic(Path(folder) / f"students_{rows}.csv", rows, seed=seed, model=model)["csv"]
+
+
+# ---------- Measurement ----------
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KB on Linux, bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 / 1024
+
+
+def payload_bytes(at):
+    return sum(len(el.proto.spec) for el in at.get("plotly_chart"))
+
+
+def measure(at, action):
+    if isinstance(action, Interaction):
+        action.prepare()
+    reset_peak_rss()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    scope = action()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return {
+        "rerun": scope if isinstance(scope, str) else "full",
+        "wall_ms": round(wall * 1000, 2),
+        "cpu_ms": round(cpu * 1000, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "payload_bytes": payload_bytes(at),
+    }
+
+
+# ---------- Scenarios ----------
+def _first(widgets, label_start):
+    return next(w for w in widgets if w.label.startswith(label_start))
+
+
+def rerun(at, fragment=None):
+    """
+    Reruns after a widget change the way the browser would: only ``fragment`` when the
+    page declares ``@st.fragment(key=fragment)``, the whole script otherwise. AppTest
+    always runs the whole script, so the fragment id is injected into its rerun request.
+    """
+    from streamlit.testing.v1 import local_script_runner
+
+    ids = at._fragment_storage._ids_by_target_key.get(fragment) if fragment else None
+    if not ids:
+        at.run()
+        return "full"
+    rerun_data = functools.partial(local_script_runner.RerunData, fragment_id=next(iter(ids)))
+    with mock.patch.object(local_script_runner, "RerunData", rerun_data):
+        at.run()
+    return "fragment"
+
+
+class Interaction:
+    """Sets ``widget`` to ``value`` (untimed), then reruns (timed) as the browser would."""
+
+    def __init__(self, at, widget, value, fragment=None):
+        self.at = at
+        self.widget = widget
+        self.value = value
+        self.fragment = fragment
+
+    def prepare(self):
+        try:
+            widget = self.widget()
+        except (IndexError, StopIteration):
+            # After a fragment rerun AppTest's element tree only holds that fragment's
+            # elements; a full run restores the rest of the page.
+            self.at.run()
+            widget = self.widget()
+        widget.set_value(self.value)
+
+    def __call__(self):
+        return rerun(self.at, self.fragment)
+
+
+def dashboard_steps(at):
+    fragment = "dashboard_filtered"
+    return [
+        ("first run", at.run),
+        ("rerun", at.run),
+        ("gender filter", Interaction(at, lambda: _first(at.multiselect, "Select gender"), ["female"], fragment)),
+        ("test prep filter", Interaction(at, lambda: _first(at.multiselect, "Select test prep"), ["none"], fragment)),
+        ("math range slider", Interaction(at, lambda: _first(at.slider, "Filter by"), (40, 80), fragment)),
+        ("heatmap toggle", Interaction(at, lambda: at.toggle[0], True, fragment)),
+    ]
+
+
+def gallery_steps(at):
+    return [
+        ("first run", at.run),
+        ("rerun", at.run),
+        ("bins slider", Interaction(at, lambda: at.slider[0], 35, "gallery_histogram")),
+        ("heatmap toggle", Interaction(at, lambda: at.toggle[0], True, "gallery_scatter")),
+    ]
+
+
+def home_steps(at):
+    return [("first run", at.run), ("rerun", at.run)]
+
+
+PAGES = {
+    "app.py": ("app.py", home_steps),
+    "dashboard": ("pages/📈_Dashboard.py", dashboard_steps),
+    "gallery": ("pages/ 📊_Charts_Gallery.py", gallery_steps),
+}
+
+
+def run_page(page, dataset):
+    from streamlit.testing.v1 import AppTest
+
+    script, steps = PAGES[page]
+    at = AppTest.from_file(str(APP_DIR / script), default_timeout=TIMEOUT_SECONDS)
+    at.session_state["dataset"] = dataset
+    results = []
+    for name, action in steps(at):
+        results.append({"page": page, "step": name, **measure(at, action)})
+    return results
+
+
+# ---------- Reporting ----------
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True
+        )
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_table(results, baseline=None):
+    previous = {}
+    if baseline:
+        previous = {(r["rows"], r["page"], r["step"]): r for r in baseline["results"]}
+    print(
+        f"{'rows':>10}  {'page':<10} {'step':<18} {'rerun':<9} {'wall':>10} {'cpu':>10} "
+        f"{'peak RSS':>10} {'payload':>10}"
+    )
+    for r in results:
+        line = (
+            f"{r['rows']:>10,}  {r['page']:<10} {r['step']:<18} {r.get('rerun', 'full'):<9} "
+            f"{r['wall_ms']:8.1f}ms {r.get('cpu_ms', float('nan')):8.1f}ms "
+            f"{r['peak_rss_mb']:8.0f}MB {r['payload_bytes'] / 1024:8.1f}KB"
+        )
+        old = previous.get((r["rows"], r["page"], r["step"]))
+        if old and old["wall_ms"]:
+            line += f"   wall {r['wall_ms'] / old['wall_ms']:.2f}x"
+            if old.get("cpu_ms"):
+                line += f", cpu {r['cpu_ms'] / old['cpu_ms']:.2f}x"
+            if old.get("payload_bytes"):
+                line += f", payload {r['payload_bytes'] / old['payload_bytes']:.2f}x"
+            line += f" of {baseline.get('commit')}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--pages", nargs="+", choices=list(PAGES), default=list(PAGES))
+    parser.add_argument("--output", default="bench_pages.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare times and payloads with")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_pages_")
+    # The registry reads APP_DATA_DIR at import, so set it before core is imported.
+    os.environ["APP_DATA_DIR"] = folder
+    try:
+        results = []
+        for rows in args.sizes:
+            path = write_dataset(rows, folder)
+            for page in args.pages:
+                for result in run_page(page, path.stem):
+                    results.append({"rows": rows, **result})
+            print(f"done: {rows:,} rows", file=sys.stderr)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "versions": {
+            name: __import__(name).__version__ for name in ("streamlit", "pandas", "numpy", "plotly")
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=1)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+    print_table(results, baseline)
+    print(f"\nSaved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
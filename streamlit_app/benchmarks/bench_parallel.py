@@ -0,0 +1,77 @@
+# benchmarks/bench_parallel.py
+"""
+Serial vs process-pool execution of the per-row work (core/parallel.py).
+
+For each worker count, times on a synthetic StudentsPerformance-schema frame:
+  - summarize : KPI cube + aggregate store over every row (what a dataset load does)
+  - mask      : a Dashboard-style filter mask (gender, test prep, math range)
+Worker count 0 is the serial path. The pool is started and warmed up before timing,
+and every result is checked against pandas.
+
+Run from the streamlit_app folder:
+    python benchmarks/bench_parallel.py --rows 10000000 --workers 0 4 8 16 32
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from core.data import CSV_PATH
+from core.parallel import ParallelBackend
+from core.registry import inspect_csv
+from core.synthetic import generate_frame
+
+CATEGORIES = {"gender": ["female"], "test preparation course": ["none"]}
+RANGES = {"math score": (40, 80)}
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    info = inspect_csv(CSV_PATH)
+    df = generate_frame(args.rows)
+    expected = (
+        (df["gender"] == "female")
+        & (df["test preparation course"] == "none")
+        & df["math score"].between(*RANGES["math score"])
+    ).to_numpy()
+
+    print(f"{args.rows:,} rows (best of {args.repeat})")
+    print(f"{'workers':>8} {'summarize':>12} {'mask':>10}")
+    for workers in args.workers:
+        backend = ParallelBackend(workers, min_rows=0)
+        source = backend.share(df, info.group_columns + info.scores)
+        source = df if source is None else source
+        try:
+            backend.mask(source, CATEGORIES, RANGES)  # starts and warms up the pool
+            t_summary, (cube, _) = best_of(lambda: backend.summarize(source, info), args.repeat)
+            t_mask, mask = best_of(lambda: backend.mask(source, CATEGORIES, RANGES), args.repeat)
+        finally:
+            if source is not df:
+                source.close()
+            backend.shutdown()
+
+        assert np.array_equal(mask, expected)
+        assert cube.query(CATEGORIES, RANGES["math score"])["count"] == expected.sum()
+        print(f"{workers:>8} {t_summary * 1000:10.1f}ms {t_mask * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
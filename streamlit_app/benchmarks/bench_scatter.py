@@ -0,0 +1,69 @@
+# benchmarks/bench_scatter.py
+"""
+Reading vs Writing scatter: payload size and server build time, before and after.
+
+  - before  : px.scatter(df, ..., hover_data=df.columns), as the pages used to do
+  - auto    : core.figures.scatter_figure (WebGL / aggregated markers), compacted
+              (slim template, typed arrays) as the figure cache serves it
+  - heatmap : core.figures.scatter_figure(mode="heatmap"), compacted
+
+"build" is figure construction plus JSON serialization on the server; browser
+render time isn't measured here, but it tracks the number of points and bytes.
+
+Run from the streamlit_app folder:
+    python benchmarks/bench_scatter.py --rows 1000 100000 1000000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import plotly.express as px
+
+from core.figures import compact, scatter_figure
+from core.synthetic import generate_frame
+
+LABELS = {
+    "reading score": "Reading score (points)",
+    "writing score": "Writing score (points)",
+    "gender": "Gender",
+}
+
+
+def measure(build):
+    start = time.perf_counter()
+    payload = build().to_json()
+    return time.perf_counter() - start, len(payload.encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    variants = {
+        "before": lambda df: px.scatter(
+            df, x="reading score", y="writing score", color="gender",
+            labels=LABELS, hover_data=df.columns,
+        ),
+        "auto": lambda df: compact(scatter_figure(
+            df, "reading score", "writing score", color="gender",
+            labels=LABELS, hover_cols=df.columns,
+        )),
+        "heatmap": lambda df: compact(scatter_figure(
+            df, "reading score", "writing score", labels=LABELS, mode="heatmap",
+        )),
+    }
+
+    print(f"{'rows':>10}  {'variant':<8} {'build':>10} {'payload':>12}")
+    for rows in args.rows:
+        df = generate_frame(rows)
+        for name, build in variants.items():
+            seconds, size = measure(lambda: build(df))
+            print(f"{rows:>10,}  {name:<8} {seconds * 1000:8.1f}ms {size / 1024:10.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
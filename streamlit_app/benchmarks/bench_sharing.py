@@ -0,0 +1,110 @@
+# benchmarks/bench_sharing.py
+"""
+Memory per server process: private dataset copies vs the shared columnar sidecar.
+
+Builds a StudentsPerformance-schema CSV with the synthetic generator, then starts
+``--processes`` processes at once. Each one loads the dataset and touches every
+column and its filter index, and reports how much its memory grew (Linux,
+/proc/self/smaps_rollup):
+  - private : parsed CSV + FilterIndex built in the process (a copy per process)
+  - shared  : LoadedDataset from the registry (memory-mapped sidecar and index)
+"private MB" is memory no other process can share. "pss MB" is the proportional set
+size (shared pages split between the processes mapping them). Both should stay
+roughly flat per process in the shared mode.
+
+Run from the streamlit_app folder:
+    python benchmarks/bench_sharing.py --rows 2000000 --processes 4
+"""
+import argparse
+import sys
+import tempfile
+from multiprocessing import get_context
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+SMAPS_FIELDS = {"Rss", "Pss", "Private_Clean", "Private_Dirty"}
+
+
+def memory_kb():
+    values = {}
+    with open("/proc/self/smaps_rollup", encoding="ascii") as fh:
+        for line in fh:
+            key, _, rest = line.partition(":")
+            if key in SMAPS_FIELDS:
+                values[key] = int(rest.split()[0])
+    return {"rss": values["Rss"], "pss": values["Pss"], "private": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def load(mode, csv_path, info):
+    from core.data import read_typed_csv
+    from core.filters import FilterIndex
+    from core.registry import LoadedDataset
+
+    if mode == "private":
+        df = read_typed_csv(csv_path, info.dtypes)
+        index = FilterIndex(df, info.filters, [info.primary_score])
+    else:
+        dataset = LoadedDataset(info)
+        df, index = dataset.frame, dataset.index
+    # Read every page of the columns and the index, as the pages eventually do.
+    arrays = [df[col].array._codes for col in info.categories] + [df[col].to_numpy() for col in info.scores]
+    arrays += [mask for masks in index.category_masks.values() for mask in masks.values()]
+    arrays += [array for pair in index.sorted_ranges.values() for array in pair]
+    for array in arrays:
+        np.bitwise_xor.reduce(array.view(np.uint8))
+    return df, index
+
+
+def worker(mode, csv_path, barrier, results):
+    from core.registry import inspect_csv
+
+    # Imports and the header sniff are not part of the dataset's cost.
+    info = inspect_csv(csv_path)
+    before = memory_kb()
+    loaded = load(mode, csv_path, info)
+    barrier.wait()  # every process holds its data while the others measure
+    after = memory_kb()
+    barrier.wait()
+    results.put({key: (after[key] - before[key]) / 1024 for key in after})
+    del loaded
+
+
+def run(mode, csv_path, processes):
+    ctx = get_context("spawn")
+    barrier, results = ctx.Barrier(processes), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, csv_path, barrier, results)) for _ in range(processes)]
+    for proc in procs:
+        proc.start()
+    measured = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    return measured
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    from core.registry import LoadedDataset, inspect_csv
+    from core.synthetic import write_dataset
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = write_dataset(Path(folder) / f"students_{args.rows}.csv", args.rows)["csv"]
+        # The first load of a running server publishes the sidecar and the filter index.
+        frame_mb = LoadedDataset(inspect_csv(csv_path)).frame.memory_usage(deep=True).sum() / 2**20
+
+        print(f"{args.rows:,} rows, typed frame {frame_mb:.1f} MB, {args.processes} processes")
+        print(f"{'mode':>8} {'private MB':>12} {'pss MB':>10} {'rss MB':>10}   (mean per process)")
+        for mode in ("private", "shared"):
+            measured = run(mode, csv_path, args.processes)
+            mean = {key: sum(m[key] for m in measured) / len(measured) for key in measured[0]}
+            print(f"{mode:>8} {mean['private']:12.1f} {mean['pss']:10.1f} {mean['rss']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
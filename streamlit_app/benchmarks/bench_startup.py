@@ -0,0 +1,105 @@
+# benchmarks/bench_startup.py
+"""
+Cold start: process start to first byte, and the latency of the first visits.
+
+For each launch mode, starts a fresh server process ``--repeat`` times and measures:
+  - first byte : from starting the process to the first byte of ``GET /``
+  - health     : to the first successful ``/_stcore/health``
+  - first run  : a browser-like session (core/warmup.py) opening ``--page`` with its
+                 default widget values, from the request to the end of the run
+  - rerun      : the same page run again in that session (everything cached)
+  - landing    : the main page (app.py) in a second session, run after the above
+Modes:
+  - plain  : ``streamlit run app.py``
+  - warmup : ``python -m core.warmup`` (the same server plus a warm-up thread)
+``--delay`` seconds pass between the first byte and the first visit, e.g. to let the
+warm-up finish (the time a real first visitor takes to arrive). Medians are printed.
+
+Run from the streamlit_app folder:
+    python benchmarks/bench_startup.py --page Dashboard --delay 0 5
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.warmup import PageClient, wait_until_up
+
+STREAMLIT_FLAGS = ["--server.headless", "true", "--browser.gatherUsageStats", "false"]
+
+
+def launch(mode, port):
+    if mode == "plain":
+        command = [sys.executable, "-m", "streamlit", "run", "app.py", "--server.port", str(port)]
+    else:
+        command = [sys.executable, "-m", "core.warmup", "--port", str(port)]
+    return subprocess.Popen(
+        command + STREAMLIT_FLAGS, cwd=ROOT, env=os.environ.copy(),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def first_byte(port, start, timeout=120):
+    """Seconds from ``start`` until ``GET /`` returns its first byte (polling until the server listens)."""
+    while time.perf_counter() - start < timeout:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/")
+            response = conn.getresponse()
+            response.read(1)
+            conn.close()
+            if response.status == 200:
+                return time.perf_counter() - start
+        except OSError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"No response on port {port} after {timeout} s.")
+
+
+def measure(mode, port, page, delay):
+    start = time.perf_counter()
+    server = launch(mode, port)
+    try:
+        result = {"first byte": first_byte(port, start)}
+        wait_until_up("127.0.0.1", port)
+        result["health"] = time.perf_counter() - start
+        time.sleep(delay)
+        with PageClient("127.0.0.1", port) as client:
+            result["first run"] = client.run(page)
+            result["rerun"] = client.run(page)
+        with PageClient("127.0.0.1", port) as client:
+            result["landing"] = client.run("")
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--page", default="Dashboard", help="URL name of the page to visit first")
+    parser.add_argument("--modes", nargs="+", default=["plain", "warmup"], choices=["plain", "warmup"])
+    parser.add_argument("--delay", type=float, nargs="+", default=[0.0, 5.0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8599)
+    args = parser.parse_args()
+
+    columns = ["first byte", "health", "first run", "rerun", "landing"]
+    print(f"page {args.page!r}, median of {args.repeat} server starts (seconds)")
+    print(f"{'mode':>8} {'delay':>6} " + " ".join(f"{col:>10}" for col in columns))
+    for mode in args.modes:
+        for delay in args.delay:
+            runs = [measure(mode, args.port, args.page, delay) for _ in range(args.repeat)]
+            medians = {col: statistics.median(run[col] for run in runs) for col in columns}
+            print(f"{mode:>8} {delay:6.1f} " + " ".join(f"{medians[col]:10.3f}" for col in columns))
+
+
+if __name__ == "__main__":
+    main()
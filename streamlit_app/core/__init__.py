@@ -0,0 +1,6 @@
+"""
+Shared data layer for the Streamlit pages.
+
+Pages import from the submodules directly (e.g. ``from core.registry import load_dataset``)
+so that a text-only page never pays for pandas or Plotly imports it doesn't use.
+"""
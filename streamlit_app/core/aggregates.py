@@ -0,0 +1,265 @@
+# core/aggregates.py
+"""
+Mergeable per-group score aggregates.
+
+Scores are bounded integers, so a per-score count array is a lossless summary of a
+score column: counts, sums, means and exact quantiles all follow from it. The
+``AggregateStore`` keeps one such histogram
+
+  - per score column (overall), and
+  - per (category column, category value, score column),
+
+and optionally per (pair of category columns, value pair, score column). Next to
+the histograms it keeps each group's count, sum and sum of squares, so breakdowns
+("mean / median / std of a score by a category") are answered with ``stat`` or
+``table`` without touching the rows. It can be updated chunk by chunk, which is
+what the streaming loader relies on.
+"""
+import numpy as np
+import pandas as pd
+
+from core.quantiles import hist_box_stats, hist_quantiles
+
+MAX_SCORE = 100
+STATS = ("count", "sum", "mean", "std", "var", "min", "q1", "median", "q3", "max")
+
+
+class CategoryCoder:
+    """
+    Stable integer codes for category labels across chunks. Each chunk parsed with
+    ``dtype="category"`` has its own categories; this maps them onto one growing
+    label list per column.
+    """
+
+    def __init__(self):
+        self.labels = {}
+        self._ids = {}
+
+    def encode(self, col, series):
+        """Global codes of ``series`` (int64, -1 for missing values)."""
+        labels = self.labels.setdefault(col, [])
+        ids = self._ids.setdefault(col, {})
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype("category")
+        mapping = np.empty(len(series.cat.categories) + 1, dtype=np.int64)
+        for i, value in enumerate(series.cat.categories):
+            if value not in ids:
+                ids[value] = len(labels)
+                labels.append(value)
+            mapping[i] = ids[value]
+        mapping[-1] = -1  # code -1 (missing) indexes the last slot
+        return mapping[series.cat.codes.to_numpy()]
+
+    def positions(self, col, labels):
+        """Codes of ``labels`` in this coder (added if new), e.g. to merge another coder's arrays."""
+        own = self.labels.setdefault(col, [])
+        ids = self._ids.setdefault(col, {})
+        for value in labels:
+            if value not in ids:
+                ids[value] = len(own)
+                own.append(value)
+        return np.array([ids[value] for value in labels], dtype=np.intp)
+
+
+def grow(array, shape):
+    """``array`` zero-padded at the end of each axis up to ``shape``."""
+    if array.shape == tuple(shape):
+        return array
+    pad = [(0, max(0, new - old)) for old, new in zip(array.shape, shape)]
+    return np.pad(array, pad)
+
+
+def align(array, positions, shape):
+    """
+    ``array`` placed into a zero array of ``shape``: its leading axes re-indexed by
+    ``positions`` (one index array per axis), the remaining axes zero-padded.
+    """
+    array = grow(array, array.shape[: len(positions)] + tuple(shape[len(positions):]))
+    out = np.zeros(shape, dtype=array.dtype)
+    out[np.ix_(*positions)] = array
+    return out
+
+
+def score_axis_size(values, max_score=MAX_SCORE):
+    return max(max_score, int(values.max()) if len(values) else 0) + 1
+
+
+class AggregateStore:
+    def __init__(self, category_columns, score_columns, coder=None, pairs=()):
+        self.category_columns = list(category_columns)
+        self.score_columns = list(score_columns)
+        self.coder = coder or CategoryCoder()
+        self.rows = 0
+        # Groupings are tuples of category columns: one per column, plus the pairs.
+        self.groupings = [(col,) for col in self.category_columns] + [
+            tuple(pair) for pair in pairs
+            if len(pair) == 2 and all(col in self.category_columns for col in pair)
+        ]
+        self.score_hists = {
+            score: np.zeros(MAX_SCORE + 1, dtype=np.int64) for score in self.score_columns
+        }
+        self.group_counts = {
+            by: np.zeros((0,) * len(by), dtype=np.int64) for by in self.groupings
+        }
+        self.group_hists, self.group_sums, self.group_sumsq = {}, {}, {}
+        for by in self.groupings:
+            for score in self.score_columns:
+                self.group_hists[(by, score)] = np.zeros((0,) * len(by) + (MAX_SCORE + 1,), dtype=np.int64)
+                self.group_sums[(by, score)] = np.zeros((0,) * len(by), dtype=np.int64)
+                self.group_sumsq[(by, score)] = np.zeros((0,) * len(by), dtype=np.int64)
+
+    def update(self, chunk):
+        """Folds the rows of ``chunk`` into the aggregates."""
+        self.rows += len(chunk)
+        scores = {score: chunk[score].to_numpy().astype(np.int64) for score in self.score_columns}
+        for score, values in scores.items():
+            hist = np.bincount(values, minlength=score_axis_size(values))
+            self.score_hists[score] = grow(self.score_hists[score], hist.shape)
+            self.score_hists[score][: len(hist)] += hist
+
+        codes = {col: self.coder.encode(col, chunk[col]) for col in self.category_columns}
+        for by in self.groupings:
+            # One flat group id per row over the current label grid of ``by``.
+            shape = tuple(len(self.coder.labels[col]) for col in by)
+            keep = np.logical_and.reduce([codes[col] >= 0 for col in by])
+            group = np.ravel_multi_index([codes[col][keep] for col in by], shape) if keep.any() else np.zeros(0, dtype=np.int64)
+            n_groups = int(np.prod(shape))
+
+            counts = np.bincount(group, minlength=n_groups).reshape(shape)
+            self.group_counts[by] = grow(self.group_counts[by], shape) + counts
+            for score, values in scores.items():
+                key = (by, score)
+                width = max(self.group_hists[key].shape[-1], score_axis_size(values))
+                flat = group * width + values[keep]
+                hist = np.bincount(flat, minlength=n_groups * width).reshape(shape + (width,))
+                self.group_hists[key] = grow(self.group_hists[key], shape + (width,)) + hist
+                points = np.arange(width, dtype=np.int64)
+                self.group_sums[key] = grow(self.group_sums[key], shape) + hist @ points
+                self.group_sumsq[key] = grow(self.group_sumsq[key], shape) + hist @ (points * points)
+
+    def merge(self, other):
+        """Adds the aggregates of ``other`` (e.g. built on another shard) to this store."""
+        self.rows += other.rows
+        for score, hist in other.score_hists.items():
+            width = max(len(hist), len(self.score_hists[score]))
+            self.score_hists[score] = grow(self.score_hists[score], (width,)) + grow(hist, (width,))
+
+        for by in self.groupings:
+            positions = [self.coder.positions(col, other.labels(col)) for col in by]
+            shape = tuple(len(self.labels(col)) for col in by)
+            self.group_counts[by] = grow(self.group_counts[by], shape) + align(other.group_counts[by], positions, shape)
+            for score in self.score_columns:
+                key = (by, score)
+                for own, theirs in ((self.group_sums, other.group_sums), (self.group_sumsq, other.group_sumsq)):
+                    own[key] = grow(own[key], shape) + align(theirs[key], positions, shape)
+                width = max(self.group_hists[key].shape[-1], other.group_hists[key].shape[-1])
+                self.group_hists[key] = grow(self.group_hists[key], shape + (width,)) + align(
+                    other.group_hists[key], positions, shape + (width,)
+                )
+        return self
+
+    @property
+    def nbytes(self):
+        arrays = [
+            *self.score_hists.values(), *self.group_counts.values(), *self.group_hists.values(),
+            *self.group_sums.values(), *self.group_sumsq.values(),
+        ]
+        return sum(array.nbytes for array in arrays)
+
+    def labels(self, col):
+        return self.coder.labels.get(col, [])
+
+    def score_counts(self, score):
+        """Number of students at every integer value of ``score``."""
+        return self.score_hists[score]
+
+    def _grouping(self, by):
+        """(stored grouping, axis order) for ``by``; a pair may be asked for in either order."""
+        by = (by,) if isinstance(by, str) else tuple(by)
+        if by in self.group_counts:
+            return by, None
+        if by[::-1] in self.group_counts:
+            return by[::-1], (1, 0)
+        raise KeyError(f"No aggregates for {by}; pairs must be requested when the store is built.")
+
+    def _arrays(self, by, score):
+        """counts, sums, sums of squares and histograms of ``score`` laid out along ``by``."""
+        stored, order = self._grouping(by)
+        key = (stored, score)
+        arrays = [self.group_counts[stored], self.group_sums[key], self.group_sumsq[key], self.group_hists[key]]
+        if order is not None:
+            arrays = [np.moveaxis(array, (0, 1), order) for array in arrays]
+        return arrays
+
+    def group_totals(self, by, score):
+        """Per-group (counts, sums, sums of squares) of ``score``, laid out along ``by``."""
+        return tuple(self._arrays(by, score)[:3])
+
+    def group_hist(self, by, score):
+        """
+        Per-group score histograms: shape (n labels, n scores) for a column, or
+        (n labels a, n labels b, n scores) for a pair.
+        """
+        return self._arrays(by, score)[3]
+
+    def _index(self, by, present):
+        """Labels of the groups where ``present`` is True (an Index or MultiIndex)."""
+        positions = np.nonzero(present)
+        if len(by) == 1:
+            return pd.Index(np.asarray(self.labels(by[0]), dtype=object)[positions[0]], name=by[0])
+        return pd.MultiIndex.from_arrays(
+            [np.asarray(self.labels(col), dtype=object)[pos] for col, pos in zip(by, positions)],
+            names=list(by),
+        )
+
+    @staticmethod
+    def _stat(arrays, stat, present):
+        counts, sums, sumsq, hists = (array[present] for array in arrays)
+        if stat == "count":
+            return counts
+        counts = counts.astype(np.float64)
+        if stat == "sum":
+            return sums.astype(np.float64)
+        means = sums / counts
+        if stat == "mean":
+            return means
+        if stat in ("var", "std"):
+            # Sample variance (ddof=1), as pandas reports; NaN for single-student groups.
+            with np.errstate(invalid="ignore", divide="ignore"):
+                var = (sumsq - counts * means * means) / (counts - 1)
+            var = np.where(counts > 1, np.maximum(var, 0.0), np.nan)
+            return np.sqrt(var) if stat == "std" else var
+        if stat == "min":
+            return (hists > 0).argmax(axis=1).astype(np.float64)
+        if stat == "max":
+            return (hists.shape[1] - 1 - (hists[:, ::-1] > 0).argmax(axis=1)).astype(np.float64)
+        q = {"q1": 0.25, "median": 0.5, "q3": 0.75}.get(stat)
+        if q is None:
+            raise ValueError(f"Unknown statistic {stat!r}; expected one of {STATS}.")
+        return np.array([hist_quantiles(hist, [q])[0] for hist in hists])
+
+    def stat(self, by, score, stat="mean"):
+        """
+        ``stat`` of ``score`` for every group of ``by`` (a column or a pair of columns)
+        that occurs, as a Series named ``score``. ``stat`` is one of ``STATS``.
+        """
+        return self.table(by, score, (stat,))[stat].rename(score)
+
+    def table(self, by, score, stats=("count", "mean", "std", "median")):
+        """Several statistics of ``score`` by ``by`` at once, one column per statistic."""
+        arrays = self._arrays(by, score)
+        present = arrays[0] > 0
+        by = (by,) if isinstance(by, str) else tuple(by)
+        return pd.DataFrame(
+            {stat: self._stat(arrays, stat, present) for stat in stats},
+            index=self._index(by, present),
+        )
+
+    def group_box_stats(self, col, score):
+        """Exact box statistics of ``score`` for every value of ``col`` that occurs."""
+        hist = self.group_hist(col, score)
+        return {
+            label: hist_box_stats(row)
+            for label, row in zip(self.labels(col), hist)
+            if row.any()
+        }
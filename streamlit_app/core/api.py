@@ -0,0 +1,282 @@
+# core/api.py
+"""
+JSON API for the Dashboard's KPIs, served next to the Streamlit app.
+
+Answers the same questions as the Dashboard's filters (category selections plus a
+range of the primary score) with the same data layer: datasets come from the
+registry's dataset cache and counts and averages from their KPI cube, so a query
+costs the same as a filter change on the page and never touches the rows.
+
+  GET  /api/health                 {"status": "ok"}
+  GET  /metrics                    stage timings and cache stats of this process, in
+                                   Prometheus text format (core/metrics.py)
+  GET  /api/datasets               name, filter columns and scores of each dataset
+  GET  /api/kpis?gender=female&gender=male&test%20preparation%20course=none&min=40&max=80
+                                   one query; repeat a filter to select several values
+  POST /api/kpis                   a batch: {"dataset": ..., "queries": [query, ...]}
+                                   where a query is {"categories": {column: [values]},
+                                   "range": [min, max]}; both parts are optional
+
+``dataset`` (a query parameter for GET) defaults to the one the pages open with. An
+empty or missing selection means "all", as on the Dashboard. Every response is
+{"dataset", "key", "rows", "score", "refreshed_at", "results": [{"count", "means"}]},
+with a null mean where no student matches. Errors are {"error": message} with status
+400 (bad query) or 404 (unknown dataset or path).
+
+The server speaks HTTP/1.1, so clients can keep a connection open for many requests.
+Set ``APP_API_PORT`` to start it in the background of every Streamlit server process
+(sharing that process's dataset cache; ``APP_API_HOST`` defaults to 127.0.0.1), or
+run it on its own from the streamlit_app folder:
+    python -m core.api --port 8502
+"""
+import argparse
+import json
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from core import metrics
+from core.data import DATA_DIR
+from core.figure_cache import get_figure_cache
+from core.registry import DatasetCache, discover, load_dataset
+
+API_HOST = os.environ.get("APP_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("APP_API_PORT", "0"))
+MAX_BODY_BYTES = 1024 * 1024
+MAX_QUERIES = 1000
+
+
+def _bound(value, what):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"{what} must be a number, not {json.dumps(value)}.")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{what} must be a number, not {value!r}.") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{what} must be finite.")
+    return number
+
+
+def _labels_named(value, labels):
+    """
+    The category ``labels`` that JSON ``value`` names, compared as text, so numbers and
+    booleans match labels of any type (``1`` matches 1 and "1"; ``true``, "True" and
+    "true" match True and "True").
+    """
+    if isinstance(value, bool) or (isinstance(value, str) and value.lower() in ("true", "false")):
+        wanted, text = {str(value).lower()}, lambda label: str(label).lower()
+    elif isinstance(value, (str, int, float)):
+        wanted, text = {str(value)}, str
+        if isinstance(value, float) and value.is_integer():
+            wanted.add(str(int(value)))
+    else:
+        raise ValueError(f"Category values must be strings, numbers or booleans, not {json.dumps(value)}.")
+    return [label for label in labels if text(label) in wanted]
+
+
+def parse_query(query, info, labels=None):
+    """
+    (categories, (min, max)) from a JSON query object, with None for an open bound;
+    raises ValueError when it names columns that aren't filters of ``info`` or is
+    malformed. With ``labels`` ({filter column: category labels}), selected values
+    are resolved to those labels; values that name none of them match no student.
+    """
+    if not isinstance(query, dict) or set(query) - {"categories", "range"}:
+        raise ValueError('A query is an object with "categories" and/or "range".')
+    categories = query.get("categories") or {}
+    if not isinstance(categories, dict):
+        raise ValueError('"categories" must map filter columns to lists of values.')
+    selected = {}
+    for col, values in categories.items():
+        if col not in info.filters:
+            raise ValueError(f"{col!r} is not a filter column; expected one of {info.filters}.")
+        if not isinstance(values, list):
+            raise ValueError(f"The values of {col!r} must be a list.")
+        if values:
+            if labels is None:
+                selected[col] = [str(value) for value in values]
+            else:
+                selected[col] = [label for value in values for label in _labels_named(value, labels.get(col, []))]
+                # Values that name no label select no student ([] would mean "all"; None is never a label).
+                selected[col] = selected[col] or [None]
+    score_range = query.get("range") or [None, None]
+    if not isinstance(score_range, list) or len(score_range) != 2:
+        raise ValueError('"range" must be [min, max] (null for an open end).')
+    return selected, (_bound(score_range[0], "min"), _bound(score_range[1], "max"))
+
+
+def query_from_params(params):
+    """The JSON query object for parsed GET parameters (``dataset`` excluded)."""
+    categories = {name: values for name, values in params.items() if name not in ("min", "max")}
+    return {"categories": categories, "range": [params.get("min", [None])[-1], params.get("max", [None])[-1]]}
+
+
+class KpiService:
+    """The API's answers, from a DatasetCache (the Streamlit process's own when embedded)."""
+
+    def __init__(self, cache, data_dir=DATA_DIR):
+        self.cache = cache
+        self.data_dir = data_dir
+
+    def datasets(self):
+        listing = []
+        for name, info in discover(self.data_dir).items():
+            if info.supported:
+                listing.append({
+                    "name": name,
+                    "filters": info.filters,
+                    "score": info.primary_score,
+                    "scores": info.scores,
+                    "time": info.time,
+                })
+        return {"datasets": listing}
+
+    def cache_stats(self):
+        return {"dataset": self.cache.stats(), "figure": get_figure_cache().stats()}
+
+    def kpis(self, queries, name=None):
+        """Counts and means per query (see ``parse_query``) on dataset ``name``."""
+        if not isinstance(queries, list) or not queries:
+            raise ValueError('"queries" must be a non-empty list.')
+        if len(queries) > MAX_QUERIES:
+            raise ValueError(f"At most {MAX_QUERIES} queries per request.")
+        try:
+            dataset = load_dataset(name, self.data_dir, cache=self.cache)
+        except FileNotFoundError:
+            raise LookupError(f"No such dataset: {name!r}.") from None
+        info = dataset.info
+        cube = dataset.summary.cube
+        parsed = [parse_query(query, info, cube.labels) for query in queries]
+        # Open bounds are the observed range of the score, as on the Dashboard's slider.
+        lowest, highest = dataset.index.value_range(info.primary_score)
+        results = []
+        with metrics.stage("api/kpis"):
+            for categories, (low, high) in parsed:
+                kpis = cube.query(categories, (lowest if low is None else low, highest if high is None else high))
+                results.append({
+                    "count": kpis["count"],
+                    "means": {score: (None if math.isnan(mean) else mean) for score, mean in kpis["means"].items()},
+                })
+        return {
+            "dataset": info.name,
+            "key": info.key,
+            "rows": dataset.summary.rows,
+            "score": info.primary_score,
+            "refreshed_at": dataset.refreshed_at.isoformat(timespec="seconds"),
+            "results": results,
+        }
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1: connections stay open between requests unless the client closes them.
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate small writes; without TCP_NODELAY the second
+    # one waits for the client's delayed ACK (~40 ms) on a kept-alive connection.
+    disable_nagle_algorithm = True
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/api/health":
+            return self._reply(200, {"status": "ok"})
+        if url.path == "/api/datasets":
+            return self._reply(200, self.service.datasets())
+        if url.path == "/metrics":
+            text = metrics.process_recorder().to_prometheus(self.service.cache_stats())
+            return self._send(200, text.encode("utf-8"), "text/plain; version=0.0.4")
+        if url.path == "/api/kpis":
+            params = parse_qs(url.query, keep_blank_values=False)
+            name = params.pop("dataset", [None])[-1]
+            return self._answer(lambda: self.service.kpis([query_from_params(params)], name))
+        return self._reply(404, {"error": f"No such endpoint: {url.path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/api/kpis":
+            return self._reply(404, {"error": f"No such endpoint: {url.path}"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            return self._reply(400, {"error": "Content-Length must be a non-negative integer."})
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            return self._reply(413, {"error": f"Request bodies are limited to {MAX_BODY_BYTES} bytes."})
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._reply(400, {"error": "The request body is not valid JSON."})
+        if not isinstance(body, dict):
+            return self._reply(400, {"error": 'The request body must be {"dataset": ..., "queries": [...]}.'})
+        return self._answer(lambda: self.service.kpis(body.get("queries"), body.get("dataset")))
+
+    def _answer(self, compute):
+        try:
+            payload = compute()
+        except LookupError as exc:
+            return self._reply(404, {"error": str(exc)})
+        except ValueError as exc:
+            return self._reply(400, {"error": str(exc)})
+        except Exception as exc:  # e.g. a data file that can't be read; keep the connection usable
+            self.log_error("%s: %r", self.path, exc)
+            return self._reply(500, {"error": "The query could not be answered."})
+        return self._reply(200, payload)
+
+    def _reply(self, status, payload):
+        self._send(status, json.dumps(payload, separators=(",", ":")).encode("utf-8"), "application/json")
+
+    def _send(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_request(self, code="-", size="-"):
+        # One line per request would cost more than most queries; errors are still logged.
+        pass
+
+
+def make_server(cache, host=API_HOST, port=API_PORT, data_dir=DATA_DIR):
+    """A threading HTTP server answering from ``cache`` (not started yet)."""
+    handler = type("BoundApiHandler", (ApiHandler,), {"service": KpiService(cache, data_dir)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(cache, host=API_HOST, port=API_PORT):
+    """Starts the API on a daemon thread of this process; returns the server, or None if the port is taken."""
+    try:
+        server = make_server(cache, host, port)
+    except OSError:
+        # Another Streamlit process on this machine already serves it.
+        return None
+    threading.Thread(target=server.serve_forever, name="kpi-api", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT or 8502)
+    args = parser.parse_args()
+    server = make_server(DatasetCache(), args.host, args.port)
+    print(f"Serving the KPI API on http://{args.host}:{server.server_address[1]}/api/kpis")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
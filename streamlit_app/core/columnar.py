@@ -0,0 +1,347 @@
+# core/columnar.py
+"""
+Columnar binary sidecar for CSV datasets.
+
+The first load of a CSV writes one ``.npy`` file per column next to it
+(``<csv folder>/.cache/<csv stem>/``): category columns are stored as their integer
+codes with the labels kept in ``manifest.json``, score columns as raw uint8.
+Later loads memory-map those files instead of re-parsing the CSV. Because they are
+read-only file mappings, every session and every server process on the machine shares
+one copy of the columns in the OS page cache. Derived arrays (e.g. the filter index)
+can be published next to them with ``publish_arrays`` and mapped the same way.
+
+The manifest records the CSV's size, mtime and SHA-256. The sidecar is reused when
+size and mtime match; if only the mtime moved (e.g. the file was touched or
+re-copied) the hash decides. Any other change rebuilds it — except rows appended to
+the CSV, which core/ingest.py adds to the column files in place (``append_sidecar``):
+``.npy`` headers leave room for the row count to grow, and existing memory maps of
+the shorter files stay valid.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: sidecar updates aren't serialized across processes
+    fcntl = None
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# Bytes at the end of a source file whose digest tells appends from rewrites.
+TAIL_BYTES = 64 * 1024
+
+
+def sidecar_dir(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.parent / ".cache" / csv_path.stem
+
+
+def file_sha256(path, block_size=1 << 20, size=None):
+    """SHA-256 of the file, or of its first ``size`` bytes."""
+    digest = hashlib.sha256()
+    left = float("inf") if size is None else size
+    with open(path, "rb") as fh:
+        while left > 0:
+            block = fh.read(int(min(block_size, left)))
+            if not block:
+                break
+            digest.update(block)
+            left -= len(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(csv_path, with_hash=True, state=None):
+    """
+    Size, mtime and hash of ``csv_path``; with ``state`` (core/ingest.py), of the
+    prefix of the file that ``state`` describes instead of its current contents.
+    """
+    if state is None:
+        stat = Path(csv_path).stat()
+        state = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    fingerprint = {"size": state["size"], "mtime_ns": state["mtime_ns"]}
+    if with_hash:
+        fingerprint["sha256"] = file_sha256(csv_path, size=state["size"])
+    return fingerprint
+
+
+def tail_digest(path, size):
+    """SHA-256 of the last ``TAIL_BYTES`` of the first ``size`` bytes of ``path``."""
+    with open(path, "rb") as fh:
+        fh.seek(max(0, size - TAIL_BYTES))
+        return hashlib.sha256(fh.read(min(size, TAIL_BYTES))).hexdigest()
+
+
+def source_name(csv_path, path):
+    """Name of a source file of ``csv_path`` (the CSV or a partition), relative to its folder."""
+    return Path(path).relative_to(Path(csv_path).parent).as_posix()
+
+
+def source_state(csv_path, path=None, size=None):
+    """
+    Ingest state of ``path`` (default: the CSV itself) covering its first ``size``
+    bytes (default: all of it): file name, size, mtime and tail digest.
+    """
+    path = Path(csv_path if path is None else path)
+    stat = path.stat()
+    size = stat.st_size if size is None else size
+    return {
+        "file": source_name(csv_path, path),
+        "size": size,
+        "mtime_ns": stat.st_mtime_ns,
+        "tail": tail_digest(path, size),
+    }
+
+
+def _read_manifest(folder):
+    try:
+        with open(folder / MANIFEST_NAME, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def sidecar_is_fresh(csv_path, manifest):
+    """True if ``manifest`` still describes the current contents of ``csv_path``."""
+    if manifest is None or manifest.get("source") is None:
+        return False
+    recorded = manifest["source"]
+    current = source_fingerprint(csv_path, with_hash=False)
+    if current["size"] != recorded["size"]:
+        return False
+    if current["mtime_ns"] == recorded["mtime_ns"]:
+        return True
+    # Appended sidecars carry no hash (that would mean reading the whole file again).
+    return recorded.get("sha256") is not None and file_sha256(csv_path) == recorded["sha256"]
+
+
+def _column_values(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy()
+    return series.to_numpy()
+
+
+def write_sidecar(csv_path, df, sources=None):
+    """
+    Writes ``df`` (already parsed from ``csv_path``) as a sidecar. The files go to a
+    temporary folder first and are swapped in at the end, so a reader never sees a
+    half-written sidecar. ``sources`` are the states of the files ``df`` was read
+    from (default: the CSV as it is now); core/ingest.py appends to the sidecar from
+    there.
+    """
+    folder = sidecar_dir(csv_path)
+    tmp = folder.with_name(f"{folder.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    columns = []
+    for i, (name, series) in enumerate(df.items()):
+        entry = {"name": name, "file": f"{i}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry["kind"] = "category"
+            entry["categories"] = series.cat.categories.tolist()
+        else:
+            entry["kind"] = "values"
+        np.save(tmp / entry["file"], _column_values(series), allow_pickle=False)
+        columns.append(entry)
+
+    sources = sources or [source_state(csv_path)]
+    write_manifest(tmp, columns, len(df), source_fingerprint(csv_path, state=sources[0]), sources=sources)
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp, folder)
+    return folder
+
+
+def write_manifest(folder, columns, rows, source=None, sources=None):
+    """
+    Writes ``manifest.json`` for column files already in ``folder``. ``source`` is
+    the fingerprint of the CSV they mirror, or None for standalone column folders.
+    The file is replaced atomically, so readers see the old or the new manifest.
+    """
+    manifest = {"version": FORMAT_VERSION, "source": source, "rows": rows, "columns": columns}
+    if sources is not None:
+        manifest["sources"] = sources
+    tmp = Path(folder) / f"{MANIFEST_NAME}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=1)
+    os.replace(tmp, Path(folder) / MANIFEST_NAME)
+
+
+def read_manifest(folder):
+    """The manifest of a sidecar or column folder, or None if missing or outdated."""
+    return _read_manifest(Path(folder))
+
+
+@contextlib.contextmanager
+def locked(folder):
+    """Exclusive lock on a sidecar folder across processes, for read-modify-write updates."""
+    Path(folder).mkdir(parents=True, exist_ok=True)
+    with open(Path(folder) / ".lock", "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+_NPY_HEADERS = {
+    (1, 0): (np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0),
+    (2, 0): (np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0),
+}
+
+
+def _append_npy(path, values):
+    """Appends ``values`` to a 1-D ``.npy`` file in place: data first, then the row count."""
+    with open(path, "r+b") as fh:
+        version = np.lib.format.read_magic(fh)
+        if version not in _NPY_HEADERS:
+            raise ValueError(f"{path}: unsupported .npy version {version}.")
+        read_header, write_header = _NPY_HEADERS[version]
+        shape, fortran, dtype = read_header(fh)
+        data_start = fh.tell()
+        if len(shape) != 1 or fortran or dtype != values.dtype:
+            raise ValueError(f"{path} can't be appended to with {values.dtype} values.")
+        fh.seek(0, os.SEEK_END)
+        fh.write(np.ascontiguousarray(values).tobytes())
+        fh.seek(0)
+        header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (shape[0] + len(values),)}
+        write_header(fh, header)
+        if fh.tell() != data_start:
+            raise ValueError(f"{path}: the grown header no longer fits.")
+
+
+def append_sidecar(csv_path, df, sources, manifest=None):
+    """
+    Appends the rows of ``df`` (typed like the sidecar) to the sidecar of ``csv_path``
+    and records ``sources`` (the ingest states now covered) in its manifest. New
+    category labels go to the end of the label list, so existing codes keep their
+    meaning. Raises ValueError when the rows can't be appended in place (the caller
+    rewrites the sidecar instead). Callers hold ``locked(sidecar_dir(csv_path))``.
+    """
+    folder = sidecar_dir(csv_path)
+    manifest = manifest or _read_manifest(folder)
+    if manifest is None or [entry["name"] for entry in manifest["columns"]] != list(df.columns):
+        raise ValueError(f"The sidecar of {csv_path} has other columns.")
+
+    columns, appends = [], []
+    for entry in manifest["columns"]:
+        series = df[entry["name"]]
+        entry = dict(entry)
+        if entry["kind"] == "category":
+            labels = list(entry["categories"])
+            known = {value: i for i, value in enumerate(labels)}
+            for value in series.cat.categories:
+                if value not in known:
+                    known[value] = len(labels)
+                    labels.append(value)
+            mapping = np.array([known[value] for value in series.cat.categories] + [-1], dtype=np.int64)
+            values = mapping[series.cat.codes.to_numpy()]
+            dtype = np.load(folder / entry["file"], mmap_mode="r").dtype
+            if len(labels) - 1 > np.iinfo(dtype).max:
+                raise ValueError(f"Too many labels for {entry['name']} codes of type {dtype}.")
+            values = values.astype(dtype)
+            entry["categories"] = labels
+        else:
+            values = series.to_numpy()
+        columns.append(entry)
+        appends.append((folder / entry["file"], values))
+
+    # Check every file before touching any, so a failure leaves the sidecar intact.
+    for path, values in appends:
+        if np.load(path, mmap_mode="r").dtype != values.dtype:
+            raise ValueError(f"{path} can't be appended to with {values.dtype} values.")
+    for path, values in appends:
+        _append_npy(path, values)
+    source = source_fingerprint(csv_path, with_hash=False, state=sources[0])
+    source["sha256"] = None
+    write_manifest(folder, columns, manifest["rows"] + len(df), source, sources=sources)
+    # Derived arrays (e.g. the filter index) describe fewer rows now.
+    for child in folder.iterdir():
+        if child.is_dir():
+            shutil.rmtree(child, ignore_errors=True)
+    return folder
+
+
+def read_columns(folder, manifest=None):
+    """Frame over the column files in ``folder`` (memory-mapped, read-only)."""
+    folder = Path(folder)
+    manifest = manifest or _read_manifest(folder)
+    if manifest is None:
+        raise FileNotFoundError(folder / MANIFEST_NAME)
+
+    data = {}
+    for entry in manifest["columns"]:
+        # Files may already hold rows appended after this manifest was read.
+        values = np.load(folder / entry["file"], mmap_mode="r", allow_pickle=False)[: manifest["rows"]]
+        if entry["kind"] == "category":
+            data[entry["name"]] = pd.Categorical.from_codes(values, entry["categories"])
+        else:
+            data[entry["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def fresh_sidecar(csv_path):
+    """(folder, manifest) of the sidecar of ``csv_path`` if it is fresh, else None."""
+    folder = sidecar_dir(csv_path)
+    manifest = _read_manifest(folder)
+    if not sidecar_is_fresh(csv_path, manifest):
+        return None
+    return folder, manifest
+
+
+def read_sidecar(csv_path):
+    """
+    Returns the sidecar frame for ``csv_path`` or None if there is no fresh sidecar.
+    Column arrays are memory-mapped read-only.
+    """
+    sidecar = fresh_sidecar(csv_path)
+    if sidecar is None:
+        return None
+    return read_columns(*sidecar)
+
+
+def publish_arrays(folder, name, meta, arrays):
+    """
+    Writes ``arrays`` ({key: ndarray}) and ``meta`` (JSON) to ``<folder>/<name>/``,
+    swapped in atomically like the sidecar itself. It lives inside the sidecar
+    folder, so it's dropped whenever the sidecar is rebuilt.
+    """
+    target = Path(folder) / name
+    tmp = target.with_name(f"{name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    files = {}
+    for i, (key, values) in enumerate(arrays.items()):
+        files[key] = f"{i}.npy"
+        np.save(tmp / files[key], values, allow_pickle=False)
+    with open(tmp / MANIFEST_NAME, "w", encoding="utf-8") as fh:
+        json.dump({"version": FORMAT_VERSION, "meta": meta, "files": files}, fh, indent=1)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+
+
+def read_arrays(folder, name):
+    """(meta, {key: read-only memory-mapped array}) published under ``name``, or None."""
+    target = Path(folder) / name
+    manifest = _read_manifest(target)
+    if manifest is None:
+        return None
+    try:
+        arrays = {
+            key: np.load(target / file, mmap_mode="r", allow_pickle=False)
+            for key, file in manifest["files"].items()
+        }
+    except (OSError, ValueError):
+        return None
+    return manifest["meta"], arrays
@@ -0,0 +1,106 @@
+# core/cube.py
+"""
+Precomputed KPI cube for the Dashboard.
+
+Every Dashboard filter is either a category selection or an integer score range, so
+the KPIs can be answered from a small dense cube instead of the rows:
+
+    counts[gender, test prep, math score]            -> number of students
+    sums[measure][gender, test prep, math score]     -> total score per measure
+
+(for other datasets the dimensions are their filter columns and primary score, see
+core/registry.py). With 2 x 2 x 101 cells, a KPI query sums a few hundred numbers
+no matter how many students are loaded. The cube is additive, so it can also be
+built chunk by chunk (see core/streaming.py).
+"""
+import math
+
+import numpy as np
+
+from core.aggregates import MAX_SCORE, CategoryCoder, align, grow, score_axis_size
+
+
+class KpiCube:
+    def __init__(self, dims, score_dim, measures, coder=None):
+        self.dims = list(dims)
+        self.score_dim = score_dim
+        self.measures = list(measures)
+        self.coder = coder or CategoryCoder()
+        self.shape = (0,) * len(self.dims) + (MAX_SCORE + 1,)
+        self.counts = np.zeros(self.shape, dtype=np.int64)
+        self.sums = {measure: np.zeros(self.shape) for measure in self.measures}
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + sum(arr.nbytes for arr in self.sums.values())
+
+    @property
+    def labels(self):
+        return {col: self.coder.labels.get(col, []) for col in self.dims}
+
+    def update(self, chunk):
+        """Adds the rows of ``chunk`` to the cube, growing it for new labels/scores."""
+        codes = [self.coder.encode(col, chunk[col]) for col in self.dims]
+        scores = chunk[self.score_dim].to_numpy().astype(np.int64)
+        shape = tuple(len(self.coder.labels[col]) for col in self.dims) + (
+            max(self.shape[-1], score_axis_size(scores)),
+        )
+
+        # Flat cell id of every row; rows with a missing category (code -1) are dropped.
+        keep = np.ones(len(chunk), dtype=bool)
+        flat = np.zeros(len(chunk), dtype=np.int64)
+        for col_codes, size in zip(codes, shape[:-1]):
+            keep &= col_codes >= 0
+            flat = flat * size + col_codes
+        flat = (flat * shape[-1] + scores)[keep]
+
+        n_cells = int(np.prod(shape))
+        self.shape = shape
+        self.counts = grow(self.counts, shape) + np.bincount(
+            flat, minlength=n_cells
+        ).reshape(shape)
+        for measure in self.measures:
+            self.sums[measure] = grow(self.sums[measure], shape) + np.bincount(
+                flat, weights=chunk[measure].to_numpy()[keep], minlength=n_cells
+            ).reshape(shape)
+
+    def merge(self, other):
+        """Adds the cells of ``other`` (e.g. built on another shard) to this cube."""
+        positions = [self.coder.positions(col, other.labels[col]) for col in self.dims]
+        shape = tuple(len(self.coder.labels[col]) for col in self.dims) + (
+            max(self.shape[-1], other.shape[-1]),
+        )
+        self.shape = shape
+        self.counts = grow(self.counts, shape) + align(other.counts, positions, shape)
+        for measure in self.measures:
+            self.sums[measure] = grow(self.sums[measure], shape) + align(other.sums[measure], positions, shape)
+        return self
+
+    def _selector(self, categories, score_range):
+        axes = []
+        for col in self.dims:
+            selected = (categories or {}).get(col)
+            labels = self.labels[col]
+            if selected:
+                axes.append([labels.index(v) for v in selected if v in labels])
+            else:
+                axes.append(range(len(labels)))
+        lo, hi = score_range if score_range is not None else (0, self.shape[-1] - 1)
+        # Scores are integers: a fractional bound admits the whole scores inside it.
+        axes.append(range(max(math.ceil(lo), 0), min(math.floor(hi), self.shape[-1] - 1) + 1))
+        return np.ix_(*[np.asarray(axis, dtype=np.intp) for axis in axes])
+
+    def query(self, categories=None, score_range=None):
+        """
+        Count and per-measure means for the cells matching ``categories``
+        ({column: selected values}, empty = all) and the inclusive ``score_range`` on
+        the score dimension. Means are NaN when no student matches.
+        """
+        cells = self._selector(categories, score_range)
+        count = int(self.counts[cells].sum())
+        means = {
+            measure: (self.sums[measure][cells].sum() / count) if count else float("nan")
+            for measure in self.measures
+        }
+        return {"count": count, "means": means}
+
@@ -0,0 +1,81 @@
+# core/data.py
+"""
+Typed loader for the Students Performance dataset.
+
+Every page used to parse the CSV on its own with default dtypes, which stored the
+five text columns as Python objects and kept one cached copy per page. This module
+parses it with explicit dtypes instead (other datasets get theirs inferred by
+core/registry.py):
+
+  - category : gender, race/ethnicity, parental level of education, lunch,
+               test preparation course
+  - uint8    : math score, reading score, writing score
+
+A dataset may also carry one time column (``TIME_COLUMNS``: a cohort, year or term),
+which the registry uses for the per-period aggregates of the Trends page.
+
+After the first parse the typed columns are also written to a binary sidecar
+(see core/columnar.py), so cold starts skip CSV parsing entirely. Loaded datasets
+are cached by core/registry.py.
+"""
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from core import columnar
+
+ROOT = Path(__file__).resolve().parent.parent
+# APP_DATA_DIR points the app at another data folder (e.g. synthetic load-test data).
+DATA_DIR = Path(os.environ.get("APP_DATA_DIR", ROOT / "data"))
+CSV_PATH = DATA_DIR / "StudentsPerformance.csv"
+
+CATEGORY_COLUMNS = [
+    "gender",
+    "race/ethnicity",
+    "parental level of education",
+    "lunch",
+    "test preparation course",
+]
+SCORE_COLUMNS = ["math score", "reading score", "writing score"]
+
+# Recognised names of an optional time column (matched case-insensitively).
+TIME_COLUMNS = ("year", "cohort", "term")
+
+DTYPES = {
+    **{col: "category" for col in CATEGORY_COLUMNS},
+    **{col: "uint8" for col in SCORE_COLUMNS},
+}
+
+
+def read_typed_csv(path=CSV_PATH, dtypes=None, **kwargs):
+    """
+    Parses a CSV with an explicit column layout (``DTYPES`` for the Students
+    Performance schema). Raises FileNotFoundError if the file is missing.
+    """
+    return pd.read_csv(path, dtype=DTYPES if dtypes is None else dtypes, **kwargs)
+
+
+def load_typed(path=CSV_PATH, dtypes=None):
+    """
+    Loads the typed dataset from its columnar sidecar when one matches the CSV,
+    otherwise parses the CSV and (re)writes the sidecar. A sidecar that can't be
+    written (read-only disk, permissions) just means the next load parses again.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(path)
+
+    df = columnar.read_sidecar(path)
+    if df is not None:
+        return df
+
+    df = read_typed_csv(path, dtypes)
+    try:
+        columnar.write_sidecar(path, df)
+    except OSError:
+        return df
+    # Hand out the memory-mapped copy, so even the process that parsed the CSV shares
+    # its columns with every other process instead of keeping a private frame.
+    mapped = columnar.read_sidecar(path)
+    return mapped if mapped is not None else df
@@ -0,0 +1,295 @@
+# core/export.py
+"""
+Bulk export of a filtered subset and its charts as one zip archive, built in the background.
+
+The Dashboard submits the dataset, the positions of the rows that pass its filters
+and chart selections, and the figures it currently shows. The job then runs on the
+export pool (``APP_EXPORT_WORKERS`` threads, default ``auto``: one per CPU; shared
+by every session), so exports from different sessions run side by side:
+
+  - the rows are streamed out ``CHUNK_ROWS`` at a time in each requested format:
+    CSV, Parquet or Arrow IPC. Only one chunk of the subset is ever copied out of
+    the frame. Parquet and Arrow need pyarrow, which also writes the CSV when it's
+    installed (pandas otherwise);
+  - every figure is rendered to PNG and/or SVG by one long-lived Kaleido renderer
+    (``ImageRenderer``): its headless browser starts with the first image and is
+    reused by every later one, instead of a cold start per image;
+  - the files and a manifest of the filters, selection and row count are zipped.
+
+Jobs run outside the script thread, so neither the page nor other sessions wait for
+them; pyarrow and the renderer do the heavy lifting with the GIL released. Archives
+are kept in a temporary folder for ``KEEP_SECONDS`` after they're finished; the
+folder itself is removed when the process exits. Chart
+images need the ``kaleido`` package (and a Chrome it can use); without it no image
+formats are offered, and if rendering fails the archive holds the data files and
+the manifest notes that images were skipped.
+"""
+import atexit
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import streamlit as st
+
+from core.figures import static_figure
+from core.metrics import stage
+
+DATA_FORMATS = ("csv", "parquet", "arrow")
+IMAGE_FORMATS = ("png", "svg")
+CHUNK_ROWS = 100_000
+
+
+def _workers_from_env():
+    value = os.environ.get("APP_EXPORT_WORKERS", "auto").strip().lower()
+    if value == "auto":
+        return os.cpu_count() or 1
+    return int(value)
+
+
+EXPORT_WORKERS = _workers_from_env()
+KEEP_SECONDS = 3600
+IMAGE_SIZE = (1000, 600)
+# Files that are compressed already go into the archive as they are.
+STORED_SUFFIXES = {".parquet", ".arrow", ".png"}
+
+
+def available_formats():
+    """The data formats this environment can write (Parquet and Arrow need pyarrow)."""
+    return DATA_FORMATS if importlib.util.find_spec("pyarrow") is not None else ("csv",)
+
+
+def available_image_formats():
+    """The chart image formats this environment can render (all of them need kaleido)."""
+    return IMAGE_FORMATS if importlib.util.find_spec("kaleido") is not None else ()
+
+
+# ---------- Data files ----------
+class _PandasCsvWriter:
+    def __init__(self, path, frame):
+        self._fh = open(path, "w", encoding="utf-8", newline="")
+        self._header = True
+
+    def write(self, chunk):
+        chunk.to_csv(self._fh, header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        self._fh.close()
+
+
+class _ArrowWriter:
+    """CSV, Parquet or Arrow IPC through pyarrow, one record batch per chunk."""
+
+    def __init__(self, path, fmt, frame):
+        import pyarrow as pa
+
+        self._pa = pa
+        # Every chunk gets the frame's schema (category columns keep all their categories).
+        self._schema = pa.Schema.from_pandas(frame.iloc[:0], preserve_index=False)
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(str(path), self._schema)
+        elif fmt == "arrow":
+            self._writer = pa.ipc.new_file(str(path), self._schema)
+        else:
+            import pyarrow.csv as pcsv
+
+            self._writer = pcsv.CSVWriter(str(path), self._schema)
+
+    def write(self, chunk):
+        self._writer.write_table(self._pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_writer(path, fmt, frame):
+    """A chunk writer for ``fmt`` at ``path`` (``write(chunk)``, then ``close()``)."""
+    if fmt not in DATA_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}.")
+    if fmt == "csv" and "parquet" not in available_formats():
+        return _PandasCsvWriter(path, frame)
+    return _ArrowWriter(path, fmt, frame)
+
+
+def write_rows(frame, rows, path, fmt, chunk_rows=CHUNK_ROWS, progress=None):
+    """
+    Writes the ``rows`` of ``frame`` (positions) to ``path`` as ``fmt``, copying out
+    ``chunk_rows`` rows at a time; ``progress(n)`` is called after each chunk.
+    """
+    writer = open_writer(path, fmt, frame)
+    try:
+        for start in range(0, len(rows), chunk_rows):
+            chunk = frame.take(rows[start:start + chunk_rows])
+            writer.write(chunk)
+            if progress is not None:
+                progress(len(chunk))
+        if len(rows) == 0:
+            writer.write(frame.iloc[:0])
+    finally:
+        writer.close()
+
+
+# ---------- Chart images ----------
+class ImageRenderer:
+    """
+    One Kaleido renderer for the process. Its browser is started with the first image
+    (about a second) and kept for every later one (tens of milliseconds each); it is
+    stopped when the process exits. Renders one image at a time.
+    """
+
+    def __init__(self, size=IMAGE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._started = False
+
+    def render(self, fig, fmt):
+        """``fig`` as ``fmt`` ("png" or "svg") bytes; ImportError without kaleido."""
+        import kaleido
+        import plotly.io as pio
+
+        width, height = self.size
+        with self._lock:
+            if not self._started:
+                # Older Kaleido versions have no persistent renderer and start one per image.
+                start = getattr(kaleido, "start_sync_server", None)
+                if start is not None:
+                    start()
+                    atexit.register(kaleido.stop_sync_server)
+                self._started = True
+            return pio.to_image(static_figure(fig), format=fmt, width=width, height=height)
+
+
+# ---------- Jobs ----------
+class ExportManager:
+    """Export jobs of every session: a bounded worker pool, the jobs' states and their archives."""
+
+    def __init__(self, workers=EXPORT_WORKERS, folder=None):
+        # Without a folder, archives go to a temporary one removed with the manager (or at exit).
+        self._tmp = None if folder else tempfile.TemporaryDirectory(prefix="student_app_exports_")
+        self.folder = Path(folder or self._tmp.name)
+        self.renderer = ImageRenderer()
+        self._pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="export")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name, frame, rows, data_formats=("csv",), figures=None, image_formats=(), manifest=None):
+        """
+        Queues an export of the ``rows`` of ``frame`` in ``data_formats`` plus
+        ``figures`` ({chart name: figure}) in ``image_formats``; returns the job id.
+        ``manifest`` (filters, selection, ...) is saved in the archive as manifest.json.
+        """
+        unknown = set(data_formats) - set(available_formats())
+        if unknown:
+            raise ValueError(f"Can't export {', '.join(sorted(unknown))} here (they need pyarrow).")
+        self._prune()
+        figures = dict(figures or {}) if image_formats else {}
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "state": "queued",
+            "file_name": f"{name}_export_{datetime.now():%Y%m%d_%H%M%S}.zip",
+            "rows": len(rows),
+            "rows_total": len(rows) * len(data_formats),
+            "rows_written": 0,
+            "images_total": len(figures) * len(image_formats),
+            "images_written": 0,
+            "notes": [],
+            "path": None,
+            "bytes": 0,
+            "error": None,
+            "finished": None,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+        self._pool.submit(
+            self._run, job, name, frame, rows, tuple(data_formats), figures, tuple(image_formats), dict(manifest or {})
+        )
+        return job["id"]
+
+    def status(self, job_id):
+        """A snapshot of job ``job_id`` (None once it's gone)."""
+        self._prune()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, notes=list(job["notes"])) if job is not None else None
+
+    def _update(self, job, **changes):
+        """Applies ``changes`` to ``job`` under the lock: counters and notes accumulate, the rest is replaced."""
+        with self._lock:
+            for key, value in changes.items():
+                job[key] = job[key] + value if key in ("rows_written", "images_written", "notes") else value
+
+    def _run(self, job, name, frame, rows, data_formats, figures, image_formats, manifest):
+        self._update(job, state="running")
+        work = self.folder / job["id"]
+        try:
+            work.mkdir(parents=True)
+            files = []
+            with stage("export/rows"):
+                for fmt in data_formats:
+                    path = work / f"{name}.{fmt}"
+                    write_rows(frame, rows, path, fmt, progress=lambda n: self._update(job, rows_written=n))
+                    files.append(path)
+            if figures:
+                with stage("export/images"):
+                    try:
+                        for chart, fig in figures.items():
+                            for fmt in image_formats:
+                                path = work / f"{chart.replace('/', '_')}.{fmt}"
+                                path.write_bytes(self.renderer.render(fig, fmt))
+                                files.append(path)
+                                self._update(job, images_written=1)
+                    except ImportError:
+                        self._update(job, notes=["Chart images skipped: they need the 'kaleido' package."])
+                    except Exception as exc:  # e.g. no browser for Kaleido; keep the data files
+                        self._update(job, notes=[f"Chart images skipped: {exc}"])
+            with stage("export/archive"):
+                manifest.update(
+                    rows=len(rows),
+                    data_formats=list(data_formats),
+                    image_formats=list(image_formats),
+                    files=[path.name for path in files],
+                    notes=self.status(job["id"])["notes"],
+                    created=datetime.now().isoformat(timespec="seconds"),
+                )
+                archive = self.folder / f"{job['id']}.zip"
+                with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+                    zf.writestr("manifest.json", json.dumps(manifest, indent=1, default=str))
+                    for path in files:
+                        compress = zipfile.ZIP_STORED if path.suffix in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+                        zf.write(path, path.name, compress_type=compress)
+            self._update(job, state="done", path=archive, bytes=archive.stat().st_size, finished=time.time())
+        except Exception as exc:  # reported to the page, which shows the job as failed
+            self._update(job, state="failed", error=f"{type(exc).__name__}: {exc}", finished=time.time())
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+    def _prune(self):
+        """Forgets finished jobs older than ``KEEP_SECONDS`` and deletes their archives."""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job["finished"] is not None and now - job["finished"] > KEEP_SECONDS
+            ]
+            for job in expired:
+                del self._jobs[job["id"]]
+        for job in expired:
+            if job["path"] is not None:
+                Path(job["path"]).unlink(missing_ok=True)
+
+
+@st.cache_resource
+def get_export_manager():
+    """The export pool and jobs shared by every session in this server process."""
+    return ExportManager()
@@ -0,0 +1,141 @@
+# core/figure_cache.py
+"""
+Process-wide cache of built Plotly figures, shared by every session.
+
+Entries are keyed by chart identity plus a hash of the normalized widget/filter
+state and hold the figure's serialized JSON, compacted first (``figures.compact``).
+The dataset version in the state (``state["data"]``, a ``DatasetInfo.key``) also
+prefixes the key in clear, so when a dataset is reloaded or refreshed the dataset
+cache (core/registry.py) forgets just the figures of the version it replaced.
+The cache is bounded by the total size of that JSON and evicts the least recently
+used figures first.
+Hit/miss/eviction counters are kept for monitoring.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+import streamlit as st
+
+from core.figures import compact
+from core.metrics import record_figure, stage
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _normalize(value):
+    """
+    JSON-friendly canonical form of widget state. Dict keys are sorted; lists and
+    sets are treated as unordered selections (multiselects), tuples keep their order
+    (ranges); numpy scalars become Python numbers.
+    """
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, set, frozenset)):
+        return sorted((_normalize(v) for v in value), key=repr)
+    if isinstance(value, tuple):
+        return [_normalize(v) for v in value]
+    if hasattr(value, "item") and callable(value.item):
+        return value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def state_key(chart, state=None):
+    payload = json.dumps([chart, _normalize(state)], sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    data = state.get("data") if isinstance(state, dict) else None
+    return digest if data is None else f"{data}/{digest}"
+
+
+class FigureCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            self._entries[key] = payload
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """Drops every figure (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def forget(self, data_key):
+        """Drops the figures built from dataset version ``data_key`` (their ``state["data"]``)."""
+        prefix = f"{data_key}/"
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._bytes -= len(self._entries.pop(key))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+@st.cache_resource
+def get_figure_cache():
+    """The figure cache shared by every session in this server process."""
+    return FigureCache()
+
+
+def cached_figure(chart, state, build):
+    """
+    Returns the figure for ``chart`` in ``state``, calling ``build()`` only on a
+    cache miss. ``state`` should contain everything the figure depends on (dataset,
+    filters, slider values). Every call returns a fresh figure object, so callers
+    may modify it without affecting the cache.
+    """
+    cache = get_figure_cache()
+    key = state_key(chart, state)
+    payload = cache.get(key)
+    if payload is None:
+        with stage(f"{chart}/build"):
+            fig = compact(build())
+        with stage(f"{chart}/serialize"):
+            payload = fig.to_json()
+        cache.put(key, payload)
+        record_figure(chart, False, len(payload))
+        return fig
+    record_figure(chart, True, len(payload))
+    with stage(f"{chart}/deserialize"):
+        return pio.from_json(payload)
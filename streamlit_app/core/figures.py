@@ -0,0 +1,378 @@
+# core/figures.py
+"""
+Figure builders shared by the Charts Gallery and the Dashboard.
+
+The scatter builder keeps the payload sent to the browser bounded:
+
+  - up to ``max_points`` rows are drawn as-is (WebGL above ``webgl_threshold``);
+  - above that, integer scores are collapsed to one marker per distinct
+    (x, y, color) with a student count, sized by that count. Every occupied cell
+    is kept, so the picture of where students are is unchanged; non-integer
+    columns fall back to a uniform random sample of ``max_points`` rows;
+  - ``mode="heatmap"`` bins x/y on the integer grid server-side and sends only
+    the count matrix.
+
+Hover details beyond x/y/color are opt-in per column (``hover_cols``) and only
+kept while rows are drawn individually and there are few of them. Numeric hover
+columns go into ``customdata``; categorical ones are sent as category codes: the
+rows are split into one trace per combination of their values, and each value is
+written once into its trace's hover template rather than once per point.
+
+Histograms are drawn as bar traces from pre-binned counts (see core/histogram.py)
+and box plots from precomputed statistics (see core/quantiles.py), so neither sends
+raw scores to the browser.
+
+Every figure served through the figure cache is passed through ``compact`` first:
+its template is cut down to the trace types it draws (``slim_template``, built once
+per template and set of types) and its numeric arrays are narrowed to the smallest
+dtype that holds them, which Plotly (6 and later) sends as base64 typed arrays
+instead of JSON lists. Set ``APP_SLIM_FIGURES=0`` to send figures as built.
+
+``plotly.express`` takes about ten times longer to import than ``graph_objects``, so
+it's imported only by the builders that use it, on their first cache miss.
+"""
+import functools
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from core.histogram import rebin
+
+WEBGL_THRESHOLD = 5_000
+MAX_POINTS = 20_000
+HOVER_DETAIL_ROWS = 5_000
+BOX_COLOR = "#636efa"  # first color of Plotly's default colorway, as px.box uses
+# Most traces a point scatter is split into for its categorical hover columns; the
+# last hover columns are dropped until the split fits.
+MAX_HOVER_TRACES = 60
+SLIM_FIGURES = os.environ.get("APP_SLIM_FIGURES", "1") != "0"
+# Trace properties holding one value per point (or bin / cell).
+ARRAY_PROPERTIES = ("x", "y", "z", "customdata")
+
+
+def _is_integer(series):
+    return series.dtype.kind in "ui"
+
+
+def _aggregate_points(df, x, y, color):
+    """One row per distinct (color, x, y) with the number of students in it."""
+    keys = [color] if color else []
+    grouped = df.groupby(keys + [x, y], observed=True, sort=False).size()
+    return grouped.rename("students").reset_index()
+
+
+def _colorway():
+    """Discrete colors as plotly.express picks them: the default template's, else D3."""
+    from plotly.colors import qualitative
+
+    template = pio.templates[pio.templates.default] if pio.templates.default else None
+    colorway = template.layout.colorway if template is not None else None
+    return list(colorway or qualitative.D3)
+
+
+def _color_map(values):
+    """
+    {value: color} over every category of ``values`` (in category order), so a group
+    keeps its color whichever groups a filter leaves and however the rows are drawn.
+    """
+    categories = values.cat.categories if values.dtype == "category" else sorted(values.dropna().unique())
+    colorway = _colorway()
+    return {value: colorway[i % len(colorway)] for i, value in enumerate(categories)}
+
+
+def _point_figure(df, x, y, color, title, labels, hover_cols, webgl):
+    """One marker per row, split into a trace per color and categorical hover value."""
+    numeric = [c for c in hover_cols if df[c].dtype.kind in "iuf"]
+    categorical = [c for c in hover_cols if c not in numeric]
+    color_keys = [color] if color else []
+    while categorical and df.groupby(color_keys + categorical, observed=True).ngroups > MAX_HOVER_TRACES:
+        categorical.pop()
+    keys = color_keys + categorical
+    if keys:
+        groups = df.groupby(keys, observed=True, sort=True).indices
+    else:
+        groups = {(): np.arange(len(df))}
+    colors = _color_map(df[color]) if color else {}
+
+    xs, ys = df[x].to_numpy(), df[y].to_numpy()
+    custom = df[numeric].to_numpy() if numeric else None
+    point_hover = f"{labels.get(x, x)}=%{{x}}<br>{labels.get(y, y)}=%{{y}}" + "".join(
+        f"<br>{labels.get(col, col)}=%{{customdata[{i}]}}" for i, col in enumerate(numeric)
+    )
+    trace_type = go.Scattergl if webgl else go.Scatter
+    traces, shown = [], set()
+    for key, rows in groups.items():
+        values = dict(zip(keys, key if isinstance(key, tuple) else (key,)))
+        name = str(values[color]) if color else ""
+        color_hover = f"{labels.get(color, color)}={name}<br>" if color else ""
+        category_hover = "".join(f"<br>{labels.get(col, col)}={values[col]}" for col in categorical)
+        traces.append(
+            trace_type(
+                x=xs[rows],
+                y=ys[rows],
+                customdata=custom[rows] if custom is not None else None,
+                mode="markers",
+                name=name,
+                legendgroup=name,
+                showlegend=bool(color) and name not in shown,
+                marker_color=colors.get(values[color]) if color else None,
+                hovertemplate=color_hover + point_hover + category_hover + "<extra></extra>",
+            )
+        )
+        shown.add(name)
+    fig = go.Figure(traces)
+    fig.update_layout(
+        title=title,
+        xaxis_title=labels.get(x, x),
+        yaxis_title=labels.get(y, y),
+        legend_title_text=labels.get(color, color) if color else None,
+        legend_tracegroupgap=0,
+    )
+    return fig
+
+
+def scatter_figure(
+    df,
+    x,
+    y,
+    color=None,
+    title=None,
+    labels=None,
+    hover_cols=(),
+    mode="auto",
+    webgl_threshold=WEBGL_THRESHOLD,
+    max_points=MAX_POINTS,
+):
+    """
+    Scatter of ``y`` against ``x`` that switches rendering strategy with the row
+    count. ``mode`` is "auto" (points, then aggregated markers) or "heatmap".
+    ``hover_cols`` are the extra columns to show on hover.
+    """
+    labels = dict(labels or {})
+    if mode == "heatmap":
+        return density_heatmap(df, x, y, title=title, labels=labels)
+
+    n_rows = len(df)
+    if n_rows <= max_points:
+        hover = [c for c in hover_cols if c not in (x, y, color)] if n_rows <= HOVER_DETAIL_ROWS else []
+        return _point_figure(df, x, y, color, title, labels, hover, webgl=n_rows > webgl_threshold)
+
+    import plotly.express as px
+
+    color_map = _color_map(df[color]) if color else None
+    if _is_integer(df[x]) and _is_integer(df[y]):
+        points = _aggregate_points(df, x, y, color)
+        labels.setdefault("students", "Students")
+        fig = px.scatter(
+            points,
+            x=x,
+            y=y,
+            color=color,
+            color_discrete_map=color_map,
+            size="students",
+            size_max=14,
+            title=title,
+            labels=labels,
+            render_mode="webgl" if len(points) > webgl_threshold else "auto",
+        )
+        fig.update_traces(marker_sizemin=2)
+        return fig
+
+    sample = df.sample(n=max_points, random_state=0)
+    return px.scatter(
+        sample,
+        x=x,
+        y=y,
+        color=color,
+        color_discrete_map=color_map,
+        title=f"{title} (random sample of {max_points:,} of {n_rows:,})" if title else None,
+        labels=labels,
+        render_mode="webgl",
+    )
+
+
+def density_heatmap(df, x, y, title=None, labels=None):
+    """Student counts on the integer (x, y) grid, binned on the server."""
+    from plotly.colors import sequential
+
+    labels = labels or {}
+    xs = df[x].to_numpy()
+    ys = df[y].to_numpy()
+    if not (_is_integer(df[x]) and _is_integer(df[y])):
+        counts, x_edges, y_edges = np.histogram2d(xs, ys, bins=100)
+        x_axis = (x_edges[:-1] + x_edges[1:]) / 2
+        y_axis = (y_edges[:-1] + y_edges[1:]) / 2
+    else:
+        size = int(max(xs.max(initial=0), ys.max(initial=0))) + 1
+        flat = np.bincount(xs.astype(np.int64) * size + ys, minlength=size * size)
+        counts = flat.reshape(size, size)
+        x_axis = y_axis = np.arange(size, dtype=np.uint8 if size <= 256 else np.int64)
+
+    # Counts are sent as integers (see compact); empty cells are left blank by giving
+    # zero its own transparent color below the Viridis scale, rather than sending NaNs.
+    viridis = sequential.Viridis
+    gap = 1e-6
+    colorscale = [[0.0, "rgba(0, 0, 0, 0)"]] + [
+        [gap + (1 - gap) * i / (len(viridis) - 1), c] for i, c in enumerate(viridis)
+    ]
+    fig = go.Figure(
+        go.Heatmap(
+            x=x_axis,
+            y=y_axis,
+            z=counts.T,
+            zmin=0,
+            colorscale=colorscale,
+            colorbar={"title": "Students"},
+            hovertemplate="x=%{x}<br>y=%{y}<br>students=%{z}<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        title=title,
+        xaxis_title=labels.get(x, x),
+        yaxis_title=labels.get(y, y),
+    )
+    return fig
+
+
+def histogram_figure(counts, nbins, x, title=None, labels=None):
+    """Histogram of the per-score ``counts`` of column ``x`` with about ``nbins`` bins."""
+    labels = labels or {}
+    starts, width, totals = rebin(counts, nbins)
+    ends = starts + width - 1
+    fig = go.Figure(
+        go.Bar(
+            x=starts + width / 2,
+            y=totals,
+            customdata=np.column_stack([starts, ends]),
+            hovertemplate="%{customdata[0]}–%{customdata[1]}: %{y}<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        title=title,
+        xaxis_title=labels.get(x, x),
+        yaxis_title=labels.get("count", "count"),
+    )
+    return fig
+
+
+def box_figure(stats_by_group, x, y, title=None, labels=None):
+    """
+    Box plot from precomputed statistics ({group: core.quantiles box stats}). Only
+    the capped outliers are drawn as points, one marker per distinct value.
+    """
+    labels = labels or {}
+    groups = [group for group, stats in stats_by_group.items() if stats is not None]
+    stats = [stats_by_group[group] for group in groups]
+    fig = go.Figure(
+        go.Box(
+            x=groups,
+            q1=[s["q1"] for s in stats],
+            median=[s["median"] for s in stats],
+            q3=[s["q3"] for s in stats],
+            lowerfence=[s["lowerfence"] for s in stats],
+            upperfence=[s["upperfence"] for s in stats],
+            mean=[s["mean"] for s in stats],
+            boxpoints=False,
+            marker_color=BOX_COLOR,
+            name=labels.get(y, y),
+            showlegend=False,
+        )
+    )
+    outlier_x, outlier_y, outlier_n = [], [], []
+    for group, s in zip(groups, stats):
+        outlier_x += [group] * len(s["outliers"])
+        outlier_y += s["outliers"].tolist()
+        outlier_n += s["outlier_counts"].tolist()
+    if outlier_y:
+        fig.add_trace(
+            go.Scatter(
+                x=outlier_x,
+                y=outlier_y,
+                customdata=outlier_n,
+                mode="markers",
+                marker_color=BOX_COLOR,
+                hovertemplate="%{y}: %{customdata} student(s)<extra>outlier</extra>",
+                showlegend=False,
+            )
+        )
+    fig.update_layout(
+        title=title,
+        xaxis_title=labels.get(x, x),
+        yaxis_title=labels.get(y, y),
+    )
+    return fig
+
+
+@functools.lru_cache(maxsize=32)
+def slim_template(name, trace_types):
+    """
+    Template ``name`` cut down to its layout and the trace defaults of ``trace_types``:
+    what a figure drawing only those traces needs from it. Built once per pair.
+    """
+    template = pio.templates[name]
+    data = {kind: template.data[kind] for kind in trace_types if kind in template.data and template.data[kind]}
+    return go.layout.Template(layout=template.layout, data=data).to_plotly_json()
+
+
+def _narrow(values):
+    """``values`` in the smallest dtype that holds them exactly (scores fit in one byte)."""
+    if not isinstance(values, np.ndarray) or values.size == 0 or values.dtype.kind not in "iuf":
+        return values
+    if values.dtype.kind == "f":
+        finite = np.isfinite(values)
+        if not (finite.all() and np.array_equal(values, np.round(values))):
+            if values.dtype == np.float64 and np.array_equal(values[finite], values[finite].astype(np.float32)):
+                return values.astype(np.float32)
+            return values
+    low, high = values.min(), values.max()
+    for dtype in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def compact(fig):
+    """
+    Shrinks the JSON of ``fig`` in place (and returns it): a slim template for the
+    trace types it draws, and per-point arrays narrowed so they go out as small typed
+    arrays. What is drawn doesn't change.
+    """
+    if not SLIM_FIGURES:
+        return fig
+    if pio.templates.default:
+        trace_types = tuple(sorted({trace.type for trace in fig.data}))
+        fig.layout.template = slim_template(pio.templates.default, trace_types)
+    for trace in fig.data:
+        for prop in ARRAY_PROPERTIES:
+            if prop in trace and isinstance(trace[prop], np.ndarray):
+                trace[prop] = _narrow(trace[prop])
+        if "marker" in trace and "size" in trace.marker and isinstance(trace.marker.size, np.ndarray):
+            trace.marker.size = _narrow(trace.marker.size)
+    return fig
+
+
+# Export template for figures rendered outside the browser (static images).
+STATIC_TEMPLATE = "plotly_white"
+# Streamlit's theme template stands in these placeholders for its categorical colors;
+# its frontend replaces them with the theme's palette when it draws the chart.
+THEME_PLACEHOLDERS = tuple(f"#{i:06d}" for i in range(1, 11))
+
+
+def static_figure(fig, template=STATIC_TEMPLATE):
+    """
+    A copy of ``fig`` that renders on its own (e.g. to PNG): a regular template in
+    place of the theme template, and theme placeholder colors swapped for that
+    template's colors.
+    """
+    static = go.Figure(fig)
+    static.layout.template = template
+    colorway = pio.templates[template].layout.colorway
+    colors = {placeholder: colorway[i % len(colorway)] for i, placeholder in enumerate(THEME_PLACEHOLDERS)}
+    for trace in static.data:
+        for part in ("marker", "line"):
+            if part in trace and "color" in trace[part] and isinstance(trace[part].color, str):
+                trace[part].color = colors.get(trace[part].color, trace[part].color)
+    return static
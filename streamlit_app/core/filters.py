@@ -0,0 +1,231 @@
+# core/filters.py
+"""
+Precomputed filter index for the Dashboard sidebar filters.
+
+Instead of copying the frame and chaining ``isin`` / comparisons on every rerun, the
+index keeps:
+
+  - one boolean mask per value of each category column, and
+  - a stable sort order of each range column, so a ``[lo, hi]`` range is two
+    ``searchsorted`` calls plus a scatter of the matching row positions.
+
+A filter is then a bitwise AND of cached masks; the full frame is never copied.
+Rows with a missing value in any category column never pass, whatever is selected,
+the same as in the KPI cube (core/cube.py), so the charts and exports show the
+rows the KPIs count.
+
+For a CSV with a columnar sidecar the index is published into the sidecar folder
+(``FilterIndex.published``) and memory-mapped from there, so every session and server
+process shares one copy of it, like the columns themselves.
+
+Rows appended by an incremental refresh (core/ingest.py) get an index of their own:
+``appended`` returns a ``SegmentedFilterIndex`` whose masks are the segments' masks
+laid end to end, so a refresh indexes only the new rows. Past ``MAX_SEGMENTS``
+segments the whole frame is indexed again in one piece.
+"""
+import numpy as np
+import pandas as pd
+
+from core import columnar
+
+INDEX_NAME = "filter-index"
+# Layout version of the published index: 2 added the complete-rows mask.
+INDEX_FORMAT = 2
+MAX_SEGMENTS = 8
+
+
+class FilterIndex:
+    def __init__(self, df, category_columns, range_columns):
+        self.n_rows = len(df)
+        self.category_masks = {}
+        # Rows with every category column present; None when nothing is missing.
+        self.complete = None
+        for col in category_columns:
+            if col not in df.columns:
+                continue
+            series = df[col]
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype("category")
+            codes = series.cat.codes.to_numpy()
+            if (codes < 0).any():
+                self.complete = (codes >= 0) if self.complete is None else self.complete & (codes >= 0)
+            self.category_masks[col] = {
+                value: codes == i for i, value in enumerate(series.cat.categories)
+            }
+
+        index_dtype = np.uint32 if self.n_rows < 2**32 else np.int64
+        self.sorted_ranges = {}
+        for col in range_columns:
+            if col not in df.columns:
+                continue
+            values = df[col].to_numpy()
+            order = np.argsort(values, kind="stable").astype(index_dtype, copy=False)
+            self.sorted_ranges[col] = (order, values[order])
+
+    @classmethod
+    def published(cls, df, folder, category_columns, range_columns):
+        """
+        The index of ``df`` read from ``folder`` (memory-mapped), built and published
+        there first if it's missing or was built for other columns. Falls back to a
+        private index when the folder can't be written.
+        """
+        wanted = {
+            "format": INDEX_FORMAT,
+            "rows": len(df),
+            "categories": [col for col in category_columns if col in df.columns],
+            "ranges": [col for col in range_columns if col in df.columns],
+        }
+        found = columnar.read_arrays(folder, INDEX_NAME)
+        if found is not None and all(found[0].get(key) == value for key, value in wanted.items()):
+            return cls._from_arrays(*found)
+        index = cls(df, category_columns, range_columns)
+        try:
+            columnar.publish_arrays(folder, INDEX_NAME, *index._to_arrays())
+        except OSError:
+            return index
+        found = columnar.read_arrays(folder, INDEX_NAME)
+        return index if found is None else cls._from_arrays(*found)
+
+    def _to_arrays(self):
+        meta = {
+            "format": INDEX_FORMAT,
+            "rows": self.n_rows,
+            "complete": self.complete is not None,
+            "categories": list(self.category_masks),
+            "ranges": list(self.sorted_ranges),
+            "values": {
+                col: [value.item() if isinstance(value, np.generic) else value for value in masks]
+                for col, masks in self.category_masks.items()
+            },
+        }
+        arrays = {} if self.complete is None else {"complete": self.complete}
+        for col, masks in self.category_masks.items():
+            for i, mask in enumerate(masks.values()):
+                arrays[f"mask/{col}/{i}"] = mask
+        for col, (order, sorted_values) in self.sorted_ranges.items():
+            arrays[f"order/{col}"] = order
+            arrays[f"sorted/{col}"] = sorted_values
+        return meta, arrays
+
+    @classmethod
+    def _from_arrays(cls, meta, arrays):
+        index = cls.__new__(cls)
+        index.n_rows = meta["rows"]
+        index.complete = arrays["complete"] if meta["complete"] else None
+        index.category_masks = {
+            col: {value: arrays[f"mask/{col}/{i}"] for i, value in enumerate(meta["values"][col])}
+            for col in meta["categories"]
+        }
+        index.sorted_ranges = {
+            col: (arrays[f"order/{col}"], arrays[f"sorted/{col}"]) for col in meta["ranges"]
+        }
+        return index
+
+    @property
+    def nbytes(self):
+        masks = sum(m.nbytes for col in self.category_masks.values() for m in col.values())
+        ranges = sum(o.nbytes + v.nbytes for o, v in self.sorted_ranges.values())
+        return masks + ranges + (self.complete.nbytes if self.complete is not None else 0)
+
+    def values(self, col):
+        """Category values of ``col`` that occur at least once."""
+        return [value for value, mask in self.category_masks[col].items() if mask.any()]
+
+    def value_range(self, col):
+        sorted_values = self.sorted_ranges[col][1]
+        return sorted_values[0].item(), sorted_values[-1].item()
+
+    def category_mask(self, col, selected):
+        """
+        Rows whose ``col`` is one of ``selected``, or None when the selection doesn't
+        restrict anything (empty, or every value selected; rows with a missing value
+        are left to ``mask``). The result may be a cached mask and must not be
+        modified in place.
+        """
+        masks = self.category_masks[col]
+        chosen = [masks[value] for value in set(selected) if value in masks]
+        if not selected or len(chosen) == len(masks):
+            return None
+        if not chosen:
+            return np.zeros(self.n_rows, dtype=bool)
+        if len(chosen) == 1:
+            return chosen[0]
+        return np.logical_or.reduce(chosen)
+
+    def range_mask(self, col, lo, hi):
+        """Rows with ``lo <= col <= hi``, or None when the range covers every row."""
+        order, sorted_values = self.sorted_ranges[col]
+        start = np.searchsorted(sorted_values, lo, side="left")
+        stop = np.searchsorted(sorted_values, hi, side="right")
+        if start == 0 and stop == self.n_rows:
+            return None
+        # Scatter whichever side is smaller: the matching rows or their complement.
+        if stop - start <= self.n_rows // 2:
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[order[start:stop]] = True
+        else:
+            mask = np.ones(self.n_rows, dtype=bool)
+            mask[order[:start]] = False
+            mask[order[stop:]] = False
+        return mask
+
+    def mask(self, categories=None, ranges=None):
+        """
+        Combined boolean mask for ``categories`` ({column: selected values}) and
+        ``ranges`` ({column: (lo, hi)}), without rows that miss a category value.
+        Always returns a fresh array.
+        """
+        parts = [self.complete]
+        parts += [self.category_mask(col, sel) for col, sel in (categories or {}).items()]
+        parts += [self.range_mask(col, lo, hi) for col, (lo, hi) in (ranges or {}).items()]
+        parts = [part for part in parts if part is not None]
+        if not parts:
+            return np.ones(self.n_rows, dtype=bool)
+        combined = parts[0].copy()
+        for part in parts[1:]:
+            combined &= part
+        return combined
+
+    def rows(self, categories=None, ranges=None):
+        """Positions of the rows that pass the filters."""
+        return np.flatnonzero(self.mask(categories, ranges))
+
+    def appended(self, rows, frame):
+        """Index of ``frame``, which is this index's rows followed by ``rows``."""
+        return SegmentedFilterIndex([self]).appended(rows, frame)
+
+
+class SegmentedFilterIndex:
+    """The FilterIndex interface over consecutive row segments, each with its own index."""
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.n_rows = sum(segment.n_rows for segment in segments)
+
+    @property
+    def nbytes(self):
+        return sum(segment.nbytes for segment in self.segments)
+
+    def values(self, col):
+        values = {}
+        for segment in self.segments:
+            values.update(dict.fromkeys(segment.values(col)))
+        return list(values)
+
+    def value_range(self, col):
+        ranges = [segment.value_range(col) for segment in self.segments if segment.n_rows]
+        return min(lo for lo, _ in ranges), max(hi for _, hi in ranges)
+
+    def mask(self, categories=None, ranges=None):
+        return np.concatenate([segment.mask(categories, ranges) for segment in self.segments])
+
+    def rows(self, categories=None, ranges=None):
+        return np.flatnonzero(self.mask(categories, ranges))
+
+    def appended(self, rows, frame):
+        first = self.segments[0]
+        category_columns, range_columns = list(first.category_masks), list(first.sorted_ranges)
+        if len(self.segments) >= MAX_SEGMENTS:
+            return FilterIndex(frame, category_columns, range_columns)
+        return SegmentedFilterIndex(self.segments + [FilterIndex(rows, category_columns, range_columns)])
+
@@ -0,0 +1,135 @@
+# core/grid.py
+"""
+2D grid index over the two scatter columns, for resolving chart selections.
+
+Scores are small integers, so the (x, y) plane of the Dashboard scatter is a grid
+of at most 256 x 256 cells. The index keeps the row positions grouped by cell (a
+stable sort by cell number) and where each cell's rows start, so:
+
+  - a box, lasso or clicked points from a Plotly selection event become a set of
+    cells (lasso: the cells whose centre lies inside the polygon; only occupied
+    cells are tested), and
+  - the rows of any set of cells are slices of one array, gathered without looking
+    at the other rows.
+
+A selection therefore costs about the number of cells plus the number of selected
+rows, never a scan of the frame. Like the filter index, the grid index is published
+into the columnar sidecar folder (``GridIndex.published``) and memory-mapped, so
+server processes share it.
+"""
+import numpy as np
+
+from core import columnar
+
+INDEX_NAME = "grid-index"
+
+
+class GridIndex:
+    def __init__(self, x_values, y_values):
+        x_values = np.asarray(x_values)
+        y_values = np.asarray(y_values)
+        self.n_rows = len(x_values)
+        self.shape = (int(x_values.max()) + 1 if self.n_rows else 1, int(y_values.max()) + 1 if self.n_rows else 1)
+        cells = x_values.astype(np.int32) * self.shape[1] + y_values
+        index_dtype = np.uint32 if self.n_rows < 2**32 else np.int64
+        self.order = np.argsort(cells, kind="stable").astype(index_dtype, copy=False)
+        counts = np.bincount(cells, minlength=self.shape[0] * self.shape[1])
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    @classmethod
+    def published(cls, df, folder, x, y):
+        """
+        The grid index of columns ``x`` and ``y`` of ``df``, read from ``folder``
+        (memory-mapped) or built and published there first. Falls back to a private
+        index when the folder can't be written.
+        """
+        wanted = {"rows": len(df), "columns": [x, y]}
+        found = columnar.read_arrays(folder, INDEX_NAME)
+        if found is not None and all(found[0].get(key) == value for key, value in wanted.items()):
+            return cls._from_arrays(*found)
+        index = cls(df[x].to_numpy(), df[y].to_numpy())
+        try:
+            columnar.publish_arrays(
+                folder, INDEX_NAME, {**wanted, "shape": list(index.shape)},
+                {"order": index.order, "offsets": index.offsets},
+            )
+        except OSError:
+            return index
+        found = columnar.read_arrays(folder, INDEX_NAME)
+        return index if found is None else cls._from_arrays(*found)
+
+    @classmethod
+    def _from_arrays(cls, meta, arrays):
+        index = cls.__new__(cls)
+        index.n_rows = meta["rows"]
+        index.shape = tuple(meta["shape"])
+        index.order = arrays["order"]
+        index.offsets = arrays["offsets"]
+        return index
+
+    @property
+    def nbytes(self):
+        return self.order.nbytes + self.offsets.nbytes
+
+    def _occupied(self):
+        """(flat cell numbers, x, y) of the cells that hold at least one row."""
+        cells = np.flatnonzero(np.diff(self.offsets))
+        return cells, cells // self.shape[1], cells % self.shape[1]
+
+    def cells_in_box(self, x_range, y_range):
+        """Occupied cells with ``x`` and ``y`` inside the (inclusive, unordered) ranges."""
+        cells, xs, ys = self._occupied()
+        (x0, x1), (y0, y1) = sorted(x_range), sorted(y_range)
+        return cells[(xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)]
+
+    def cells_in_lasso(self, x_points, y_points):
+        """Occupied cells whose centre lies inside the polygon (even-odd rule)."""
+        cells, xs, ys = self._occupied()
+        px, py = np.asarray(x_points, dtype=np.float64), np.asarray(y_points, dtype=np.float64)
+        if len(px) < 3:
+            return cells[:0]
+        near = (xs >= px.min()) & (xs <= px.max()) & (ys >= py.min()) & (ys <= py.max())
+        cells, xs, ys = cells[near], xs[near], ys[near]
+        inside = np.zeros(len(cells), dtype=bool)
+        for ax, ay, bx, by in zip(px, py, np.roll(px, 1), np.roll(py, 1)):
+            crosses = (ay > ys) != (by > ys)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                at_x = ax + (ys - ay) * (bx - ax) / (by - ay)
+            inside ^= crosses & (xs < at_x)
+        return cells[inside]
+
+    def cells_at(self, x_points, y_points):
+        """The cells of the given points (e.g. clicked markers), rounded to the grid."""
+        xs = np.rint(np.asarray(x_points, dtype=np.float64)).astype(np.int64)
+        ys = np.rint(np.asarray(y_points, dtype=np.float64)).astype(np.int64)
+        valid = (xs >= 0) & (xs < self.shape[0]) & (ys >= 0) & (ys < self.shape[1])
+        return np.unique(xs[valid] * self.shape[1] + ys[valid])
+
+    def cells_from_selection(self, selection):
+        """
+        Cells of a Plotly selection (the ``selection`` of a ``st.plotly_chart`` event):
+        the union of its boxes and lassos, or of its clicked points when it has neither.
+        """
+        parts = [self.cells_in_box(box["x"], box["y"]) for box in selection.get("box", []) if box.get("x")]
+        parts += [self.cells_in_lasso(lasso["x"], lasso["y"]) for lasso in selection.get("lasso", []) if lasso.get("x")]
+        if not parts:
+            points = [point for point in selection.get("points", []) if "x" in point and "y" in point]
+            parts.append(self.cells_at([point["x"] for point in points], [point["y"] for point in points]))
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+    def cells_at_least(self, axis, floor):
+        """Occupied cells whose coordinate on ``axis`` (0: x, 1: y) is at least ``floor``."""
+        cells, xs, ys = self._occupied()
+        return cells[(xs if axis == 0 else ys) >= floor]
+
+    def rows(self, cells):
+        """Sorted positions of the rows in ``cells``."""
+        cells = np.asarray(cells, dtype=np.int64)
+        starts, stops = self.offsets[cells], self.offsets[cells + 1]
+        lengths = stops - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int64)
+        # One gather for every cell's slice of ``order``: position k of cell i is starts[i] + k.
+        shifts = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        return np.sort(self.order[np.arange(total) + shifts])
@@ -0,0 +1,37 @@
+# core/histogram.py
+"""
+Pre-binned score histograms.
+
+Scores are bounded integers, so one ``np.bincount`` over 0–100 holds everything a
+histogram needs (``AggregateStore.score_counts``). Re-binning those 101 counts to any
+number of bins is O(101), which keeps the Charts Gallery bin slider independent of
+the number of students.
+"""
+import numpy as np
+
+
+def rebin(counts, nbins):
+    """
+    Groups per-score ``counts`` into about ``nbins`` equal-width bins of whole
+    scores. Like Plotly's ``nbins`` this is a target, not an exact count: bins are
+    aligned to multiples of the width, which can add one bin at the edge, and only
+    the occupied score range is covered.
+
+    Returns ``(starts, width, totals)`` where bin ``i`` holds scores
+    ``starts[i] .. starts[i] + width - 1``.
+    """
+    occupied = np.flatnonzero(counts)
+    if occupied.size == 0:
+        return np.array([], dtype=np.int64), 1, np.array([], dtype=np.int64)
+    lo, hi = int(occupied[0]), int(occupied[-1])
+    width = max(1, -(-(hi - lo + 1) // max(1, nbins)))
+    first = (lo // width) * width
+    n_bins = hi // width - first // width + 1
+
+    padded = np.zeros(n_bins * width, dtype=np.int64)
+    window = counts[first:first + n_bins * width]
+    padded[: len(window)] = window
+    totals = padded.reshape(n_bins, width).sum(axis=1)
+    starts = first + width * np.arange(n_bins)
+    return starts, width, totals
+
@@ -0,0 +1,271 @@
+# core/ingest.py
+"""
+Append-only ingestion: loading a dataset, then folding in only what was added.
+
+A dataset's rows come from its CSV plus, optionally, partition files — every ``*.csv``
+in a folder named after it (``data/<name>/``, same header), taken in file name order.
+Each source file is tracked by a small state (``columnar.source_state``): its size,
+mtime and a digest of its last ``TAIL_BYTES`` bytes. Rows always come in source
+order: the CSV's, then each partition's. On a refresh:
+
+  - a file with a new mtime but the same size and tail was only touched: its state
+    is updated, nothing is read;
+  - the last file read that grew and whose old tail is unchanged was appended to:
+    only the bytes after the old end are parsed (complete lines only; a
+    half-written last line waits for the next refresh);
+  - a partition file that isn't in the states yet and sorts after every file read
+    is new and parsed whole, last line included even without a newline;
+  - anything else (a file shrank, was rewritten or removed, an unterminated last
+    line that was read as a row went on growing, or rows were added to a file that
+    comes before one already read) needs a full reload.
+
+New rows are appended to the columnar sidecar in place (core/columnar.py), under a
+lock shared by every server process; a process that finds the sidecar already
+caught up by another one just maps the new rows. Only the new bytes are read, so
+the cost follows the number of new rows, not the size of the dataset. Because new
+rows are only ever taken from the end of the source order, a refresh gives the same
+frame as a full reload of the same files.
+"""
+import io
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from core import columnar
+from core.columnar import source_name as _name
+from core.columnar import source_state, tail_digest
+from core.data import read_typed_csv
+
+_log = logging.getLogger(__name__)
+
+
+def partition_dir(csv_path):
+    return Path(csv_path).with_suffix("")
+
+
+def source_paths(csv_path):
+    """The CSV, then its partition files in name order."""
+    csv_path = Path(csv_path)
+    folder = partition_dir(csv_path)
+    partitions = sorted(folder.glob("*.csv")) if folder.is_dir() else []
+    return [csv_path] + partitions
+
+
+def plan(csv_path, states):
+    """
+    [(path, offset)] of the bytes added to the sources of ``csv_path`` since
+    ``states`` (a touched file is a step with nothing to read), [] when nothing
+    changed, or None when a source changed in any other way than by appending at
+    the end of the source order.
+    """
+    recorded = {state["file"]: state for state in states}
+    paths = source_paths(csv_path)
+    if set(recorded) - {_name(csv_path, path) for path in paths}:
+        return None
+    # New rows may only follow every row read so far: they come from this file or later ones.
+    last_read = max((i for i, path in enumerate(paths) if _name(csv_path, path) in recorded), default=-1)
+    steps = []
+    for i, path in enumerate(paths):
+        state = recorded.get(_name(csv_path, path))
+        if state is None:
+            if i < last_read:
+                return None
+            steps.append((path, 0))
+            continue
+        stat = path.stat()
+        if stat.st_size == state["size"] and stat.st_mtime_ns == state["mtime_ns"]:
+            continue
+        if stat.st_size < state["size"] or tail_digest(path, state["size"]) != state["tail"]:
+            return None
+        if stat.st_size > state["size"] and (i < last_read or _continues_line(path, state["size"])):
+            return None
+        steps.append((path, state["size"]))
+    return steps
+
+
+def _continues_line(path, size):
+    """Whether bytes after ``size`` continue a last line that had no newline (and was read as a row)."""
+    if size == 0:
+        return False
+    with open(path, "rb") as fh:
+        fh.seek(size - 1)
+        around = fh.read(2)
+    return around[:1] != b"\n" and around[1:2] not in (b"\n", b"\r")
+
+
+class _Prefix(io.RawIOBase):
+    """The first ``size`` bytes of ``path`` as a stream, so a file still being written parses consistently."""
+
+    def __init__(self, path, size):
+        super().__init__()
+        self._fh = open(path, "rb")
+        self._left = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self._fh.readinto(memoryview(buffer)[: self._left])
+        self._left -= count
+        return count
+
+    def close(self):
+        self._fh.close()
+        super().close()
+
+
+def _read_rows(csv_path, path, start, columns, dtypes):
+    """
+    (typed frame of the lines of ``path`` after byte ``start``, or None if there are
+    none; state covering them). ``start`` 0 means a new file with a header, read
+    whole; after a tail read of a file that may still be growing, a last line
+    without a newline is left for the next refresh.
+    """
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        data = fh.read()
+    if start > 0:
+        data = data[: data.rfind(b"\n") + 1]
+    if not data.strip():
+        return None, source_state(csv_path, path, start + len(data))
+    if start == 0:
+        frame = read_typed_csv(io.BytesIO(data), dtypes)
+        if list(frame.columns) != list(columns):
+            raise ValueError(f"{path} doesn't have the columns of {Path(csv_path).name}.")
+    else:
+        frame = read_typed_csv(io.BytesIO(data), dtypes, header=None, names=list(columns))
+    return frame, source_state(csv_path, path, start + len(data))
+
+
+def concat_frames(frames):
+    """Frames stacked by rows; category columns keep a category dtype with the labels unioned."""
+    frames = [frame for frame in frames if frame is not None]
+    if len(frames) == 1:
+        return frames[0]
+    data = {}
+    for col in frames[0].columns:
+        parts = [frame[col] for frame in frames]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            data[col] = union_categoricals([part.array for part in parts], ignore_order=True)
+        else:
+            data[col] = np.concatenate([part.to_numpy() for part in parts])
+    return pd.DataFrame(data, copy=False)
+
+
+def _read_steps(csv_path, steps, states, columns, dtypes):
+    """(new rows or None, states after reading them) for the steps of ``plan``."""
+    states = {state["file"]: state for state in states}
+    frames = []
+    for path, start in steps:
+        frame, state = _read_rows(csv_path, path, start, columns, dtypes)
+        frames.append(frame)
+        states[state["file"]] = state
+    ordered = [states[_name(csv_path, path)] for path in source_paths(csv_path) if _name(csv_path, path) in states]
+    frames = [frame for frame in frames if frame is not None]
+    return (concat_frames(frames) if frames else None), ordered
+
+
+def _load_full(csv_path, dtypes):
+    """Parses every source of ``csv_path`` and rewrites the sidecar; (frame, states, sidecar)."""
+    state = source_state(csv_path, csv_path)
+    with io.BufferedReader(_Prefix(csv_path, state["size"])) as fh:
+        frame = read_typed_csv(fh, dtypes)
+    extra, states = _read_steps(csv_path, [(path, 0) for path in source_paths(csv_path)[1:]], [state], frame.columns, dtypes)
+    frame = concat_frames([frame, extra])
+    try:
+        folder = columnar.write_sidecar(csv_path, frame, sources=states)
+    except OSError:
+        return frame, states, None
+    manifest = columnar.read_manifest(folder)
+    if manifest is None:
+        return frame, states, None
+    return columnar.read_columns(folder, manifest), states, (folder, manifest)
+
+
+def _catch_up(csv_path, dtypes):
+    """
+    Brings the sidecar of ``csv_path`` up to date by appending (under its lock).
+    Returns (memory-mapped frame, states, sidecar), or None when the sidecar is
+    missing, outdated without states, or can't be caught up by appending.
+    """
+    folder = columnar.sidecar_dir(csv_path)
+    if columnar.read_manifest(folder) is None:
+        return None
+    try:
+        with columnar.locked(folder):
+            manifest = columnar.read_manifest(folder)
+            if manifest is None:
+                return None
+            if "sources" not in manifest:
+                # Written without ingest states (e.g. by core/synthetic.py): usable
+                # while it still mirrors the CSV, from which the states are recorded.
+                if not columnar.sidecar_is_fresh(csv_path, manifest):
+                    return None
+                manifest["sources"] = [source_state(csv_path, csv_path, manifest["source"]["size"])]
+                columnar.write_manifest(
+                    folder, manifest["columns"], manifest["rows"], manifest["source"], sources=manifest["sources"]
+                )
+            steps = plan(csv_path, manifest["sources"])
+            if steps is None:
+                return None
+            states = manifest["sources"]
+            if steps:
+                columns = [entry["name"] for entry in manifest["columns"]]
+                rows, new_states = _read_steps(csv_path, steps, states, columns, dtypes)
+                if rows is not None:
+                    columnar.append_sidecar(csv_path, rows, new_states, manifest)
+                else:
+                    # Touched files or only half-written lines: record the states, nothing to append.
+                    columnar.write_manifest(
+                        folder, manifest["columns"], manifest["rows"], manifest["source"], sources=new_states
+                    )
+                states = new_states
+            manifest = columnar.read_manifest(folder)
+            return columnar.read_columns(folder, manifest), states, (folder, manifest)
+    except (OSError, ValueError) as exc:
+        _log.warning("Can't bring the sidecar of %s up to date (%s); falling back to parsing the files.", csv_path, exc)
+        return None
+
+
+def load(csv_path, dtypes):
+    """
+    (frame, states, sidecar) of every source of ``csv_path``: from the sidecar,
+    caught up with anything appended since it was written, or parsed in full.
+    ``sidecar`` is (folder, manifest) when ``frame`` is memory-mapped from it.
+    """
+    loaded = _catch_up(csv_path, dtypes)
+    return loaded if loaded is not None else _load_full(csv_path, dtypes)
+
+
+def refresh(csv_path, dtypes, frame, states):
+    """
+    Rows added since ``frame`` was loaded with ``states``: (new frame, new states,
+    the new rows or None, sidecar as in ``load``), or None when a full reload is
+    needed.
+    """
+    steps = plan(csv_path, states)
+    if steps is None:
+        return None
+    caught_up = _catch_up(csv_path, dtypes) if steps else None
+    if caught_up is not None:
+        # The sidecar holds the rows of ``frame`` followed by the new ones, unless it
+        # was rebuilt meanwhile (then it's shorter or its states don't extend ours).
+        mapped, new_states, sidecar = caught_up
+        if len(mapped) < len(frame) or not _extends(states, new_states):
+            return None
+        rows = mapped.iloc[len(frame):] if len(mapped) > len(frame) else None
+        return mapped, new_states, rows, sidecar
+    # No usable sidecar (e.g. a read-only data folder): parse the new bytes ourselves.
+    rows, new_states = _read_steps(csv_path, steps, states, frame.columns, dtypes)
+    if rows is None:
+        return frame, new_states, None, None
+    return concat_frames([frame, rows]), new_states, rows, None
+
+
+def _extends(old, new):
+    """Whether the ``new`` states cover at least the files and bytes of the ``old`` ones."""
+    new = {state["file"]: state for state in new}
+    return all(state["file"] in new and new[state["file"]]["size"] >= state["size"] for state in old)
@@ -0,0 +1,290 @@
+# core/metrics.py
+"""
+Hot-path timing and memory instrumentation, and the sidebar Performance panel.
+
+Pages and the data layer wrap their stages in ``stage(name)`` (``"data/load"``,
+``"dashboard/kpis"``, ``"gallery/histogram"``, ...). Each run of a stage records a
+sample: wall time, and the change in the process's resident memory (read from
+/proc/self/statm; None where that isn't available). Samples go into two ring buffers:
+
+  - the session's own (``SESSION_SAMPLES`` most recent, in ``st.session_state``), for
+    the Performance panel and its JSON / Prometheus downloads
+  - the process's (``PROCESS_SAMPLES``), served as Prometheus text by the JSON API's
+    ``/metrics`` endpoint (core/api.py) for scraping
+
+Each recorder also keeps running per-stage counts and totals, so the exported
+``_count`` / ``_sum`` only ever grow, and the payload size of the last figure built or
+served per chart. Percentiles are computed over the samples still in the ring.
+
+A stage costs two clock reads and two small /proc reads (a few microseconds). Set
+``APP_METRICS=0`` to turn recording off entirely.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+ENABLED = os.environ.get("APP_METRICS", "1") != "0"
+SESSION_SAMPLES = 2_000
+PROCESS_SAMPLES = 20_000
+QUANTILES = (0.5, 0.95)
+PROMETHEUS_PREFIX = "student_app"
+
+try:
+    _PAGE_BYTES = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_BYTES = 4096
+
+
+def rss_bytes():
+    """Resident memory of this process, or None when /proc isn't available."""
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * _PAGE_BYTES
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class Recorder:
+    """A ring buffer of stage samples plus running per-stage totals and figure sizes."""
+
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)
+        self.totals = {}
+        self.figures = {}
+        self.figure_hits = 0
+        self.figure_misses = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, memory_delta):
+        with self._lock:
+            self.samples.append((time.time(), name, seconds, memory_delta))
+            count, total = self.totals.get(name, (0, 0.0))
+            self.totals[name] = (count + 1, total + seconds)
+
+    def record_figure(self, chart, hit, nbytes):
+        with self._lock:
+            self.figures[chart] = nbytes
+            if hit:
+                self.figure_hits += 1
+            else:
+                self.figure_misses += 1
+
+    def stages(self):
+        """
+        One row per stage: runs (all time), p50 / p95 / max in ms and the mean memory
+        change in MB over the samples in the ring.
+        """
+        with self._lock:
+            samples = list(self.samples)
+            totals = dict(self.totals)
+        columns = ["runs", "p50 ms", "p95 ms", "max ms", "memory Δ MB"]
+        if not samples:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name="stage"))
+        frame = pd.DataFrame(samples, columns=["at", "stage", "seconds", "memory"])
+        rows = {}
+        for name, group in frame.groupby("stage", sort=True):
+            ms = group["seconds"].to_numpy() * 1000
+            memory = group["memory"].dropna()
+            rows[name] = [
+                totals[name][0],
+                float(np.percentile(ms, 50)),
+                float(np.percentile(ms, 95)),
+                float(ms.max()),
+                float(memory.mean()) / 2**20 if len(memory) else float("nan"),
+            ]
+        return pd.DataFrame.from_dict(rows, orient="index", columns=columns).rename_axis("stage")
+
+    def to_json(self, extra=None):
+        """Every sample in the ring, per-stage totals, figure sizes and ``extra`` (e.g. cache stats)."""
+        with self._lock:
+            payload = {
+                "started": self.started,
+                "samples": [
+                    {"at": at, "stage": name, "seconds": seconds, "memory_delta_bytes": memory}
+                    for at, name, seconds, memory in self.samples
+                ],
+                "totals": {name: {"count": count, "seconds": total} for name, (count, total) in self.totals.items()},
+                "figure_bytes": dict(self.figures),
+                "figure_hits": self.figure_hits,
+                "figure_misses": self.figure_misses,
+            }
+        payload.update(extra or {})
+        return json.dumps(payload, indent=1)
+
+    def to_prometheus(self, caches=None):
+        """
+        Prometheus text exposition: a summary per stage (quantiles over the ring,
+        running count and sum), the last payload size per chart and, for each
+        ``caches`` entry ({name: stats dict}), its hits, misses and bytes.
+        """
+        with self._lock:
+            samples = list(self.samples)
+            totals = dict(self.totals)
+            figures = dict(self.figures)
+        by_stage = {}
+        for _, name, seconds, _ in samples:
+            by_stage.setdefault(name, []).append(seconds)
+
+        metric = f"{PROMETHEUS_PREFIX}_stage_seconds"
+        lines = [f"# HELP {metric} Wall time per stage.", f"# TYPE {metric} summary"]
+        for name in sorted(totals):
+            label = f'stage="{_escape(name)}"'
+            values = by_stage.get(name)
+            if values:
+                for q in QUANTILES:
+                    lines.append(f'{metric}{{{label},quantile="{q}"}} {np.quantile(values, q):.6g}')
+            count, total = totals[name]
+            lines.append(f"{metric}_sum{{{label}}} {total:.6g}")
+            lines.append(f"{metric}_count{{{label}}} {count}")
+
+        metric = f"{PROMETHEUS_PREFIX}_figure_payload_bytes"
+        lines += [f"# HELP {metric} JSON size of the last figure built or served per chart.", f"# TYPE {metric} gauge"]
+        lines += [f'{metric}{{chart="{_escape(chart)}"}} {nbytes}' for chart, nbytes in sorted(figures.items())]
+
+        for kind, field, help_text in (
+            ("counter", "hits", "Cache lookups answered from the cache."),
+            ("counter", "misses", "Cache lookups that had to build or load."),
+            ("gauge", "bytes", "Bytes held by the cache."),
+        ):
+            metric = f"{PROMETHEUS_PREFIX}_cache_{field}" + ("_total" if kind == "counter" else "")
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            lines += [f'{metric}{{cache="{name}"}} {stats[field]}' for name, stats in sorted((caches or {}).items())]
+
+        rss = rss_bytes()
+        if rss is not None:
+            metric = f"{PROMETHEUS_PREFIX}_resident_memory_bytes"
+            lines += [f"# HELP {metric} Resident memory of the server process.", f"# TYPE {metric} gauge", f"{metric} {rss}"]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_process = Recorder(PROCESS_SAMPLES)
+
+
+def process_recorder():
+    """Samples of every session (and the API) in this server process."""
+    return _process
+
+
+def session_recorder():
+    """This session's recorder, or None outside a script run (API threads, benchmarks)."""
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+    recorder = st.session_state.get("_metrics")
+    if recorder is None:
+        recorder = st.session_state["_metrics"] = Recorder(SESSION_SAMPLES)
+    return recorder
+
+
+@contextmanager
+def stage(name):
+    """Times the enclosed block as stage ``name`` (recorded even if it raises)."""
+    if not ENABLED:
+        yield
+        return
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        rss_after = rss_bytes()
+        memory = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        _process.record(name, seconds, memory)
+        recorder = session_recorder()
+        if recorder is not None:
+            recorder.record(name, seconds, memory)
+
+
+def record_figure(chart, hit, nbytes):
+    """Notes a figure cache lookup for ``chart`` and the size of its JSON payload."""
+    if not ENABLED:
+        return
+    _process.record_figure(chart, hit, nbytes)
+    recorder = session_recorder()
+    if recorder is not None:
+        recorder.record_figure(chart, hit, nbytes)
+
+
+def cache_stats():
+    """{name: stats} of the process-wide figure and dataset caches."""
+    # Imported here: both modules record stages through this one.
+    from core.figure_cache import get_figure_cache
+    from core.registry import get_dataset_cache
+
+    return {"figure": get_figure_cache().stats(), "dataset": get_dataset_cache().stats()}
+
+
+@st.fragment
+def _panel_body(recorder):
+    stages = recorder.stages()
+    if stages.empty:
+        st.caption("No samples yet.")
+    else:
+        st.markdown("**Stages** (this session)")
+        st.dataframe(
+            stages,
+            column_config={
+                col: st.column_config.NumberColumn(format="%.2f") for col in stages.columns[1:]
+            },
+            use_container_width=True,
+        )
+
+    caches = cache_stats()
+    lookups = recorder.figure_hits + recorder.figure_misses
+    st.markdown("**Caches**")
+    st.markdown(
+        f"- Figures, this session: {recorder.figure_hits / lookups if lookups else 0:.0%} hits of {lookups:,}\n"
+        f"- Figures, all sessions: {caches['figure']['hit_rate']:.0%} hits, "
+        f"{caches['figure']['bytes'] / 2**20:.1f} MB in {caches['figure']['entries']:,} entries\n"
+        f"- Datasets: {caches['dataset']['hits']:,} hits, {caches['dataset']['misses']:,} loads, "
+        f"{caches['dataset']['refreshes']:,} refreshes, {caches['dataset']['bytes'] / 2**20:.1f} MB"
+    )
+    if recorder.figures:
+        st.markdown("**Figure payloads** (last, KB)")
+        st.dataframe(
+            pd.Series({chart: nbytes / 1024 for chart, nbytes in recorder.figures.items()}, name="KB").round(1),
+            use_container_width=True,
+        )
+
+    json_ui, prometheus_ui, refresh_ui = st.columns(3)
+    with json_ui:
+        st.download_button(
+            "JSON", recorder.to_json({"caches": caches}), "metrics.json", "application/json",
+            on_click="ignore", key="perf_json",
+        )
+    with prometheus_ui:
+        st.download_button(
+            "Prometheus", recorder.to_prometheus(caches), "metrics.prom", "text/plain",
+            on_click="ignore", key="perf_prometheus",
+        )
+    with refresh_ui:
+        st.button("Refresh", key="perf_refresh")
+
+
+def performance_panel():
+    """
+    Opt-in sidebar panel with this session's stage latencies, cache hit rates and
+    figure payload sizes. Pages call it last, so it covers the run that drew them.
+    """
+    if not ENABLED:
+        return
+    with st.sidebar:
+        if not st.toggle("Performance", key="perf_panel", help="Stage timings, cache hit rates and payload sizes."):
+            return
+        recorder = session_recorder()
+        if recorder is not None:
+            with st.container(border=True):
+                _panel_body(recorder)
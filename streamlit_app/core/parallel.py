@@ -0,0 +1,353 @@
+# core/parallel.py
+"""
+Optional multi-process backend for the per-row work: load-time aggregates (KPI cube
+and aggregate store) and filter masks.
+
+Off by default. Set ``APP_PARALLEL_WORKERS`` to a number of worker processes (or
+``auto`` for one per CPU) to enable it. Datasets with at least ``APP_PARALLEL_MIN_ROWS``
+rows (default 1,000,000) are then published to the workers as a ``SharedFrame``: one
+array per column (category codes and score values), split into row shards. Columns
+that already live in the dataset's columnar sidecar (core/columnar.py) are simply
+memory-mapped from its files; anything else is copied once into shared memory. Each
+worker attaches read-only (rows are never pickled), works on its shard and returns
+small per-shard results, which are merged in the caller:
+
+  - aggregates : ``KpiCube.merge`` / ``AggregateStore.merge``
+  - masks      : every worker returns its slice packed to one bit per row
+
+Sessions use a SharedFrame concurrently; one that's closed (its dataset evicted)
+while a call is in flight keeps its blocks until that call is done, and workers
+drop their mappings of frames that are gone.
+
+Smaller datasets, or a backend with no workers, run the same shard functions serially
+in the calling thread.
+"""
+import contextlib
+import os
+import sys
+import threading
+import types
+import uuid
+import weakref
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+MIN_SHARD_ROWS = 100_000
+
+
+def _workers_from_env():
+    value = os.environ.get("APP_PARALLEL_WORKERS", "0").strip().lower()
+    if value == "auto":
+        return os.cpu_count() or 1
+    return int(value)
+
+
+PARALLEL_WORKERS = _workers_from_env()
+PARALLEL_MIN_ROWS = int(os.environ.get("APP_PARALLEL_MIN_ROWS", "1000000"))
+
+
+# ---------- Shared columns ----------
+class SharedFrame:
+    """
+    Columns of a typed frame for the workers. Columns found in ``sidecar`` ((folder,
+    manifest) of core/columnar.py) are referenced by file and memory-mapped; the
+    others are copied into shared memory blocks. ``spec`` is what workers need to
+    attach. Calls hold the frame with ``use()``; ``close`` frees the blocks once the
+    last call holding it is done.
+    """
+
+    def __init__(self, df, columns, sidecar=None):
+        self.rows = len(df)
+        self.lock = threading.Lock()  # guards the users count and the closed flag
+        self._users = 0
+        self._closed = False
+        self._blocks = []
+        files = {}
+        if sidecar is not None:
+            folder, manifest = sidecar
+            files = {entry["name"]: entry for entry in manifest["columns"] if manifest["rows"] == self.rows}
+        entries = []
+        for name in columns:
+            if name in files:
+                entry = files[name]
+                entries.append({
+                    "name": name,
+                    "kind": entry["kind"],
+                    **({"categories": entry["categories"]} if entry["kind"] == "category" else {}),
+                    "file": str(folder / entry["file"]),
+                })
+                continue
+            series = df[name]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                values = series.cat.codes.to_numpy()
+                entry = {"name": name, "kind": "category", "categories": series.cat.categories.tolist()}
+            else:
+                values = series.to_numpy()
+                entry = {"name": name, "kind": "values"}
+            block = self._allocate(values.nbytes)
+            np.ndarray(values.shape, values.dtype, buffer=block.buf)[:] = values
+            entries.append({**entry, "block": block.name, "dtype": values.dtype.str})
+        self.spec = {"id": uuid.uuid4().hex, "rows": self.rows, "columns": entries}
+        # Freed on close(), or when the frame is garbage collected / at interpreter exit.
+        self._release = weakref.finalize(self, _release_blocks, self._blocks)
+        _LIVE[self.spec["id"]] = self
+
+    def _allocate(self, nbytes):
+        block = SharedMemory(create=True, size=max(1, nbytes))
+        self._blocks.append(block)
+        return block
+
+    @property
+    def nbytes(self):
+        return sum(block.size for block in self._blocks)
+
+    @contextlib.contextmanager
+    def use(self):
+        """Keeps the blocks alive for the duration; yields False if the frame is closed already."""
+        with self.lock:
+            alive = not self._closed
+            if alive:
+                self._users += 1
+        try:
+            yield alive
+        finally:
+            if alive:
+                with self.lock:
+                    self._users -= 1
+                    release = self._closed and self._users == 0
+                if release:
+                    self._release()
+
+    def close(self):
+        with self.lock:
+            self._closed = True
+            release = self._users == 0
+        _LIVE.pop(self.spec["id"], None)
+        if release:
+            self._release()
+
+
+def _release_blocks(blocks):
+    for block in blocks:
+        block.close()
+        block.unlink()
+    blocks.clear()
+
+
+# Open SharedFrames of this process (the caller), by id.
+_LIVE = weakref.WeakValueDictionary()
+# Attached frames in this process (workers), by SharedFrame id; oldest dropped first.
+_ATTACHED = {}
+_MAX_ATTACHED = 4
+
+
+def _detach(frame_id):
+    blocks, arrays = _ATTACHED.pop(frame_id)
+    arrays.clear()
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:  # an array over it is still referenced; unmapped when that goes
+            pass
+
+
+def _attach(spec, live):
+    """
+    {column: array} over the files and blocks of ``spec``, cached. Frames not in
+    ``live`` (the caller's open SharedFrames) are detached first.
+    """
+    for frame_id in [frame_id for frame_id in _ATTACHED if frame_id not in live]:
+        _detach(frame_id)
+    attached = _ATTACHED.get(spec["id"])
+    if attached is None:
+        blocks, arrays = [], {}
+        for entry in spec["columns"]:
+            if "file" in entry:
+                arrays[entry["name"]] = np.load(entry["file"], mmap_mode="r", allow_pickle=False)
+                continue
+            # Spawned workers share the parent's resource tracker, so attaching here
+            # doesn't add an owner: the block is still unlinked once, by SharedFrame.close.
+            block = SharedMemory(name=entry["block"])
+            blocks.append(block)
+            arrays[entry["name"]] = np.ndarray(spec["rows"], dtype=entry["dtype"], buffer=block.buf)
+        if len(_ATTACHED) >= _MAX_ATTACHED:
+            _detach(next(iter(_ATTACHED)))
+        attached = _ATTACHED[spec["id"]] = (blocks, arrays)
+    return attached[1]
+
+
+def _frame_arrays(df, columns):
+    """The same {column: array} layout for an in-process frame (serial execution)."""
+    return {
+        col: df[col].cat.codes.to_numpy() if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].to_numpy()
+        for col in columns
+    }
+
+
+def _frame_spec(df, columns):
+    entries = []
+    for col in columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            entries.append({"name": col, "kind": "category", "categories": df[col].cat.categories.tolist()})
+        else:
+            entries.append({"name": col, "kind": "values"})
+    return {"rows": len(df), "columns": entries}
+
+
+# ---------- Per-shard work ----------
+def _shard_frame(arrays, spec, start, stop):
+    data = {}
+    for entry in spec["columns"]:
+        values = arrays[entry["name"]][start:stop]
+        if entry["kind"] == "category":
+            values = pd.Categorical.from_codes(values, entry["categories"])
+        data[entry["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _shard_mask(arrays, spec, start, stop, categories, ranges):
+    """
+    Same semantics as FilterIndex.mask: empty or all-values selections don't filter,
+    but rows missing a value of any column in ``categories`` never pass.
+    """
+    mask = np.ones(stop - start, dtype=bool)
+    entries = {entry["name"]: entry for entry in spec["columns"]}
+    for col, selected in (categories or {}).items():
+        labels = entries[col]["categories"]
+        if not selected or set(labels) <= set(selected):
+            mask &= arrays[col][start:stop] >= 0
+            continue
+        # Lookup table over the codes; the extra last slot is code -1 (missing).
+        lookup = np.zeros(len(labels) + 1, dtype=bool)
+        lookup[[i for i, value in enumerate(labels) if value in selected]] = True
+        mask &= lookup[arrays[col][start:stop]]
+    for col, (lo, hi) in (ranges or {}).items():
+        values = arrays[col][start:stop]
+        mask &= (values >= lo) & (values <= hi)
+    return mask
+
+
+def _summarize_task(arrays, spec, start, stop, info):
+    from core.streaming import _empty_aggregates
+
+    chunk = _shard_frame(arrays, spec, start, stop)
+    cube, store = _empty_aggregates(info)
+    cube.update(chunk)
+    store.update(chunk)
+    return cube, store
+
+
+def _mask_task(arrays, spec, start, stop, categories, ranges):
+    # One bit per row: the slice is pickled back to the caller.
+    return np.packbits(_shard_mask(arrays, spec, start, stop, categories, ranges))
+
+
+def _run_shard(task, spec, live, start, stop, *args):
+    """Worker entry point: attach to the shared frame, run ``task`` on one shard."""
+    return task(_attach(spec, live), spec, start, stop, *args)
+
+
+# ---------- Backend ----------
+@contextlib.contextmanager
+def _plain_main():
+    """
+    While a page runs, Streamlit sets ``__main__`` to the page script, and spawned
+    workers would re-execute it on start-up. The pool starts all its workers at once,
+    so it's created with a bare ``__main__`` in place.
+    """
+    page_main = sys.modules.get("__main__")
+    placeholder = types.ModuleType("__main__")
+    sys.modules["__main__"] = placeholder
+    try:
+        yield
+    finally:
+        if sys.modules.get("__main__") is placeholder:
+            sys.modules["__main__"] = page_main
+
+
+class ParallelBackend:
+    def __init__(self, workers=PARALLEL_WORKERS, min_rows=PARALLEL_MIN_ROWS):
+        self.workers = max(0, int(workers))
+        self.min_rows = min_rows
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def enabled_for(self, rows):
+        """Whether a dataset of ``rows`` rows goes to the pool (else: serial)."""
+        return self.workers > 0 and rows >= self.min_rows
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the Streamlit server is multi-threaded.
+                with _plain_main():
+                    self._pool = get_context("spawn").Pool(self.workers)
+            return self._pool
+
+    def shards(self, rows):
+        """Row ranges: about two per worker, none smaller than MIN_SHARD_ROWS."""
+        n_shards = max(1, min(2 * max(self.workers, 1), rows // MIN_SHARD_ROWS))
+        bounds = np.linspace(0, rows, n_shards + 1).astype(np.int64)
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def share(self, df, columns, sidecar=None):
+        """A SharedFrame of ``df`` when it's big enough for the pool, else None."""
+        return SharedFrame(df, columns, sidecar) if self.enabled_for(len(df)) else None
+
+    def _map(self, task, source, *args):
+        """
+        Runs ``task`` over the shards of ``source`` (SharedFrame or frame), in order:
+        [(start, stop, result)], or None if the SharedFrame is closed.
+        """
+        if isinstance(source, SharedFrame):
+            with source.use() as alive:
+                if not alive:
+                    return None
+                live = frozenset(_LIVE)
+                shards = self.shards(source.rows)
+                pending = [
+                    self.pool.apply_async(_run_shard, (task, source.spec, live, start, stop, *args))
+                    for start, stop in shards
+                ]
+                return [(start, stop, result.get()) for (start, stop), result in zip(shards, pending)]
+        columns = list(source.columns)
+        arrays, spec = _frame_arrays(source, columns), _frame_spec(source, columns)
+        return [(0, len(source), task(arrays, spec, 0, len(source), *args))]
+
+    def summarize(self, source, info):
+        """(KpiCube, AggregateStore) of every row, merged from the shards; None once ``source`` is closed."""
+        results = self._map(_summarize_task, source, info)
+        if results is None:
+            return None
+        results = [result for _, _, result in results]
+        cube, store = results[0]
+        for other_cube, other_store in results[1:]:
+            store.merge(other_store)
+            cube.merge(other_cube)
+        return cube, store
+
+    def mask(self, source, categories=None, ranges=None):
+        """Boolean row mask for the filters (a fresh array), or None once ``source`` is closed."""
+        results = self._map(_mask_task, source, categories, ranges)
+        if results is None:
+            return None
+        parts = [np.unpackbits(bits, count=stop - start) for start, stop, bits in results]
+        return np.concatenate(parts).view(bool)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+
+
+@st.cache_resource
+def get_backend():
+    """Process-wide backend (one worker pool shared by every session)."""
+    return ParallelBackend()
@@ -0,0 +1,84 @@
+# core/quantiles.py
+"""
+Server-side quantiles and box-plot statistics.
+
+Box plots used to ship every raw score to the browser so Plotly could compute the
+quartiles client-side. Here the statistics are computed on the server instead, as
+exact quantiles from a per-score count array (the histograms kept by
+``AggregateStore``), in O(101) per group. The histograms are additive, so streamed
+and appended datasets get the same exact statistics. Only integer score columns
+have histograms: non-integer numeric columns get no server-side box statistics.
+
+Quantiles use linear interpolation between order statistics, the same definition as
+``np.quantile`` and Plotly's default ``quartilemethod="linear"``.
+"""
+import numpy as np
+
+MAX_OUTLIERS = 200
+
+
+def weighted_quantiles(values, counts, qs):
+    """
+    Exact quantiles ``qs`` of a weighted sample: sorted ``values``, each occurring
+    ``counts`` times (zero counts allowed). NaN when the sample is empty.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    cumulative = np.cumsum(counts)
+    n = int(cumulative[-1]) if len(cumulative) else 0
+    if n == 0:
+        return np.full(len(qs), np.nan)
+    positions = np.asarray(qs, dtype=np.float64) * (n - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, n - 1)
+    # Value of the k-th smallest element (0-based) is the first bin whose cumulative count exceeds k.
+    lower_values = values[np.searchsorted(cumulative, lower, side="right")]
+    upper_values = values[np.searchsorted(cumulative, upper, side="right")]
+    return lower_values + (upper_values - lower_values) * (positions - lower)
+
+
+def hist_quantiles(hist, qs):
+    """Exact quantiles ``qs`` of the values described by ``hist`` (count per value)."""
+    return weighted_quantiles(np.arange(len(hist)), hist, qs)
+
+
+def box_stats(values, counts, max_outliers=MAX_OUTLIERS):
+    """
+    Tukey box statistics of a weighted sample: distinct sorted ``values`` with their
+    ``counts``. Whiskers end at the most extreme values within 1.5 IQR of the box.
+    Outliers are returned as distinct values (with how many students share each),
+    keeping at most ``max_outliers`` of the most extreme ones.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.int64)
+    present = counts > 0
+    values, counts = values[present], counts[present]
+    n = int(counts.sum())
+    if n == 0:
+        return None
+
+    q1, median, q3 = weighted_quantiles(values, counts, [0.25, 0.5, 0.75])
+
+    iqr = q3 - q1
+    inside = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+    outlier_values, outlier_counts = values[~inside], counts[~inside]
+    if len(outlier_values) > max_outliers:
+        distance = np.maximum(q1 - outlier_values, outlier_values - q3)
+        keep = np.sort(np.argsort(-distance, kind="stable")[:max_outliers])
+        outlier_values, outlier_counts = outlier_values[keep], outlier_counts[keep]
+
+    return {
+        "count": n,
+        "mean": float((values * counts).sum() / n),
+        "q1": float(q1),
+        "median": float(median),
+        "q3": float(q3),
+        "lowerfence": float(values[inside].min()),
+        "upperfence": float(values[inside].max()),
+        "outliers": outlier_values,
+        "outlier_counts": outlier_counts,
+    }
+
+
+def hist_box_stats(hist, max_outliers=MAX_OUTLIERS):
+    """Box statistics from a per-score count array (exact)."""
+    return box_stats(np.arange(len(hist)), hist, max_outliers=max_outliers)
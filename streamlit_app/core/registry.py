@@ -0,0 +1,492 @@
+# core/registry.py
+"""
+Dataset registry: discovery, column roles and a memory-budgeted dataset cache.
+
+Every ``*.csv`` under ``data/`` is a candidate dataset. Its schema is inferred from
+the first ``INSPECT_ROWS`` rows (the Students Performance layout is recognised
+directly) and every column gets a role:
+
+  - category : text columns with at most ``MAX_CATEGORY_VALUES`` distinct values
+  - score    : integer columns within 0–255, stored as uint8
+  - numeric  : any other number (kept, but not used by the pages yet)
+  - time     : an optional cohort / year / term column (``TIME_COLUMNS``), integer
+               or text; its values are the periods of the Trends page
+
+From those the pages pick what to draw: filter columns and the primary score for
+the Dashboard, the scatter axes and color, the box-plot split and the bar-chart
+grouping for the Gallery, and the category pairs that get two-way aggregates. With
+a time column, every category is also paired with it, so per-period group means
+are kept by the aggregate store as well.
+
+Datasets are loaded lazily, the first time a page asks for them, into a process-wide
+LRU cache bounded by ``DATASET_MEMORY_BUDGET_MB`` (default 1024). The most recently
+used dataset is always kept, even if it alone exceeds the budget.
+
+A dataset's version covers its CSV and its partition files (core/ingest.py). When it
+changes by rows being appended (or partitions added), the cached dataset is brought
+up to date incrementally (``LoadedDataset.refreshed``) instead of being reloaded.
+Pages notice on their next run; with ``APP_REFRESH_SECONDS`` set, the Dashboard also
+polls on that interval.
+"""
+import copy
+import functools
+import hashlib
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from core import ingest
+from core.data import CATEGORY_COLUMNS, CSV_PATH, DATA_DIR, DTYPES, TIME_COLUMNS
+from core.figure_cache import get_figure_cache
+from core.filters import FilterIndex
+from core.grid import GridIndex
+from core.metrics import stage
+from core.parallel import get_backend
+from core.streaming import STREAMING_THRESHOLD_BYTES, DatasetSummary, summarize_csv, summarize_frame
+from core.trends import TrendEngine
+
+INSPECT_ROWS = 10_000
+MAX_CATEGORY_VALUES = 50
+MEMORY_BUDGET_BYTES = int(os.environ.get("DATASET_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024
+# Seconds between refresh checks of the Dashboard (0: only when the page reruns).
+REFRESH_SECONDS = float(os.environ.get("APP_REFRESH_SECONDS", "0"))
+
+STUDENTS_ROLES = {
+    "filters": ["gender", "test preparation course"],
+    "primary_score": "math score",
+    "scatter": ("reading score", "writing score"),
+    "color": "gender",
+    "split": "test preparation course",
+    "group": "parental level of education",
+    # Pairs of category columns to keep joint aggregates for (two-way breakdowns).
+    "pairs": list(itertools.combinations(CATEGORY_COLUMNS, 2)),
+}
+
+
+class DatasetInfo:
+    """Schema and column roles of one CSV under ``data/``."""
+
+    def __init__(self, path, dtypes, categories, scores, numeric, roles, version):
+        self.path = Path(path)
+        self.name = self.path.stem
+        self.dtypes = dtypes
+        self.categories = categories
+        self.scores = scores
+        self.numeric = numeric
+        self.version = version
+        self.filters = roles.get("filters", [])
+        self.primary_score = roles.get("primary_score")
+        self.scatter = roles.get("scatter")
+        self.color = roles.get("color")
+        self.split = roles.get("split")
+        self.group = roles.get("group")
+        self.pairs = roles.get("pairs", [])
+        self.time = roles.get("time")
+
+    @property
+    def supported(self):
+        """The pages need at least one category and one score column."""
+        return bool(self.categories and self.scores)
+
+    @property
+    def group_columns(self):
+        """Columns the aggregate store groups by: the categories, plus the time column."""
+        return self.categories + ([self.time] if self.time else [])
+
+    @property
+    def is_default(self):
+        return self.path == CSV_PATH
+
+    @property
+    def key(self):
+        """Identity of this exact file version, e.g. for figure cache keys."""
+        size, mtime_ns, partitions = self.version
+        key = f"{self.name}:{size}:{mtime_ns}"
+        if partitions:
+            key += ":" + hashlib.sha1(repr(partitions).encode("utf-8")).hexdigest()[:12]
+        return key
+
+
+def _infer_column(series):
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        if series.nunique(dropna=True) <= MAX_CATEGORY_VALUES:
+            return "category", "category"
+        return "text", None
+    if pd.api.types.is_integer_dtype(series) and len(series) and series.min() >= 0 and series.max() <= 255:
+        return "score", "uint8"
+    if pd.api.types.is_numeric_dtype(series):
+        return "numeric", "float64"
+    return "text", None
+
+
+def _infer_time_column(series):
+    if pd.api.types.is_integer_dtype(series):
+        return "time", "int32"
+    return "time", "category"
+
+
+def _default_roles(sample, categories, scores):
+    if not (categories and scores):
+        return {}
+    if len(scores) >= 3:
+        scatter = (scores[1], scores[2])
+    elif len(scores) == 2:
+        scatter = (scores[0], scores[1])
+    else:
+        scatter = None
+    return {
+        "filters": categories[:2],
+        "primary_score": scores[0],
+        "scatter": scatter,
+        "color": categories[0],
+        "split": categories[1] if len(categories) > 1 else categories[0],
+        "group": max(categories, key=lambda col: sample[col].nunique()),
+    }
+
+
+@functools.lru_cache(maxsize=64)
+def _inspect(path, size, mtime_ns, partitions=()):
+    sample = pd.read_csv(path, nrows=INSPECT_ROWS)
+    dtypes, categories, scores, numeric, times = {}, [], [], [], []
+    for col in sample.columns:
+        if col in DTYPES:
+            role, dtype = ("category" if col in CATEGORY_COLUMNS else "score"), DTYPES[col]
+        elif col.lower() in TIME_COLUMNS and not times:
+            role, dtype = _infer_time_column(sample[col])
+        else:
+            role, dtype = _infer_column(sample[col])
+        if dtype is not None:
+            dtypes[col] = dtype
+        {"category": categories, "score": scores, "numeric": numeric, "time": times}.get(role, []).append(col)
+
+    if set(DTYPES) <= set(sample.columns):
+        roles = dict(STUDENTS_ROLES)
+    else:
+        roles = _default_roles(sample, categories, scores)
+    if times and roles:
+        roles["time"] = times[0]
+        roles["pairs"] = roles.get("pairs", []) + [(times[0], col) for col in categories]
+    return DatasetInfo(path, dtypes, categories, scores, numeric, roles, (size, mtime_ns, partitions))
+
+
+def inspect_csv(path):
+    """DatasetInfo for ``path``; re-inspected only when the file or its partitions change."""
+    stat = Path(path).stat()
+    partitions = tuple(
+        (part.name, part_stat.st_size, part_stat.st_mtime_ns)
+        for part, part_stat in ((part, part.stat()) for part in ingest.source_paths(path)[1:])
+    )
+    return _inspect(Path(path), stat.st_size, stat.st_mtime_ns, partitions)
+
+
+def discover(data_dir=DATA_DIR):
+    """{name: DatasetInfo} for every CSV directly under ``data_dir``, sorted by name."""
+    datasets = {}
+    for path in sorted(Path(data_dir).glob("*.csv")):
+        try:
+            info = inspect_csv(path)
+        except (OSError, ValueError, pd.errors.ParserError):
+            continue
+        datasets[info.name] = info
+    return datasets
+
+
+class LoadedDataset:
+    """
+    A dataset resident in memory: its summary (cube, store, rows) and filter index.
+    With the parallel backend enabled (core/parallel.py) and enough rows, the frame is
+    also shared with the worker pool, which builds the aggregates and filter masks.
+
+    When the CSV has a columnar sidecar, the frame and the filter index are read-only
+    memory maps of its files: every server process (and its workers) maps the same
+    pages, so an extra process only adds its small aggregates.
+    """
+
+    def __init__(self, info):
+        self.info = info
+        self.shared = None
+        # Ingest states of the files read (core/ingest.py); None: not refreshable.
+        self.sources = None
+        self.refreshed_at = datetime.now()
+        sidecar = None
+        paths = ingest.source_paths(info.path)
+        if sum(path.stat().st_size for path in paths) > STREAMING_THRESHOLD_BYTES:
+            with stage("data/stream"):
+                self.summary = summarize_csv(paths, info)
+        else:
+            with stage("data/load"):
+                df, self.sources, sidecar = ingest.load(info.path, info.dtypes)
+            with stage("data/summarize"):
+                self.summary = self._summarize(df, sidecar)
+        with stage("data/index"):
+            if sidecar is not None and not self.summary.sampled:
+                self.index = FilterIndex.published(self.summary.frame, sidecar[0], info.filters, [info.primary_score])
+            else:
+                self.index = FilterIndex(self.summary.frame, info.filters, [info.primary_score])
+        # Trend fits over the per-period aggregates (None without a time column).
+        self.trends = TrendEngine(self.summary.store, info.time) if info.time else None
+        # Grid index over the scatter columns, built on the first chart selection.
+        self._sidecar_folder = sidecar[0] if sidecar is not None and not self.summary.sampled else None
+        self._grid = None
+        self._grid_lock = threading.Lock()
+
+    def _summarize(self, df, sidecar):
+        backend = get_backend()
+        self.shared = backend.share(df, self.info.group_columns + self.info.scores, sidecar)
+        if self.shared is not None:
+            cube, store = backend.summarize(self.shared, self.info)
+            return DatasetSummary(cube, store, df, sampled=False)
+        return summarize_frame(df, self.info)
+
+    def refreshed(self, info):
+        """
+        A new LoadedDataset for ``info`` (a later version of the same file) built from
+        this one plus the rows appended since, or None when the change isn't an append
+        and the dataset must be loaded again. This one stays usable by sessions that
+        still hold it.
+        """
+        if self.sources is None or info.dtypes != self.info.dtypes:
+            return None
+        with stage("data/refresh"):
+            try:
+                result = ingest.refresh(info.path, info.dtypes, self.frame, self.sources)
+            except (OSError, ValueError, pd.errors.ParserError):
+                return None
+            if result is None:
+                return None
+            return self._fold_in(info, *result)
+
+    def _fold_in(self, info, frame, sources, rows, sidecar):
+        """The successor of this dataset with ``rows`` (appended to make ``frame``) folded in."""
+        dataset = copy.copy(self)
+        dataset.info, dataset.sources = info, sources
+        if rows is None:
+            # Nothing new to fold in (e.g. only a half-written line): hand the shared frame over.
+            dataset.shared, self.shared = self.shared, None
+            return dataset
+        # Aggregates are small: copy them and add the new rows' aggregates.
+        added = summarize_frame(rows, info)
+        cube, store = copy.deepcopy((self.summary.cube, self.summary.store))
+        cube.merge(added.cube)
+        store.merge(added.store)
+        dataset.summary = DatasetSummary(cube, store, frame, sampled=False)
+        dataset.index = self.index.appended(rows, frame)
+        dataset.shared = get_backend().share(frame, info.group_columns + info.scores, sidecar)
+        dataset.trends = TrendEngine(store, info.time) if info.time else None
+        dataset._sidecar_folder = sidecar[0] if sidecar is not None else None
+        dataset._grid, dataset._grid_lock = None, threading.Lock()
+        dataset.refreshed_at = datetime.now()
+        return dataset
+
+    @property
+    def frame(self):
+        return self.summary.frame
+
+    def mask(self, categories=None, ranges=None):
+        """Rows of ``frame`` passing the filters: from the worker pool or the filter index."""
+        shared = self.shared
+        if shared is not None:
+            # Every filter column, so the pool drops rows missing a category like the index does.
+            everything = {col: [] for col in self.info.filters}
+            mask = get_backend().mask(shared, {**everything, **(categories or {})}, ranges)
+            # None: evicted by another session meanwhile; the index still works.
+            if mask is not None:
+                return mask
+        return self.index.mask(categories, ranges)
+
+    @property
+    def grid(self):
+        """GridIndex over the scatter columns (None without them), built on first use."""
+        if self.info.scatter is None:
+            return None
+        with self._grid_lock:
+            if self._grid is None:
+                x, y = self.info.scatter
+                with stage("data/grid"):
+                    if self._sidecar_folder is not None:
+                        self._grid = GridIndex.published(self.frame, self._sidecar_folder, x, y)
+                    else:
+                        self._grid = GridIndex(self.frame[x].to_numpy(), self.frame[y].to_numpy())
+            return self._grid
+
+    def kpis(self, categories=None, ranges=None, rows=None):
+        """
+        Count and per-score means of the rows passing the filters, as ``cube.query``
+        returns them, but only among ``rows`` (sorted row positions, e.g. a chart
+        selection from the grid index). Costs the filter mask plus the selected rows.
+        """
+        rows = rows[self.mask(categories, ranges)[rows]]
+        means = {}
+        for score in self.info.scores:
+            total = self.frame[score].to_numpy()[rows].sum(dtype=np.int64)
+            means[score] = float(total) / len(rows) if len(rows) else float("nan")
+        return {"count": len(rows), "means": means}
+
+    def close(self):
+        """Frees the shared-memory copy, if any (called on eviction)."""
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+    @property
+    def nbytes(self):
+        frame = int(self.frame.memory_usage(deep=True).sum())
+        shared = self.shared.nbytes if self.shared is not None else 0
+        grid = self._grid.nbytes if self._grid is not None else 0
+        return frame + shared + grid + self.index.nbytes + self.summary.cube.nbytes + self.summary.store.nbytes
+
+
+class DatasetCache:
+    """LRU cache of LoadedDataset objects bounded by their total size in bytes."""
+
+    def __init__(self, budget_bytes=MEMORY_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def get(self, info):
+        with self._lock:
+            entry = self._entries.get(info.name)
+            if entry is not None and entry.info.version == info.version:
+                self._entries.move_to_end(info.name)
+                self.hits += 1
+                return entry
+            load_lock = self._load_locks.setdefault(info.name, threading.Lock())
+
+        # Load outside the cache lock so other sessions can keep using cached datasets;
+        # the per-dataset lock stops two sessions from loading the same file twice.
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(info.name)
+                if entry is not None and entry.info.version == info.version:
+                    self._entries.move_to_end(info.name)
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+            # An older version of the same file: fold in what was appended, if that's all.
+            refreshed = entry.refreshed(info) if entry is not None else None
+            if refreshed is not None:
+                self.refreshes += 1
+            entry = refreshed or LoadedDataset(info)
+            with self._lock:
+                previous = self._entries.pop(info.name, None)
+                if previous is not None:
+                    previous.close()
+                    get_figure_cache().forget(previous.info.key)
+                self._entries[info.name] = entry
+                self._entries.move_to_end(info.name)
+                self._evict()
+            return entry
+
+    def _evict(self):
+        total = sum(entry.nbytes for entry in self._entries.values())
+        while total > self.budget_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            total -= evicted.nbytes
+            evicted.close()
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "datasets": list(self._entries),
+                "bytes": sum(entry.nbytes for entry in self._entries.values()),
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+            }
+
+
+@st.cache_resource
+def get_dataset_cache():
+    """
+    The dataset cache shared by every session in this server process. With
+    ``APP_API_PORT`` set, the JSON API (core/api.py) is started here too, answering
+    from the same cache.
+    """
+    cache = DatasetCache()
+    from core import api  # imported here: core.api builds on this module
+
+    if api.API_PORT:
+        api.start_in_background(cache)
+    return cache
+
+
+def load_dataset(name=None, data_dir=DATA_DIR, cache=None):
+    """
+    The loaded dataset called ``name`` (default: StudentsPerformance, else the first
+    supported one) from ``cache`` (default: this process's). Raises FileNotFoundError
+    when there is no such dataset. Only that dataset's files are looked at (and
+    inspected again only when they changed), unless the default one is missing.
+    """
+    info = None
+    try:
+        info = inspect_csv(Path(data_dir) / f"{CSV_PATH.stem if name is None else name}.csv")
+    except (OSError, ValueError, pd.errors.ParserError):
+        pass
+    if info is None or not info.supported:
+        if name is not None:
+            raise FileNotFoundError(Path(data_dir) / f"{name}.csv")
+        info = next((info for info in discover(data_dir).values() if info.supported), None)
+        if info is None:
+            raise FileNotFoundError(Path(data_dir) / f"{CSV_PATH.stem}.csv")
+    return (cache or get_dataset_cache()).get(info)
+
+
+def latest(dataset):
+    """``dataset`` itself, or its cached successor if its files changed since it was loaded."""
+    try:
+        info = inspect_csv(dataset.info.path)
+    except (OSError, ValueError, pd.errors.ParserError):
+        return dataset
+    if info.version == dataset.info.version:
+        return dataset
+    return get_dataset_cache().get(info)
+
+
+def _remember_dataset():
+    st.session_state["dataset"] = st.session_state["dataset_selector"]
+
+
+def select_dataset():
+    """
+    Sidebar dataset selector shared by the data pages; the choice is kept in
+    ``st.session_state["dataset"]`` across pages. Returns the loaded dataset.
+    """
+    names = [name for name, info in discover().items() if info.supported]
+    if not names:
+        raise FileNotFoundError(CSV_PATH)
+    current = st.session_state.get("dataset")
+    if current not in names:
+        current = CSV_PATH.stem if CSV_PATH.stem in names else names[0]
+        st.session_state["dataset"] = current
+    if len(names) > 1:
+        st.sidebar.selectbox(
+            "Dataset",
+            names,
+            index=names.index(current),
+            key="dataset_selector",
+            on_change=_remember_dataset,
+        )
+    with stage("data/select"):
+        return load_dataset(current)
+
+
+def column_label(col, points=False):
+    """Axis/widget label for ``col``: "gender" -> "Gender", "math score" -> "Math score (points)"."""
+    label = col[:1].upper() + col[1:]
+    return f"{label} (points)" if points else label
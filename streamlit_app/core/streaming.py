@@ -0,0 +1,128 @@
+# core/streaming.py
+"""
+One-pass summaries of StudentsPerformance-schema datasets.
+
+The pages only display aggregates plus a bounded number of individual points, so a
+dataset never has to be fully resident to be served. A ``DatasetSummary`` holds:
+
+  - ``cube``   : the Dashboard KPI cube (counts / score sums per filter cell),
+  - ``store``  : per-score and per-group score histograms (counts, means, exact
+                 quantiles for the histogram, box and bar charts),
+  - ``frame``  : rows kept in memory for the scatter plots and the filter index —
+                 the whole dataset when it is small, otherwise a uniform reservoir
+                 sample of ``sample_size`` rows.
+
+Datasets whose files add up to more than ``STREAMING_THRESHOLD_BYTES`` are read with ``pd.read_csv(chunksize=...)``
+and folded into the summary chunk by chunk, so memory stays bounded by the chunk
+size plus the sample.
+
+Which columns are categories/scores and which drive the KPI cube comes from the
+dataset's ``core.registry.DatasetInfo`` (``info`` below).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.aggregates import AggregateStore, CategoryCoder
+from core.cube import KpiCube
+
+STREAMING_THRESHOLD_BYTES = int(os.environ.get("STREAMING_THRESHOLD_MB", "1024")) * 1024 * 1024
+CHUNK_ROWS = 250_000
+SAMPLE_ROWS = 200_000
+
+
+class ReservoirSample:
+    """
+    Uniform sample of at most ``size`` rows over a stream of chunks. Every row gets a
+    random priority and the ``size`` smallest priorities seen so far are kept, which
+    is equivalent to sampling without replacement from everything streamed.
+    """
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.rows = None
+        self.priorities = np.array([], dtype=np.float64)
+
+    def update(self, chunk):
+        priorities = self.rng.random(len(chunk))
+        if len(self.priorities) == self.size:
+            candidates = priorities < self.priorities.max()
+            chunk, priorities = chunk[candidates], priorities[candidates]
+        if len(chunk) == 0:
+            return
+        # Categories differ between chunks, so keep labels as plain objects until the end.
+        categorical = [c for c in chunk.columns if isinstance(chunk[c].dtype, pd.CategoricalDtype)]
+        chunk = chunk.astype({col: object for col in categorical})
+        rows = chunk if self.rows is None else pd.concat([self.rows, chunk], ignore_index=True)
+        priorities = np.concatenate([self.priorities, priorities])
+        if len(priorities) > self.size:
+            keep = np.argpartition(priorities, self.size - 1)[: self.size]
+            rows, priorities = rows.iloc[keep].reset_index(drop=True), priorities[keep]
+        self.rows, self.priorities = rows, priorities
+
+    def frame(self, dtypes):
+        if self.rows is None:
+            return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()})
+        return self.rows.astype({col: dtype for col, dtype in dtypes.items() if col in self.rows})
+
+
+class DatasetSummary:
+    def __init__(self, cube, store, frame, sampled):
+        self.cube = cube
+        self.store = store
+        self.frame = frame
+        self.sampled = sampled
+
+    @property
+    def rows(self):
+        return self.store.rows
+
+
+def _empty_aggregates(info):
+    coder = CategoryCoder()
+    cube = KpiCube(info.filters, info.primary_score, info.scores, coder=coder)
+    store = AggregateStore(info.group_columns, info.scores, coder=coder, pairs=info.pairs)
+    return cube, store
+
+
+def summarize_frame(df, info):
+    """
+    Summary of an in-memory frame; ``frame`` is ``df`` itself (no sampling). Rows are
+    folded in ``CHUNK_ROWS`` slices (views, not copies), so the temporaries stay small
+    and the process doesn't keep a heap the size of the frame after loading.
+    """
+    cube, store = _empty_aggregates(info)
+    for start in range(0, max(len(df), 1), CHUNK_ROWS):
+        chunk = df.iloc[start : start + CHUNK_ROWS]
+        cube.update(chunk)
+        store.update(chunk)
+    return DatasetSummary(cube, store, df, sampled=False)
+
+
+def summarize_chunks(chunks, info, sample_size=SAMPLE_ROWS, seed=0):
+    """Summary built in one pass over an iterable of typed chunks."""
+    cube, store = _empty_aggregates(info)
+    sample = ReservoirSample(sample_size, seed=seed)
+    for chunk in chunks:
+        cube.update(chunk)
+        store.update(chunk)
+        sample.update(chunk)
+    frame = sample.frame(info.dtypes)
+    return DatasetSummary(cube, store, frame, sampled=store.rows > len(frame))
+
+
+def summarize_csv(paths, info, chunksize=CHUNK_ROWS, sample_size=SAMPLE_ROWS, seed=0):
+    """
+    Streams ``paths`` (one CSV, or a dataset's CSV and its partition files) in
+    ``chunksize``-row chunks into one summary.
+    """
+    paths = [paths] if isinstance(paths, (str, os.PathLike)) else list(paths)
+
+    def chunks():
+        for path in paths:
+            with pd.read_csv(path, dtype=info.dtypes, chunksize=chunksize) as reader:
+                yield from reader
+
+    return summarize_chunks(chunks(), info, sample_size=sample_size, seed=seed)
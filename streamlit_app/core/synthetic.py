@@ -0,0 +1,213 @@
+# core/synthetic.py
+"""
+Synthetic StudentsPerformance-schema data for load testing.
+
+``SyntheticModel.fit`` learns from the shipped CSV:
+
+  - the joint frequency of every observed combination of the five category columns
+    (so marginals and associations between e.g. lunch and test prep are kept), and
+  - a linear model of the three scores on those categories, plus the 3x3 covariance
+    of its residuals (so reading/writing/math stay correlated as in the real data).
+
+``generate`` then draws any number of rows with vectorized NumPy, optionally spread
+over several cohort years with a per-year score drift. Output is reproducible from
+the seed (for a given ``chunk_rows``).
+
+Command line, from the streamlit_app folder:
+
+    python -m core.synthetic --rows 1000000 --out data/Synthetic_1M.csv --formats csv npy
+    python -m core.synthetic --rows 5000000 --years 2019 2020 2021 2022 --out /tmp/cohorts.csv
+
+Formats: ``csv``; ``npy`` (one .npy per column in the core/columnar.py layout — when
+written together with the CSV it becomes that CSV's sidecar, so the app never parses
+it); ``parquet`` (needs pyarrow).
+"""
+import argparse
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core import columnar
+from core.data import CATEGORY_COLUMNS, CSV_PATH, SCORE_COLUMNS, read_typed_csv
+
+CHUNK_ROWS = 1_000_000
+YEAR_COLUMN = "year"
+
+
+class SyntheticModel:
+    def __init__(self, categories, combos, probs, means, residual_chol):
+        self.categories = categories  # {column: labels}
+        self.combos = combos  # (n combos, n category columns) codes
+        self.probs = probs
+        self.means = means  # (n combos, n scores) expected scores per combination
+        self.residual_chol = residual_chol
+
+    @classmethod
+    def fit(cls, df):
+        codes = np.column_stack([df[col].cat.codes.to_numpy() for col in CATEGORY_COLUMNS])
+        combos, inverse, counts = np.unique(codes, axis=0, return_inverse=True, return_counts=True)
+
+        # Design matrix: intercept + one-hot of every category column (first level dropped).
+        categories = {col: list(df[col].cat.categories) for col in CATEGORY_COLUMNS}
+
+        def design(rows):
+            blocks = [np.ones((len(rows), 1))]
+            for j, col in enumerate(CATEGORY_COLUMNS):
+                levels = np.arange(1, len(categories[col]))
+                blocks.append((rows[:, j, None] == levels).astype(np.float64))
+            return np.hstack(blocks)
+
+        scores = df[SCORE_COLUMNS].to_numpy(dtype=np.float64)
+        coef, *_ = np.linalg.lstsq(design(codes), scores, rcond=None)
+        residuals = scores - design(codes) @ coef
+        cov = np.cov(residuals, rowvar=False)
+        return cls(
+            categories=categories,
+            combos=combos,
+            probs=counts / counts.sum(),
+            means=design(combos) @ coef,
+            residual_chol=np.linalg.cholesky(cov),
+        )
+
+    def generate(self, rows, rng, years=None, trend=1.0):
+        """
+        ``rows`` typed rows. With ``years``, a ``year`` column is drawn uniformly from
+        them and scores drift by ``trend`` points per year after the first.
+        """
+        picks = rng.choice(len(self.combos), size=rows, p=self.probs)
+        scores = self.means[picks] + rng.standard_normal((rows, len(SCORE_COLUMNS))) @ self.residual_chol.T
+
+        data = {}
+        for j, col in enumerate(CATEGORY_COLUMNS):
+            data[col] = pd.Categorical.from_codes(self.combos[picks, j], self.categories[col])
+        if years:
+            year = rng.choice(np.asarray(years, dtype=np.int32), size=rows)
+            scores += trend * (year - min(years))[:, None]
+        for j, col in enumerate(SCORE_COLUMNS):
+            data[col] = np.clip(np.rint(scores[:, j]), 0, 100).astype(np.uint8)
+        if years:
+            data[YEAR_COLUMN] = year
+        return pd.DataFrame(data, copy=False)
+
+
+def fit_default():
+    return SyntheticModel.fit(read_typed_csv(CSV_PATH))
+
+
+def generate_frame(rows, seed=0, years=None, trend=1.0, model=None):
+    """An in-memory synthetic frame of ``rows`` rows (for benchmarks and tests)."""
+    model = model or fit_default()
+    return model.generate(rows, np.random.default_rng(seed), years=years, trend=trend)
+
+
+def _chunks(model, rows, seed, years, trend, chunk_rows):
+    n_chunks = max(1, -(-rows // chunk_rows))
+    for i, child in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        size = min(chunk_rows, rows - i * chunk_rows)
+        yield model.generate(size, np.random.default_rng(child), years=years, trend=trend)
+
+
+def write_dataset(out, rows, formats=("csv",), seed=0, years=None, trend=1.0,
+                  chunk_rows=CHUNK_ROWS, model=None):
+    """
+    Writes ``rows`` synthetic rows next to ``out`` (``<stem>.csv``, ``<stem>.parquet``,
+    and for ``npy`` the CSV's sidecar folder or a standalone ``<stem>.npy/``), one chunk
+    at a time. Returns {format: path}.
+    """
+    model = model or fit_default()
+    out = Path(out)
+    csv_path = out.with_suffix(".csv")
+    paths = {}
+    writers = {}
+
+    if "csv" in formats:
+        paths["csv"] = csv_path
+        writers["csv"] = open(csv_path, "w", encoding="utf-8", newline="")
+    if "parquet" in formats:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        paths["parquet"] = out.with_suffix(".parquet")
+    if "npy" in formats:
+        npy_dir = columnar.sidecar_dir(csv_path) if "csv" in formats else out.with_suffix(".npy")
+        paths["npy"] = npy_dir
+        npy_tmp = npy_dir.with_name(f"{npy_dir.name}.tmp-{os.getpid()}")
+        shutil.rmtree(npy_tmp, ignore_errors=True)
+        npy_tmp.mkdir(parents=True)
+        npy_columns = None
+
+    written = 0
+    try:
+        for chunk in _chunks(model, rows, seed, years, trend, chunk_rows):
+            if "csv" in writers:
+                chunk.to_csv(writers["csv"], header=written == 0, index=False)
+            if "parquet" in paths:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if "parquet" not in writers:
+                    writers["parquet"] = pq.ParquetWriter(paths["parquet"], table.schema)
+                writers["parquet"].write_table(table)
+            if "npy" in paths:
+                if npy_columns is None:
+                    npy_columns, arrays = _open_npy_columns(npy_tmp, chunk, rows)
+                for entry, array in zip(npy_columns, arrays):
+                    series = chunk[entry["name"]]
+                    values = series.cat.codes.to_numpy() if entry["kind"] == "category" else series.to_numpy()
+                    array[written:written + len(chunk)] = values
+            written += len(chunk)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    if "npy" in paths:
+        for array in arrays:
+            array.flush()
+        del arrays
+        if "csv" in formats:
+            source, sources = columnar.source_fingerprint(csv_path), [columnar.source_state(csv_path)]
+        else:
+            source, sources = None, None
+        columnar.write_manifest(npy_tmp, npy_columns, rows, source, sources=sources)
+        shutil.rmtree(paths["npy"], ignore_errors=True)
+        os.replace(npy_tmp, paths["npy"])
+    return paths
+
+
+def _open_npy_columns(folder, chunk, rows):
+    columns, arrays = [], []
+    for i, (name, series) in enumerate(chunk.items()):
+        entry = {"name": name, "file": f"{i}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry.update(kind="category", categories=series.cat.categories.tolist())
+            dtype = series.cat.codes.dtype
+        else:
+            entry["kind"] = "values"
+            dtype = series.dtype
+        arrays.append(np.lib.format.open_memmap(folder / entry["file"], mode="w+", dtype=dtype, shape=(rows,)))
+        columns.append(entry)
+    return columns, arrays
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic StudentsPerformance-schema dataset.")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True, help="output path; the suffix is replaced per format")
+    parser.add_argument("--formats", nargs="+", choices=["csv", "npy", "parquet"], default=["csv"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--years", type=int, nargs="*", help="cohort years to spread rows over")
+    parser.add_argument("--trend", type=float, default=1.0, help="score drift in points per year")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    paths = write_dataset(
+        args.out, args.rows, formats=args.formats, seed=args.seed, years=args.years,
+        trend=args.trend, chunk_rows=args.chunk_rows,
+    )
+    for fmt, path in paths.items():
+        print(f"{fmt}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# core/trends.py
+"""
+Per-period trends and short forecasts of group means.
+
+With a time column (a cohort, year or term, see core/registry.py) the aggregate store
+also keeps counts, sums and sums of squares per (period, category value), updated
+chunk by chunk like every other aggregate, so a trend is read from a
+(groups x periods) array and never scans the rows. Fits are vectorized over all the
+groups of a column at once:
+
+  - ``linear`` : least-squares line through the period means, weighted by the
+                 number of students in each period
+  - ``holt``   : Holt's linear exponential smoothing (a smoothed level plus trend)
+
+Forecast bands are the fitted value ± 1.96 × the RMSE of the in-sample residuals.
+``TrendEngine`` keeps every fit for the lifetime of the loaded dataset, keyed by
+(group column, score, method, horizon, smoothing), so reruns never refit.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+METHODS = {"linear": "Linear trend", "holt": "Exponential smoothing (Holt)"}
+MAX_FITS = 256
+Z_95 = 1.96
+
+
+def linear_fit(x, means, counts):
+    """
+    Count-weighted least squares of each row of ``means`` (groups x periods, NaN
+    where empty) on ``x``: (intercept, slope) per group. Groups seen in a single
+    period get a flat line.
+    """
+    weights = counts.astype(np.float64)
+    y = np.where(weights > 0, means, 0.0)
+    total = weights.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = (weights @ x) / total
+        y_mean = (weights * y).sum(axis=1) / total
+        dx = x[None, :] - x_mean[:, None]
+        sxx = (weights * dx * dx).sum(axis=1)
+        slope = np.where(sxx > 0, (weights * dx * (y - y_mean[:, None])).sum(axis=1) / sxx, 0.0)
+    return y_mean - slope * x_mean, slope
+
+
+def holt_fit(means, alpha, beta):
+    """
+    Holt's smoothing of each row of ``means`` (groups x periods, NaN where empty).
+    Returns the final (level, trend) per group and the one-step-ahead fitted values.
+    Empty periods advance the level by the trend without an update.
+    """
+    n_groups, n_periods = means.shape
+    fitted = np.full((n_groups, n_periods), np.nan)
+    started = ~np.isnan(means[:, 0])
+    level = np.where(started, means[:, 0], np.nan)
+    trend = np.zeros(n_groups)
+    for t in range(1, n_periods):
+        y = means[:, t]
+        observed = ~np.isnan(y)
+        prediction = level + trend
+        fitted[:, t] = prediction
+        update = observed & started
+        smoothed = alpha * y + (1 - alpha) * prediction
+        trend = np.where(update, beta * (smoothed - level) + (1 - beta) * trend, trend)
+        level = np.where(update, smoothed, np.where(observed, y, prediction))
+        started |= observed
+    return level, trend, fitted
+
+
+class TrendFit:
+    """
+    One fitted column: ``history`` (observed mean and count per group and period),
+    ``forecast`` (mean, lower, upper for the next periods) and ``summary`` (one row
+    per group: students, last observed mean, change per period, final forecast).
+    """
+
+    def __init__(self, history, forecast, summary):
+        self.history = history
+        self.forecast = forecast
+        self.summary = summary
+
+
+class TrendEngine:
+    def __init__(self, store, time_column):
+        self.store = store
+        self.time = time_column
+        self._fits = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def periods(self):
+        return sorted(self.store.labels(self.time))
+
+    def _steps(self, periods, horizon):
+        """x positions of the observed periods and the labels of the next ``horizon``."""
+        if all(isinstance(period, (int, np.integer)) for period in periods):
+            x = np.asarray(periods, dtype=np.float64)
+            step = int(np.diff(x).min()) if len(x) > 1 else 1
+            return x, [periods[-1] + step * h for h in range(1, horizon + 1)], step
+        x = np.arange(len(periods), dtype=np.float64)
+        return x, [f"{periods[-1]} +{h}" for h in range(1, horizon + 1)], 1
+
+    def series(self, by, score):
+        """
+        (group labels, counts, means) of ``score`` per ``by`` value and period, as
+        (groups x periods) arrays in period order. ``by=None`` is one overall group.
+        """
+        grouping = self.time if by is None else (by, self.time)
+        counts, sums, _ = self.store.group_totals(grouping, score)
+        labels = ["All students"] if by is None else list(self.store.labels(by))
+        if by is None:
+            counts, sums = counts[None, :], sums[None, :]
+        order = np.argsort(np.asarray(self.store.labels(self.time), dtype=object), kind="stable")
+        counts, sums = counts[:, order], sums[:, order]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / counts, np.nan)
+        present = counts.sum(axis=1) > 0
+        return [label for label, keep in zip(labels, present) if keep], counts[present], means[present]
+
+    def fit(self, by, score, method="linear", horizon=3, alpha=0.5, beta=0.3):
+        """The TrendFit of ``score`` by ``by``, computed once per set of arguments."""
+        key = (by, score, method, max(1, int(horizon)), float(alpha), float(beta))
+        with self._lock:
+            fit = self._fits.get(key)
+            if fit is not None:
+                self._fits.move_to_end(key)
+                return fit
+        fit = self._fit(by, score, method, key[3], alpha, beta)
+        with self._lock:
+            self._fits[key] = fit
+            while len(self._fits) > MAX_FITS:
+                self._fits.popitem(last=False)
+        return fit
+
+    def _fit(self, by, score, method, horizon, alpha, beta):
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}; expected one of {list(METHODS)}.")
+        periods = self.periods
+        groups, counts, means = self.series(by, score)
+        x, future, step = self._steps(periods, horizon)
+        ahead = np.arange(1, horizon + 1, dtype=np.float64)
+
+        if method == "linear":
+            intercept, slope = linear_fit(x, means, counts)
+            fitted = intercept[:, None] + slope[:, None] * x[None, :]
+            predicted = intercept[:, None] + slope[:, None] * (x[-1] + step * ahead)[None, :]
+            per_period = slope * step
+        else:
+            level, trend, fitted = holt_fit(means, alpha, beta)
+            predicted = level[:, None] + trend[:, None] * ahead[None, :]
+            per_period = trend
+
+        residuals = means - fitted
+        fitted_periods = np.maximum((~np.isnan(residuals)).sum(axis=1), 1)
+        rmse = np.sqrt(np.nansum(residuals * residuals, axis=1) / fitted_periods)
+        band = Z_95 * rmse[:, None]
+
+        name = by or "group"
+        observed = counts > 0
+        rows, cols = np.nonzero(observed)
+        history = pd.DataFrame({
+            name: np.asarray(groups, dtype=object)[rows],
+            self.time: np.asarray(periods, dtype=object)[cols],
+            "mean": means[observed],
+            "count": counts[observed],
+        })
+        forecast = pd.DataFrame({
+            name: np.repeat(np.asarray(groups, dtype=object), horizon),
+            self.time: np.tile(np.asarray(future, dtype=object), len(groups)),
+            "mean": predicted.ravel(),
+            "lower": (predicted - band).ravel(),
+            "upper": (predicted + band).ravel(),
+        })
+        last = np.array([row[mask][-1] for row, mask in zip(means, observed)])
+        summary = pd.DataFrame(
+            {
+                "students": counts.sum(axis=1),
+                "last mean": last,
+                "change per period": per_period,
+                f"forecast {future[-1]}": predicted[:, -1],
+            },
+            index=pd.Index(groups, name=name),
+        )
+        return TrendFit(history, forecast, summary)
@@ -0,0 +1,138 @@
+# core/warmup.py
+"""
+Server warm-up: run the data pages once right after start, before any visitor does.
+
+A fresh server process has nothing cached: the first visitor of a data page pays
+for the heavy imports (pandas, plotly), loading the dataset and its filter index,
+building the aggregates and every figure of the page's default view. Launching the
+app through this module instead of ``streamlit run`` starts the server as usual plus
+a background thread that waits until the server answers, then opens one session
+over the same websocket protocol a browser uses and runs each of ``WARMUP_PAGES``
+with its default widget values. That fills the process-wide caches (dataset cache,
+figure cache, parallel worker pool) exactly as a first visit would, so the first
+real visitor only reads them.
+
+Run from the streamlit_app folder (any other arguments go to ``streamlit run``):
+    python -m core.warmup --port 8501 --server.headless true
+
+``PageClient`` is also used by benchmarks/bench_startup.py to time first visits.
+The warm-up needs the ``websockets`` package, which recent Streamlit versions
+install with the server; without it the server starts unwarmed.
+"""
+import argparse
+import http.client
+import sys
+import threading
+import time
+from pathlib import Path
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+# URL names of the pages to run: the ones with datasets and figures behind them.
+WARMUP_PAGES = ("Charts_Gallery", "Dashboard", "Trends")
+
+
+def wait_until_up(host, port, timeout=120):
+    """Seconds until the server at ``host:port`` answers its health check; raises TimeoutError."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=5)
+            conn.request("GET", "/_stcore/health")
+            ok = conn.getresponse().status == 200
+            conn.close()
+            if ok:
+                return time.perf_counter() - start
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"No Streamlit server on {host}:{port} after {timeout} s.")
+
+
+class PageClient:
+    """One browser-like session: runs pages over the app's websocket and times each run."""
+
+    def __init__(self, host, port, timeout=300):
+        from websockets.sync.client import connect
+
+        self._ws = connect(f"ws://{host}:{port}/_stcore/stream", max_size=None, open_timeout=timeout)
+        self.timeout = timeout
+
+    def run(self, page=""):
+        """
+        Seconds until a run of ``page`` (its URL name; "" for the main page) with
+        default widget values has finished. Raises LookupError for an unknown page.
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.page_name = page
+        start = time.perf_counter()
+        self._ws.send(message.SerializeToString())
+        missing = False
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(self._ws.recv(timeout=self.timeout))
+            kind = forward.WhichOneof("type")
+            missing |= kind == "page_not_found"
+            if kind == "script_finished":
+                if missing:
+                    raise LookupError(f"The app has no page {page!r}.")
+                return time.perf_counter() - start
+
+    def close(self):
+        self._ws.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def warm_up(host, port, pages=WARMUP_PAGES, log=print):
+    """Waits for the server, then runs ``pages`` once in one session; {page: seconds}."""
+    wait_until_up(host, port)
+    timings = {}
+    with PageClient(host, port) as client:
+        for page in pages:
+            try:
+                timings[page] = client.run(page)
+            except LookupError as exc:
+                log(f"Warm-up: {exc}")
+                continue
+            log(f"Warm-up: {page} ready in {timings[page]:.2f} s")
+    return timings
+
+
+def start_in_background(host, port, pages=WARMUP_PAGES):
+    """Runs ``warm_up`` on a daemon thread; a failure is reported, not raised."""
+
+    def target():
+        try:
+            warm_up(host, port, pages)
+        except ImportError:
+            print("Warm-up skipped: it needs the 'websockets' package.", file=sys.stderr)
+        except (OSError, TimeoutError) as exc:
+            print(f"Warm-up failed: {exc}", file=sys.stderr)
+
+    thread = threading.Thread(target=target, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8501)
+    parser.add_argument("--pages", nargs="*", default=list(WARMUP_PAGES), help="URL names of the pages to warm up")
+    args, streamlit_args = parser.parse_known_args()
+
+    from streamlit.web import cli
+
+    start_in_background("127.0.0.1", args.port, args.pages)
+    cli.main(["run", str(APP_PATH), "--server.port", str(args.port), *streamlit_args], prog_name="streamlit")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,20 @@
 # pages/2_📊_Charts_Gallery.py
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from pathlib import Path
+
+from core.figure_cache import cached_figure
+from core.figures import box_figure, histogram_figure, scatter_figure
+from core.metrics import performance_panel, stage
+from core.registry import column_label, select_dataset
 
 st.title("📊 EDA Gallery — Student Performance Dataset")
 
 # ---------- Load data ----------
-@st.cache_data
-def load_data():
-    """
-    Loads StudentsPerformance.csv from the /data folder.
-    Expected columns (from classic Kaggle dataset):
-      - gender
-      - race/ethnicity
-      - parental level of education
-      - lunch
-      - test preparation course
-      - math score
-      - reading score
-      - writing score
-    """
-    root = Path(__file__).resolve().parent.parent
-    data_path = root / "data" / "StudentsPerformance.csv"
-    df = pd.read_csv(data_path)
-    return df
-
+# Selected dataset from the registry (see core/registry.py): a typed summary with
+# aggregates over every row, plus the rows kept in memory (all of them, or a sample
+# for very large files). Charts use the dataset's column roles, not fixed names.
 try:
-    df = load_data()
+    dataset = select_dataset()
 except FileNotFoundError:
     st.error(
         "❌ Could not find `data/StudentsPerformance.csv`.\n\n"
@@ -36,7 +22,23 @@ except FileNotFoundError:
     )
     st.stop()
 
-st.caption(f"Rows: {df.shape[0]} • Columns: {df.shape[1]}")
+info = dataset.info
+summary = dataset.summary
+df = dataset.frame
+score = info.primary_score
+
+st.caption(f"Dataset: {info.name} • Rows: {summary.rows} • Columns: {df.shape[1]}")
+if not info.is_default:
+    st.caption("The written observations on this page describe the Students Performance dataset.")
+if summary.sampled:
+    st.caption(
+        f"Large dataset: histogram and averages use all rows; point-level charts use a "
+        f"random sample of {df.shape[0]:,} rows."
+    )
+
+# Figures are cached across sessions by chart + widget state (see core/figure_cache.py);
+# the dataset name and file version are part of every key.
+DATA_KEY = info.key
 
 st.markdown(
     """
@@ -51,25 +53,39 @@ st.markdown(
 st.divider()
 
 # ======================================================================================
-# CHART 1: Histogram — Distribution of Math Scores
+# CHART 1: Histogram — Distribution of the primary score (math score)
 # ======================================================================================
 
-st.subheader("Chart 1 — Distribution of Math Scores (Histogram)")
-st.markdown("**Question:** How are math scores distributed across students?")
-
-# interactive: user controls number of bins
-bins = st.slider("Number of bins for the histogram:", 5, 50, 20)
-
-fig_hist = px.histogram(
-    df,
-    x="math score",
-    nbins=bins,
-    title="Distribution of Math Scores",
-    labels={"math score": "Math score (points)"},
-)
-fig_hist.update_layout(bargap=0.05)
-
-st.plotly_chart(fig_hist, use_container_width=True)
+st.subheader(f"Chart 1 — Distribution of {score.title()}s (Histogram)")
+st.markdown(f"**Question:** How are {score}s distributed across students?")
+
+# Each interactive chart is a fragment (st.fragment): changing one of its widgets
+# reruns only that chart, not the rest of the page. Chart 2 has no widgets and is
+# only drawn on full runs (page load or dataset switch).
+@st.fragment(key="gallery_histogram")
+def histogram_chart():
+    # interactive: user controls number of bins
+    bins = st.slider("Number of bins for the histogram:", 5, 50, 20)
+
+    # Built from per-score counts computed once at load, so moving the slider only
+    # re-bins 101 numbers instead of shipping every math score to the browser.
+    def build_histogram():
+        fig = histogram_figure(
+            summary.store.score_counts(score),
+            nbins=bins,
+            x=score,
+            title=f"Distribution of {score.title()}s",
+            labels={score: column_label(score, points=True)},
+        )
+        fig.update_layout(bargap=0.05)
+        return fig
+
+    with stage("gallery/histogram"):
+        fig_hist = cached_figure("gallery/histogram", {"data": DATA_KEY, "bins": bins}, build_histogram)
+        st.plotly_chart(fig_hist, use_container_width=True)
+
+
+histogram_chart()
 
 st.markdown("**How to read this chart:**")
 st.markdown(
@@ -93,31 +109,40 @@ st.markdown(
 st.divider()
 
 # ======================================================================================
-# CHART 2: Box Plot — Math Scores by Test Preparation Course
+# CHART 2: Box Plot — Primary score by the split column (math score by test prep)
 # ======================================================================================
 
-st.subheader("Chart 2 — Math Scores by Test Preparation Status (Box Plot)")
+prep_col = info.split
+
+st.subheader(f"Chart 2 — {score.title()}s by {str(prep_col).title()} (Box Plot)")
 st.markdown(
     "**Question:** Do students who completed the test preparation course tend to score higher in math?"
+    if info.is_default
+    else f"**Question:** Do {score}s differ by {prep_col}?"
 )
 
-# Just in case column name slightly differs, we guard it:
-if "test preparation course" not in df.columns:
+# Just in case the dataset has no category column to split by, we guard it:
+if prep_col is None:
     st.error(
-        "Expected column `test preparation course` not found in dataset. "
+        "This dataset has no category column to group by. "
         "Check the CSV headers or adjust the code."
     )
 else:
-    prep_col = "test preparation course"
-
-    fig_box = px.box(
-        df,
-        x=prep_col,
-        y="math score",
-        title="Math Scores by Test Preparation Status",
-        labels={prep_col: "Test preparation course", "math score": "Math score (points)"},
-    )
-    st.plotly_chart(fig_box, use_container_width=True)
+    # Quartiles, whiskers and a capped set of outliers are computed on the server from
+    # the per-group score histograms, so the payload doesn't grow with group size.
+    with stage("gallery/box"):
+        fig_box = cached_figure(
+            "gallery/box",
+            {"data": DATA_KEY},
+            lambda: box_figure(
+                summary.store.group_box_stats(prep_col, score),
+                x=prep_col,
+                y=score,
+                title=f"{score.title()}s by {prep_col.title()}",
+                labels={prep_col: column_label(prep_col), score: column_label(score, points=True)},
+            ),
+        )
+        st.plotly_chart(fig_box, use_container_width=True)
 
     st.markdown("**How to read this chart:**")
     st.markdown(
@@ -141,34 +166,53 @@ else:
 st.divider()
 
 # ======================================================================================
-# CHART 3: Scatter Plot — Reading vs Writing Scores by Gender (Interactive)
+# CHART 3: Scatter Plot — two scores by the color column (reading vs writing by gender)
 # ======================================================================================
 
-st.subheader("Chart 3 — Reading vs Writing Scores by Gender (Scatter Plot)")
+x_col, y_col = info.scatter or (None, None)
+color_col = info.color
+scatter_title = f"{str(x_col).title()} vs {str(y_col).title()} by {color_col.title()}"
+
+st.subheader(f"Chart 3 — {scatter_title} (Scatter Plot)")
 st.markdown(
-    "**Question:** How strongly are reading and writing scores related, and does the pattern look different by gender?"
+    f"**Question:** How strongly are {x_col}s and {y_col}s related, "
+    f"and does the pattern look different by {color_col}?"
 )
 
-if "gender" not in df.columns:
+if x_col is None:
     st.error(
-        "Expected column `gender` not found in dataset. "
+        "This dataset needs at least two score columns for the scatter plot. "
         "Check the CSV headers or adjust the code."
     )
 else:
-    fig_scatter = px.scatter(
-        df,
-        x="reading score",
-        y="writing score",
-        color="gender",
-        title="Reading vs Writing Scores by Gender",
-        labels={
-            "reading score": "Reading score (points)",
-            "writing score": "Writing score (points)",
-            "gender": "Gender",
-        },
-        hover_data=df.columns,
-    )
-    st.plotly_chart(fig_scatter, use_container_width=True)
+    @st.fragment(key="gallery_scatter")
+    def scatter_chart():
+        # Large datasets are drawn as WebGL / aggregated markers (see core/figures.py).
+        heatmap = st.toggle("Show as density heatmap", key="gallery_scatter_heatmap")
+        with stage("gallery/scatter"):
+            fig_scatter = cached_figure(
+                "gallery/scatter",
+                {"data": DATA_KEY, "heatmap": heatmap},
+                lambda: scatter_figure(
+                    df,
+                    x=x_col,
+                    y=y_col,
+                    color=color_col,
+                    title=scatter_title,
+                    labels={
+                        x_col: column_label(x_col, points=True),
+                        y_col: column_label(y_col, points=True),
+                        color_col: column_label(color_col),
+                        score: column_label(score, points=True),
+                    },
+                    # Hover is opt-in per column: the primary score and the filter columns.
+                    hover_cols=[score, *info.filters],
+                    mode="heatmap" if heatmap else "auto",
+                ),
+            )
+            st.plotly_chart(fig_scatter, use_container_width=True)
+
+    scatter_chart()
 
     st.markdown("**How to read this chart:**")
     st.markdown(
@@ -192,41 +236,91 @@ else:
 st.divider()
 
 # ======================================================================================
-# CHART 4: Bar Chart — Average Math Score by Parental Level of Education
+# CHART 4: Bar Chart — A statistic of the primary score by a category (math by parental education)
 # ======================================================================================
 
-st.subheader("Chart 4 — Average Math Score by Parental Education (Bar Chart)")
-st.markdown(
-    "**Question:** How does average math performance vary with parental level of education?"
-)
+# Every breakdown is read from the aggregate store built at load time (counts, sums,
+# sums of squares and histograms per category value, and per pair of categories),
+# so switching the column or statistic never scans the rows.
+STAT_LABELS = {"mean": "Average", "median": "Median", "std": "Standard deviation of"}
+
+parent_col = info.group
+
+
+@st.fragment(key="gallery_breakdown")
+def breakdown_chart():
+    breakdown_col, stat_col, split_col = st.columns(3)
+    with breakdown_col:
+        by_col = st.selectbox(
+            "Break down by:",
+            info.categories,
+            index=info.categories.index(parent_col),
+            key=f"gallery_breakdown_{info.name}",
+        )
+    with stat_col:
+        stat = st.selectbox("Statistic:", list(STAT_LABELS), format_func=STAT_LABELS.get)
+    with split_col:
+        split_options = [
+            col for col in info.categories
+            if (by_col, col) in info.pairs or (col, by_col) in info.pairs
+        ]
+        color_by = st.selectbox(
+            "Split bars by:",
+            [None] + split_options,
+            format_func=lambda col: "(none)" if col is None else col,
+            key=f"gallery_split_{info.name}",
+        )
+
+    stat_label = STAT_LABELS[stat]
+
+    st.subheader(f"Chart 4 — {stat_label} {score.title()} by {by_col.title()} (Bar Chart)")
+    st.markdown(
+        f"**Question:** How does {stat_label.lower()} {score} vary with {by_col}?"
+    )
 
-if "parental level of education" not in df.columns:
+    def build_parent_bar():
+        import plotly.express as px  # deferred, see core/figures.py
+
+        by = by_col if color_by is None else (by_col, color_by)
+        grouped = summary.store.stat(by, score, stat).reset_index()
+        order = summary.store.stat(by_col, score, stat).sort_values(ascending=False).index
+
+        fig = px.bar(
+            grouped,
+            x=by_col,
+            y=score,
+            color=color_by,
+            barmode="group",
+            category_orders={by_col: list(order)},
+            title=f"{stat_label} {score.title()} by {by_col.title()}",
+            labels={
+                by_col: column_label(by_col),
+                score: f"{stat_label} {score} (points)",
+                **({color_by: column_label(color_by)} if color_by else {}),
+            },
+        )
+        fig.update_layout(xaxis_tickangle=-35)
+        return fig
+
+    with stage("gallery/breakdown"):
+        fig_bar = cached_figure(
+            "gallery/parent_bar",
+            {"data": DATA_KEY, "by": by_col, "stat": stat, "split": color_by},
+            build_parent_bar,
+        )
+        st.plotly_chart(fig_bar, use_container_width=True)
+    if by_col != parent_col or color_by is not None or stat != "mean":
+        st.caption("The notes below describe the default view: average math score by parental education.")
+
+
+if parent_col is None:
+    st.subheader(f"Chart 4 — Average {score.title()} by Group (Bar Chart)")
     st.error(
-        "Expected column `parental level of education` not found in dataset. "
+        "This dataset has no category column to group by. "
         "Check the CSV headers or adjust the code."
     )
 else:
-    parent_col = "parental level of education"
-
-    grouped = (
-        df.groupby(parent_col)["math score"]
-        .mean()
-        .reset_index()
-        .sort_values("math score", ascending=False)
-    )
-
-    fig_bar = px.bar(
-        grouped,
-        x=parent_col,
-        y="math score",
-        title="Average Math Score by Parental Education Level",
-        labels={
-            parent_col: "Parental level of education",
-            "math score": "Average math score (points)",
-        },
-    )
-    fig_bar.update_layout(xaxis_tickangle=-35)
-    st.plotly_chart(fig_bar, use_container_width=True)
+    breakdown_chart()
 
     st.markdown("**How to read this chart:**")
     st.markdown(
@@ -273,3 +367,6 @@ st.markdown(
     conclusions about cause-and-effect or personal worth.
     """
 )
+
+# Opt-in sidebar panel with this session's stage timings (see core/metrics.py).
+performance_panel()
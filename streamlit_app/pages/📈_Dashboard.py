@@ -1,22 +1,27 @@
 # pages/3_📈_Dashboard.py
+import math
+
+import numpy as np
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from pathlib import Path
-from datetime import datetime
+
+from core.export import available_formats, available_image_formats, get_export_manager
+from core.figure_cache import cached_figure
+from core.figures import scatter_figure
+from core.metrics import performance_panel, stage
+from core.registry import REFRESH_SECONDS, column_label, latest, select_dataset
 
 st.title("📈 Student Performance Dashboard")
 
-# ---------- Load data ----------
-@st.cache_data
-def load_data():
-    root = Path(__file__).resolve().parent.parent
-    data_path = root / "data" / "StudentsPerformance.csv"
-    df = pd.read_csv(data_path)
-    return df
+MAX_KPI_SCORES = 3
 
+# ---------- Load data ----------
+# Selected dataset from the registry (see core/registry.py): the KPI cube covers
+# every row, the scatter uses the rows kept in memory (all of them, or a sample for
+# huge files). Filters and charts follow the dataset's column roles. Rows appended
+# to the data files are folded in when the filtered view below runs again.
 try:
-    df = load_data()
+    dataset = select_dataset()
 except FileNotFoundError:
     st.error(
         "Could not find `data/StudentsPerformance.csv`.\n\n"
@@ -24,10 +29,7 @@ except FileNotFoundError:
     )
     st.stop()
 
-st.caption(
-    f"Data source: **StudentsPerformance.csv** (e.g., Kaggle StudentsPerformance dataset) • "
-    f"Last refreshed: **{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}**"
-)
+score_col = dataset.info.primary_score
 
 st.markdown(
     """
@@ -38,127 +40,366 @@ st.markdown(
 
 st.markdown("---")
 
-# ---------- Sidebar Filters ----------
-st.sidebar.header("Dashboard Filters")
+FILTER_LABELS = {
+    "gender": "Select gender(s):",
+    "test preparation course": "Select test prep status:",
+}
 
-# Gender filter
-gender_col = "gender" if "gender" in df.columns else None
-gender_options = (
-    sorted(df[gender_col].dropna().unique())
-    if gender_col is not None
-    else []
-)
 
-if gender_col:
-    gender_filter = st.sidebar.multiselect(
-        "Select gender(s):",
-        options=gender_options,
-        default=gender_options,
-    )
-else:
-    gender_filter = None
-
-# Test prep filter
-prep_col = "test preparation course" if "test preparation course" in df.columns else None
-prep_options = (
-    sorted(df[prep_col].dropna().unique())
-    if prep_col is not None
-    else []
-)
-
-if prep_col:
-    prep_filter = st.sidebar.multiselect(
-        "Select test prep status:",
-        options=prep_options,
-        default=prep_options,
+def selection_brush(selection):
+    """
+    The geometry of a scatter selection event (its boxes and lassos, or the clicked
+    points when it has neither), or None when nothing is selected. Resolved to rows
+    by the dataset's grid index, so it stays valid as rows are appended.
+    """
+    brush = {
+        "box": [{"x": tuple(box["x"]), "y": tuple(box["y"])} for box in selection.get("box", []) if box.get("x")],
+        "lasso": [{"x": tuple(lasso["x"]), "y": tuple(lasso["y"])} for lasso in selection.get("lasso", []) if lasso.get("x")],
+    }
+    if not brush["box"] and not brush["lasso"]:
+        brush["points"] = [{"x": p["x"], "y": p["y"]} for p in selection.get("points", []) if "x" in p and "y" in p]
+        if not brush["points"]:
+            return None
+    return brush
+
+
+def brush_shapes(brush):
+    """Plotly layout shapes redrawing ``brush`` on the scatter (its selection resets with the figure)."""
+    style = {"line": {"color": "#444", "dash": "dot", "width": 1}, "fillcolor": "rgba(68, 68, 68, 0.08)"}
+    shapes = [
+        {"type": "rect", "x0": box["x"][0], "x1": box["x"][1], "y0": box["y"][0], "y1": box["y"][1], **style}
+        for box in brush.get("box", [])
+    ]
+    for lasso in brush.get("lasso", []):
+        path = " L".join(f"{x},{y}" for x, y in zip(lasso["x"], lasso["y"]))
+        shapes.append({"type": "path", "path": f"M{path} Z", **style})
+    return shapes
+
+
+@st.fragment(run_every=1)
+def export_progress(job_id):
+    """Progress of a running export, polled every second; reruns the page when it ends."""
+    job = get_export_manager().status(job_id)
+    if job is None or job["state"] not in ("queued", "running"):
+        st.rerun()
+    done = job["rows_written"] + job["images_written"]
+    total = job["rows_total"] + job["images_total"]
+    st.progress(
+        done / total if total else 0.0,
+        text=f"Exporting: {job['rows_written']:,} of {job['rows_total']:,} rows written, "
+        f"{job['images_written']} of {job['images_total']} chart images",
     )
-else:
-    prep_filter = None
-
-# Math score slider
-min_math = int(df["math score"].min())
-max_math = int(df["math score"].max())
-math_range = st.sidebar.slider(
-    "Filter by math score range:",
-    min_value=min_math,
-    max_value=max_math,
-    value=(min_math, max_math),
-    step=1,
-)
-
-# Apply filters
-filtered_df = df.copy()
-
-if gender_col and gender_filter:
-    filtered_df = filtered_df[filtered_df[gender_col].isin(gender_filter)]
 
-if prep_col and prep_filter:
-    filtered_df = filtered_df[filtered_df[prep_col].isin(prep_filter)]
 
-filtered_df = filtered_df[
-    (filtered_df["math score"] >= math_range[0])
-    & (filtered_df["math score"] <= math_range[1])
-]
-
-st.markdown("### Filtered Data Overview")
-st.caption(f"Showing {filtered_df.shape[0]} students after filters.")
-
-# ---------- KPIs ----------
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.metric("Number of students", f"{filtered_df.shape[0]}")
-
-with col2:
-    st.metric("Avg math score", f"{filtered_df['math score'].mean():.1f}")
-
-with col3:
-    st.metric("Avg reading score", f"{filtered_df['reading score'].mean():.1f}")
-
-with col4:
-    st.metric("Avg writing score", f"{filtered_df['writing score'].mean():.1f}")
-
-st.markdown("---")
-
-# ---------- Linked Visuals ----------
-left_col, right_col = st.columns(2)
+# ---------- Filters, KPIs and Linked Visuals ----------
+# One fragment (st.fragment): a filter or toggle change reruns only the filters, KPIs
+# and charts below, not the captions and text around them. Fragments can't write to
+# the sidebar, so the filters sit in a panel at the top of the fragment; the dataset
+# selector stays in the sidebar because switching datasets reruns the whole page.
+# With APP_REFRESH_SECONDS set the fragment also reruns on that interval, so new rows
+# show up without any interaction; "Last refreshed" is when they were last folded in.
+@st.fragment(key="dashboard_filtered", run_every=REFRESH_SECONDS or None)
+def filtered_view():
+    current = latest(dataset)
+    info, summary, df, index = current.info, current.summary, current.frame, current.index
+    cube = summary.cube
+
+    source_note = " (e.g., Kaggle StudentsPerformance dataset)" if info.is_default else ""
+    st.caption(
+        f"Data source: **{info.path.name}**{source_note} • "
+        f"Last refreshed: **{current.refreshed_at.strftime('%Y-%m-%d %H:%M:%S')}**"
+    )
 
-with left_col:
-    st.subheader("Average Scores by Subject (Bar Chart)")
-    subject_means = {
-        "Math": filtered_df["math score"].mean(),
-        "Reading": filtered_df["reading score"].mean(),
-        "Writing": filtered_df["writing score"].mean(),
+    with stage("dashboard/filters"), st.container(border=True):
+        st.markdown("**Dashboard Filters**")
+        filter_columns = st.columns(len(info.filters) + 1)
+
+        # One multiselect per filter column (gender and test prep for StudentsPerformance).
+        # Keys include the dataset so switching datasets starts from fresh selections.
+        category_filters = {}
+        for filter_ui, filter_col in zip(filter_columns, info.filters):
+            options = index.values(filter_col)
+            with filter_ui:
+                selected = st.multiselect(
+                    FILTER_LABELS.get(filter_col, f"Select {filter_col}:"),
+                    options=options,
+                    default=options,
+                    key=f"filter_{info.name}_{filter_col}",
+                )
+            if selected:
+                category_filters[filter_col] = selected
+
+        # Primary score slider (math score for StudentsPerformance)
+        min_score, max_score = index.value_range(score_col)
+        with filter_columns[-1]:
+            score_range = st.slider(
+                f"Filter by {score_col} range:",
+                min_value=min_score,
+                max_value=max_score,
+                value=(min_score, max_score),
+                step=1,
+                key=f"range_{info.name}_{score_col}",
+            )
+
+    # Filter selections. They're applied by the KPI cube and, for the scatter, by the
+    # filter index (AND of cached per-value masks + a sorted-index range lookup) or,
+    # for large datasets with the parallel backend on, by the worker pool, so only the
+    # matching rows are ever copied out of the shared frame.
+    range_filters = {score_col: score_range}
+
+    # Everything the filtered charts depend on; used as the figure cache key.
+    filter_state = {
+        "data": info.key,
+        "categories": category_filters,
+        "ranges": range_filters,
     }
-    mean_df = pd.DataFrame(
-        {"Subject": list(subject_means.keys()), "Average score": list(subject_means.values())}
-    )
 
-    fig_subjects = px.bar(
-        mean_df,
-        x="Subject",
-        y="Average score",
-        title="Average Exam Scores (Filtered)",
-        labels={"Average score": "Average score (points)"},
-        range_y=[0, 100],
-    )
-    st.plotly_chart(fig_subjects, use_container_width=True)
-
-with right_col:
-    st.subheader("Reading vs Writing (Scatter, Filtered)")
-    fig_scatter = px.scatter(
-        filtered_df,
-        x="reading score",
-        y="writing score",
-        color=gender_col if gender_col else None,
-        title="Reading vs Writing (Current Filter Selection)",
-        labels={
-            "reading score": "Reading score (points)",
-            "writing score": "Writing score (points)",
-        },
-        hover_data=filtered_df.columns,
-    )
-    st.plotly_chart(fig_scatter, use_container_width=True)
+    # ---------- Cross-filters from the charts ----------
+    # A box, lasso or click selection on the scatter (the "brush") filters the KPIs and
+    # the bar chart; a click on a subject bar (the "pick": students scoring at least that
+    # subject's average) filters the KPIs and the scatter. Both are kept per dataset in
+    # session state by the charts' selection callbacks and resolved to rows here: the
+    # brush through the grid index over the scatter columns (core/grid.py), a pick on
+    # the primary score by narrowing its range filter, a pick on a scatter axis through
+    # the grid index too. No selection rescans the frame.
+    brush_key, pick_key = f"brush_{info.name}", f"pick_{info.name}"
+    grid = current.grid
+    brush = st.session_state.get(brush_key) if grid is not None else None
+    pick = st.session_state.get(pick_key)
+    if pick is not None and pick[0] not in info.scores:
+        pick = None
+
+    with stage("dashboard/selection"):
+        brush_rows = grid.rows(grid.cells_from_selection(brush)) if brush else None
+        pick_range, pick_rows = score_range, None
+        if pick is not None:
+            pick_score, pick_floor = pick[0], math.ceil(pick[1])
+            if pick_score == score_col:
+                pick_range = (max(score_range[0], pick_floor), score_range[1])
+            elif grid is not None and pick_score in info.scatter:
+                pick_rows = grid.rows(grid.cells_at_least(info.scatter.index(pick_score), pick_floor))
+            else:
+                pick_rows = np.flatnonzero(df[pick_score].to_numpy() >= pick_floor)
+
+    def clear_cross_filters():
+        st.session_state.pop(brush_key, None)
+        st.session_state.pop(pick_key, None)
+
+    def filtered_kpis(kpi_range, *row_sets):
+        """KPIs from the cube, or, with chart selections, from the selected rows only."""
+        row_sets = [rows for rows in row_sets if rows is not None]
+        if not row_sets:
+            return cube.query(category_filters, kpi_range)
+        rows = row_sets[0] if len(row_sets) == 1 else np.intersect1d(*row_sets, assume_unique=True)
+        return current.kpis(category_filters, {score_col: kpi_range}, rows)
+
+    # KPIs come from the precomputed cube (filter columns × primary score), so their
+    # cost depends on the cube size, not on the number of students. Chart selections
+    # add the cost of their own rows.
+    with stage("dashboard/kpis"):
+        kpis = filtered_kpis(pick_range, brush_rows, pick_rows)
+        # The bar chart isn't narrowed by its own pick.
+        bar_means = filtered_kpis(score_range, brush_rows)["means"] if pick is not None else kpis["means"]
+    kpi_means = kpis["means"]
+
+    st.markdown("### Filtered Data Overview")
+    cross_filters = []
+    if brush:
+        cross_filters.append("the scatter selection")
+    if pick is not None:
+        cross_filters.append(f"{pick[0]} ≥ {math.ceil(pick[1])} (clicked bar)")
+    selection_note = f" and {' and '.join(cross_filters)}" if cross_filters else ""
+    st.caption(f"Showing {kpis['count']} students after filters{selection_note}.")
+    if cross_filters:
+        if summary.sampled:
+            st.caption(f"Chart selections count the random sample of {df.shape[0]:,} students shown in the scatter.")
+        st.button("Clear chart selections", key=f"clear_{info.name}", on_click=clear_cross_filters)
+
+    # ---------- KPIs ----------
+    # Student count plus the average of each score column (math, reading, writing).
+    kpi_scores = info.scores[:MAX_KPI_SCORES]
+    kpi_columns = st.columns(1 + len(kpi_scores))
+
+    with kpi_columns[0]:
+        st.metric("Number of students", f"{kpis['count']}")
+
+    for kpi_col, kpi_score in zip(kpi_columns[1:], kpi_scores):
+        with kpi_col:
+            mean = kpi_means[kpi_score]
+            st.metric(f"Avg {kpi_score}", "–" if math.isnan(mean) else f"{mean:.1f}")
+
+    st.markdown("---")
+
+    # ---------- Linked Visuals ----------
+    left_col, right_col = st.columns(2)
+    charts = {}  # the figures drawn, for the export below
+
+    with left_col, stage("dashboard/subjects"):
+        st.subheader("Average Scores by Subject (Bar Chart)")
+        subject_scores = {kpi_score.removesuffix(" score").title(): kpi_score for kpi_score in kpi_scores}
+        mean_df = pd.DataFrame(
+            {
+                "Subject": list(subject_scores),
+                "Average score": [bar_means[kpi_score] for kpi_score in subject_scores.values()],
+            }
+        )
+
+        def build_subjects():
+            import plotly.express as px  # deferred, see core/figures.py
+
+            return px.bar(
+                mean_df,
+                x="Subject",
+                y="Average score",
+                title="Average Exam Scores (Filtered)",
+                labels={"Average score": "Average score (points)"},
+                range_y=[0, 100],
+            )
+
+        def on_subject_click():
+            # Clicking the picked bar again (or deselecting) drops the pick.
+            points = st.session_state[f"subjects_{info.name}"].selection.get("points", [])
+            picked = subject_scores.get(points[0].get("x")) if points else None
+            if picked is None or (pick is not None and pick[0] == picked) or math.isnan(bar_means[picked]):
+                st.session_state.pop(pick_key, None)
+            else:
+                st.session_state[pick_key] = (picked, bar_means[picked])
+
+        fig_subjects = cached_figure("dashboard/subjects", {**filter_state, "brush": brush}, build_subjects)
+        if pick is not None:
+            fig_subjects.update_traces(marker_opacity=[1.0 if s == pick[0] else 0.35 for s in subject_scores.values()])
+        charts["subjects"] = fig_subjects
+        st.plotly_chart(
+            fig_subjects,
+            use_container_width=True,
+            on_select=on_subject_click,
+            selection_mode="points",
+            key=f"subjects_{info.name}",
+        )
+
+    with right_col, stage("dashboard/scatter"):
+        x_col, y_col = info.scatter or (None, None)
+        if x_col is None:
+            st.subheader("Scatter (Filtered)")
+            st.info("This dataset needs at least two score columns for the scatter plot.")
+        else:
+            x_name = x_col.removesuffix(" score").title()
+            y_name = y_col.removesuffix(" score").title()
+            st.subheader(f"{x_name} vs {y_name} (Scatter, Filtered)")
+            heatmap = st.toggle("Show as density heatmap", key="dashboard_scatter_heatmap")
+
+            def build_scatter():
+                # Only the matching rows are taken from the shared frame, and only on a miss.
+                with stage("dashboard/filter"):
+                    keep = current.mask(category_filters, {score_col: pick_range})
+                    if pick_rows is not None:
+                        picked = np.zeros(len(keep), dtype=bool)
+                        picked[pick_rows] = True
+                        keep = keep & picked
+                    filtered_df = df[keep]
+                return scatter_figure(
+                    filtered_df,
+                    x=x_col,
+                    y=y_col,
+                    color=info.color,
+                    title=f"{x_name} vs {y_name} (Current Filter Selection)",
+                    labels={
+                        x_col: column_label(x_col, points=True),
+                        y_col: column_label(y_col, points=True),
+                        score_col: column_label(score_col, points=True),
+                    },
+                    # Hover is opt-in per column: the primary score and the filter columns.
+                    hover_cols=[score_col, *info.filters],
+                    mode="heatmap" if heatmap else "auto",
+                )
+
+            def on_scatter_select():
+                selection = st.session_state[f"scatter_{info.name}"].selection
+                st.session_state[brush_key] = selection_brush(selection)
+
+            fig_scatter = cached_figure(
+                "dashboard/scatter",
+                {**filter_state, "ranges": {score_col: pick_range}, "pick": pick, "heatmap": heatmap},
+                build_scatter,
+            )
+            # The brush is drawn on top of the cached figure, so brushing never rebuilds it.
+            fig_scatter.update_layout(dragmode="select", shapes=brush_shapes(brush) if brush else None)
+            charts["scatter"] = fig_scatter
+            st.plotly_chart(
+                fig_scatter,
+                use_container_width=True,
+                on_select=on_scatter_select,
+                selection_mode=("points", "box", "lasso"),
+                key=f"scatter_{info.name}",
+            )
+            if summary.sampled:
+                st.caption(f"Drawn from a random sample of {df.shape[0]:,} of {summary.rows:,} students.")
+            st.caption("Drag a box or lasso (or click points) to filter the KPIs and bars; click a bar to filter this chart.")
+
+    # ---------- Export ----------
+    # The rows counted in the KPIs (filters and chart selections) and the charts above,
+    # written and zipped in the background by the export pool (core/export.py), so a
+    # large export never holds up this page or other sessions.
+    with st.expander("Export data and charts"):
+        export_key = f"export_{info.name}"
+        format_ui, image_ui = st.columns(2)
+        with format_ui:
+            data_formats = st.multiselect(
+                "Data formats:", available_formats(), default=["csv"], key=f"export_formats_{info.name}"
+            )
+        with image_ui:
+            if available_image_formats():
+                image_formats = st.multiselect(
+                    "Chart images:", available_image_formats(), default=["png"], key=f"export_images_{info.name}"
+                )
+            else:
+                image_formats = []
+                st.caption("Chart images need the `kaleido` package.")
+        if summary.sampled:
+            st.caption(f"Exports the matching students of the random sample of {df.shape[0]:,} held in memory.")
+        else:
+            st.caption(f"Exports the {kpis['count']:,} students counted above, with every column.")
+
+        if st.button("Start export", key=f"export_start_{info.name}", disabled=not (data_formats or image_formats)):
+            with stage("dashboard/export"):
+                rows = np.flatnonzero(current.mask(category_filters, {score_col: pick_range}))
+                for selected in (brush_rows, pick_rows):
+                    if selected is not None:
+                        rows = np.intersect1d(rows, selected, assume_unique=True)
+                manifest = {
+                    "dataset": info.name,
+                    "source": info.path.name,
+                    "categories": category_filters,
+                    "ranges": {score_col: pick_range},
+                    "scatter_selection": brush,
+                    "clicked_bar": pick,
+                }
+                st.session_state[export_key] = get_export_manager().submit(
+                    info.name, df, rows, data_formats, charts, image_formats, manifest
+                )
+
+        job_id = st.session_state.get(export_key)
+        job = get_export_manager().status(job_id) if job_id else None
+        if job is not None:
+            if job["state"] in ("queued", "running"):
+                export_progress(job_id)
+            elif job["state"] == "failed":
+                st.error(f"Export failed: {job['error']}")
+            else:
+                for note in job["notes"]:
+                    st.caption(note)
+                archive, size = job["path"], job["bytes"]
+                st.download_button(
+                    f"Download {job['file_name']} "
+                    f"({f'{size / 2**20:.1f} MB' if size >= 2**20 else f'{size / 1024:.0f} KB'})",
+                    data=lambda: archive.read_bytes(),  # read on click only
+                    file_name=job["file_name"],
+                    mime="application/zip",
+                    on_click="ignore",
+                    key=f"export_download_{info.name}",
+                )
+
+filtered_view()
 
 st.markdown("---")
 
@@ -177,6 +418,9 @@ st.markdown(
       together and whether certain groups (e.g., by gender or prep status) cluster.  
     - Changing filters (gender, test prep, math score range) updates **all visuals and KPIs**, 
       enabling “what if” explorations.  
+    - Selecting a region of the scatter (box or lasso) or clicking a subject bar
+      **cross-filters** the KPIs and the other chart, e.g. how students who scored
+      above the math average read and write.  
 
     **Limitations:**
 
@@ -187,3 +431,6 @@ st.markdown(
       certain groups perform differently.  
     """
 )
+
+# Opt-in sidebar panel with this session's stage timings (see core/metrics.py).
+performance_panel()
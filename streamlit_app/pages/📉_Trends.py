@@ -0,0 +1,171 @@
+# pages/📉_Trends.py
+import streamlit as st
+import plotly.graph_objects as go
+from plotly.colors import hex_to_rgb, qualitative
+
+from core.figure_cache import cached_figure
+from core.metrics import performance_panel, stage
+from core.registry import column_label, select_dataset
+from core.trends import METHODS
+
+st.title("📉 Trends & Forecasts")
+
+MAX_GROUPS = 8
+
+# ---------- Load data ----------
+# Trends are read from the per-period aggregates of the selected dataset (see
+# core/trends.py), so they cost the same for a thousand students or ten million.
+try:
+    dataset = select_dataset()
+except FileNotFoundError:
+    st.error(
+        "Could not find `data/StudentsPerformance.csv`.\n\n"
+        "Add your dataset (e.g., Kaggle 'StudentsPerformance') to `data/` and reload."
+    )
+    st.stop()
+
+info = dataset.info
+summary = dataset.summary
+trends = dataset.trends
+
+if trends is None:
+    st.info(
+        f"**{info.name}** has no time column, so there is nothing to trend yet. "
+        "Add a `year`, `cohort` or `term` column to the CSV, or generate a multi-year "
+        "dataset into `data/`:\n\n"
+        "```bash\npython -m core.synthetic --rows 1000000 --years 2019 2020 2021 2022 "
+        "--out data/Cohorts.csv\n```"
+    )
+    st.stop()
+
+periods = trends.periods
+st.caption(
+    f"Dataset: {info.name} • Students: {summary.rows:,} • "
+    f"{column_label(info.time)}s: {periods[0]} – {periods[-1]} ({len(periods)})"
+)
+
+st.markdown(
+    """
+    How do average scores move from one cohort to the next, and where are they heading?
+    Pick a score and a group; the chart shows each group's average per period and a
+    short forecast with a 95% band.
+    """
+)
+
+st.divider()
+
+
+# ---------- Trend chart ----------
+# A fragment (st.fragment): changing a control reruns only this section. Fits are
+# cached per group column, score and method by the dataset's TrendEngine, and the
+# figures by the figure cache, so a rerun with seen settings does no math at all.
+@st.fragment(key="trends_chart")
+def trend_chart():
+    score_ui, group_ui, method_ui, horizon_ui = st.columns(4)
+    with score_ui:
+        score = st.selectbox("Score:", info.scores, key=f"trends_score_{info.name}")
+    with group_ui:
+        by = st.selectbox(
+            "Group by:",
+            [None] + info.categories,
+            format_func=lambda col: "(all students)" if col is None else col,
+            key=f"trends_by_{info.name}",
+        )
+    with method_ui:
+        method = st.selectbox("Forecast:", list(METHODS), format_func=METHODS.get, key="trends_method")
+    with horizon_ui:
+        horizon = st.slider("Periods ahead:", 1, 5, 2, key="trends_horizon")
+
+    alpha, beta = 0.5, 0.3
+    if method == "holt":
+        alpha_ui, beta_ui = st.columns(2)
+        with alpha_ui:
+            alpha = st.slider("Level smoothing (α):", 0.05, 1.0, alpha, 0.05, key="trends_alpha")
+        with beta_ui:
+            beta = st.slider("Trend smoothing (β):", 0.0, 1.0, beta, 0.05, key="trends_beta")
+
+    with stage("trends/fit"):
+        fit = trends.fit(by, score, method, horizon, alpha, beta)
+    name = fit.summary.index.name
+    # The largest groups by default; all of them are in the table below.
+    largest = fit.summary.sort_values("students", ascending=False).index.tolist()
+    groups = largest
+    if by is not None:
+        groups = st.multiselect(
+            "Groups:", largest, default=largest[:MAX_GROUPS], key=f"trends_groups_{info.name}_{by}"
+        )
+
+    def build_trend():
+        fig = go.Figure()
+        for i, group in enumerate(groups):
+            color = qualitative.Plotly[i % len(qualitative.Plotly)]
+            history = fit.history[fit.history[name] == group]
+            forecast = fit.forecast[fit.forecast[name] == group]
+            fig.add_scatter(
+                x=history[info.time], y=history["mean"], mode="lines+markers", name=str(group),
+                line={"color": color}, legendgroup=str(group),
+                customdata=history["count"], hovertemplate="%{x}: %{y:.1f} (%{customdata:,} students)",
+            )
+            # Forecast drawn from the last observed point, dashed, with its band.
+            x = history[info.time].tolist()[-1:] + forecast[info.time].tolist()
+            y = history["mean"].tolist()[-1:] + forecast["mean"].tolist()
+            fig.add_scatter(
+                x=x + x[:0:-1], y=y[:1] + forecast["upper"].tolist() + forecast["lower"].tolist()[::-1],
+                fill="toself", line={"width": 0}, fillcolor="rgba({}, {}, {}, 0.15)".format(*hex_to_rgb(color)),
+                hoverinfo="skip", showlegend=False, legendgroup=str(group),
+            )
+            fig.add_scatter(
+                x=x, y=y, mode="lines+markers", line={"color": color, "dash": "dash"},
+                showlegend=False, legendgroup=str(group), hovertemplate="%{x}: %{y:.1f} (forecast)",
+            )
+        fig.update_layout(
+            title=f"Average {score} per {info.time}" + (f" by {by}" if by else ""),
+            xaxis_title=column_label(info.time),
+            yaxis_title=f"Average {score} (points)",
+            xaxis_type="category",
+        )
+        return fig
+
+    with stage("trends/chart"):
+        fig_trend = cached_figure(
+            "trends/line",
+            {
+                "data": info.key, "score": score, "by": by, "method": method, "horizon": horizon,
+                "alpha": alpha, "beta": beta, "groups": tuple(groups),
+            },
+            build_trend,
+        )
+        st.plotly_chart(fig_trend, use_container_width=True)
+
+    st.markdown("**Per-group summary**")
+    st.dataframe(
+        fit.summary.sort_values("students", ascending=False),
+        column_config={col: st.column_config.NumberColumn(format="%.2f") for col in fit.summary.columns[1:]},
+        use_container_width=True,
+    )
+
+
+trend_chart()
+
+st.markdown("**How to read this chart:**")
+st.markdown(
+    """
+    - Each **solid line** is one group's average score per period; hover for the number of students.
+    - The **dashed line** continues it with the selected forecast, and the shaded band is a rough
+      95% range based on how far the past periods sat from the fitted trend.
+    - **Linear trend** fits one straight line through all periods; **exponential smoothing**
+      follows recent periods more closely (higher α and β react faster).
+    """
+)
+
+st.markdown("**Limitations:**")
+st.markdown(
+    """
+    - Forecasts only extend past patterns; they can't anticipate changes in tests, teaching or cohorts.
+    - With only a few periods, or small groups, trends and bands are **uncertain**.
+    - As on the other pages, these are **descriptive group averages**, not statements about individual students.
+    """
+)
+
+# Opt-in sidebar panel with this session's stage timings (see core/metrics.py).
+performance_panel()
@@ -0,0 +1,57 @@
+# tests/conftest.py
+"""
+Shared fixtures: the bundled StudentsPerformance.csv and a tiny frame with missing
+values in its category columns. Run from the streamlit_app folder:
+    python -m pytest tests
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.data import CSV_PATH, read_typed_csv
+
+FILTERS = ["gender", "test preparation course"]
+SCORES = ["math score", "reading score", "writing score"]
+
+
+@pytest.fixture(scope="session")
+def students():
+    return read_typed_csv(CSV_PATH)
+
+
+@pytest.fixture
+def tiny():
+    """Eight students; gender and test prep have missing values."""
+    return pd.DataFrame({
+        "gender": pd.Categorical(["female", "male", None, "female", "male", "female", None, "male"]),
+        "test preparation course": pd.Categorical(
+            ["none", "completed", "none", None, "none", "completed", "completed", "none"]
+        ),
+        "lunch": pd.Categorical(["standard"] * 4 + ["free/reduced"] * 4),
+        "math score": np.array([50, 60, 70, 80, 90, 100, 40, 65], dtype=np.uint8),
+        "reading score": np.array([55, 65, 75, 85, 95, 35, 45, 72], dtype=np.uint8),
+        "writing score": np.array([52, 62, 72, 82, 92, 30, 44, 70], dtype=np.uint8),
+    })
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """A data folder holding a copy of the bundled CSV."""
+    (tmp_path / CSV_PATH.name).write_bytes(CSV_PATH.read_bytes())
+    return tmp_path
+
+
+def expected_mask(df, categories, ranges):
+    """The filters in plain pandas: rows missing any filter category never pass."""
+    mask = df[FILTERS].notna().all(axis=1)
+    for col, selected in categories.items():
+        if selected:
+            mask &= df[col].isin(selected)
+    for col, (lo, hi) in ranges.items():
+        mask &= df[col].between(lo, hi)
+    return mask.to_numpy()
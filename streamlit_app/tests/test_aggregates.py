@@ -0,0 +1,75 @@
+# tests/test_aggregates.py
+import numpy as np
+import pytest
+from conftest import FILTERS, SCORES, expected_mask
+
+from core.aggregates import AggregateStore
+from core.cube import KpiCube
+
+QUERIES = [
+    ({}, (0, 100)),
+    ({"gender": ["female"]}, (0, 100)),
+    ({"gender": ["male"], "test preparation course": ["none"]}, (40, 80)),
+    ({"test preparation course": ["completed", "none"]}, (90, 100)),
+    ({"gender": ["nobody"]}, (0, 100)),
+]
+
+
+def build_cube(df, chunks=1):
+    cube = KpiCube(FILTERS, "math score", SCORES)
+    for part in np.array_split(np.arange(len(df)), chunks):
+        cube.update(df.iloc[part])
+    return cube
+
+
+@pytest.mark.parametrize("frame", ["students", "tiny"])
+@pytest.mark.parametrize("categories, score_range", QUERIES)
+def test_cube_matches_pandas(request, frame, categories, score_range):
+    df = request.getfixturevalue(frame)
+    kpis = build_cube(df).query(categories, score_range)
+    rows = df[expected_mask(df, categories, {"math score": score_range})]
+    assert kpis["count"] == len(rows)
+    for score in SCORES:
+        if len(rows):
+            assert kpis["means"][score] == pytest.approx(rows[score].mean())
+        else:
+            assert np.isnan(kpis["means"][score])
+
+
+def test_cube_chunks_and_merge_agree(students):
+    whole = build_cube(students)
+    chunked = build_cube(students, chunks=7)
+    halves = build_cube(students.iloc[:400]).merge(build_cube(students.iloc[400:]))
+    for categories, score_range in QUERIES:
+        expected = whole.query(categories, score_range)
+        for other in (chunked, halves):
+            assert other.query(categories, score_range)["count"] == expected["count"]
+
+
+def test_cube_fractional_bounds_round_inward(students):
+    cube = build_cube(students)
+    assert cube.query({}, (40.5, 80))["count"] == cube.query({}, (41, 80))["count"]
+    assert cube.query({}, (-1, -0.5))["count"] == 0
+
+
+@pytest.mark.parametrize("frame", ["students", "tiny"])
+@pytest.mark.parametrize("stat", ["count", "mean", "std", "min", "max", "median"])
+def test_store_stats_match_groupby(request, frame, stat):
+    df = request.getfixturevalue(frame)
+    store = AggregateStore(FILTERS + ["lunch"], SCORES, pairs=[("gender", "lunch")])
+    for start in range(0, len(df), 300):
+        store.update(df.iloc[start:start + 300])
+    for by in ("gender", "lunch", ("gender", "lunch")):
+        got = store.stat(by, "reading score", stat)
+        expected = df.groupby(list(by) if isinstance(by, tuple) else by, observed=True)["reading score"].agg(stat)
+        assert got.astype(np.float64).to_dict() == pytest.approx(expected.astype(np.float64).to_dict(), nan_ok=True)
+
+
+def test_store_box_stats_match_numpy(students):
+    store = AggregateStore(FILTERS, SCORES)
+    store.update(students)
+    for label, stats in store.group_box_stats("test preparation course", "math score").items():
+        scores = students.loc[students["test preparation course"] == label, "math score"].to_numpy()
+        q1, median, q3 = np.quantile(scores, [0.25, 0.5, 0.75])
+        assert (stats["q1"], stats["median"], stats["q3"]) == pytest.approx((q1, median, q3))
+        assert stats["count"] == len(scores)
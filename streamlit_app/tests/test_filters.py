@@ -0,0 +1,55 @@
+# tests/test_filters.py
+import numpy as np
+import pytest
+from conftest import FILTERS, SCORES, expected_mask
+
+from core.filters import MAX_SEGMENTS, FilterIndex, SegmentedFilterIndex
+from core.ingest import concat_frames
+
+SELECTIONS = [
+    ({}, {}),
+    ({"gender": ["female"]}, {}),
+    ({"gender": ["female", "male"]}, {"math score": (50, 80)}),
+    ({"test preparation course": ["completed"]}, {"reading score": (60, 100), "writing score": (0, 70)}),
+    ({"gender": ["male"], "test preparation course": []}, {"math score": (101, 200)}),
+]
+
+
+@pytest.mark.parametrize("frame", ["students", "tiny"])
+@pytest.mark.parametrize("categories, ranges", SELECTIONS)
+def test_mask_matches_pandas(request, frame, categories, ranges):
+    df = request.getfixturevalue(frame)
+    index = FilterIndex(df, FILTERS, SCORES)
+    mask = index.mask(categories, ranges)
+    np.testing.assert_array_equal(mask, expected_mask(df, categories, ranges))
+    np.testing.assert_array_equal(index.rows(categories, ranges), np.flatnonzero(mask))
+
+
+def test_values_and_ranges(tiny):
+    index = FilterIndex(tiny, FILTERS, SCORES)
+    assert sorted(index.values("gender")) == ["female", "male"]
+    assert index.value_range("math score") == (40, 100)
+
+
+@pytest.mark.parametrize("frame", ["students", "tiny"])
+def test_appended_segments_match_a_fresh_index(request, frame):
+    df = request.getfixturevalue(frame)
+    bounds = np.linspace(0, len(df), MAX_SEGMENTS + 2).astype(int)
+    index = FilterIndex(df.iloc[: bounds[1]], FILTERS, SCORES)
+    for start, stop in zip(bounds[1:-1], bounds[2:]):
+        index = index.appended(df.iloc[start:stop], df.iloc[:stop])
+    # One more append than MAX_SEGMENTS allows folds the segments into a single index.
+    assert isinstance(index, FilterIndex)
+    for categories, ranges in SELECTIONS:
+        np.testing.assert_array_equal(index.mask(categories, ranges), expected_mask(df, categories, ranges))
+
+
+def test_appended_rows_with_new_labels(tiny):
+    head, tail = tiny.iloc[:4], tiny.iloc[4:].copy()
+    tail["gender"] = tail["gender"].cat.rename_categories({"male": "other"})
+    frame = concat_frames([head, tail])
+    index = FilterIndex(head, FILTERS, SCORES).appended(tail, frame)
+    assert isinstance(index, SegmentedFilterIndex)
+    assert set(index.values("gender")) == {"female", "male", "other"}
+    for categories in ({"gender": ["other"]}, {"gender": ["male", "other"]}, {}):
+        np.testing.assert_array_equal(index.mask(categories, {}), expected_mask(frame, categories, {}))
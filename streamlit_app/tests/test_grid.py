@@ -0,0 +1,50 @@
+# tests/test_grid.py
+import numpy as np
+import pytest
+
+from core.grid import GridIndex
+
+X, Y = "math score", "reading score"
+
+
+def grid_rows(df, selection):
+    grid = GridIndex(df[X].to_numpy(), df[Y].to_numpy())
+    return grid.rows(grid.cells_from_selection(selection))
+
+
+@pytest.mark.parametrize("frame", ["students", "tiny"])
+@pytest.mark.parametrize("x_range, y_range", [((40, 80), (50, 90)), ((80, 40), (90, 50)), ((55.5, 70.2), (0, 100))])
+def test_box_matches_pandas(request, frame, x_range, y_range):
+    df = request.getfixturevalue(frame)
+    rows = grid_rows(df, {"box": [{"x": list(x_range), "y": list(y_range)}]})
+    (x0, x1), (y0, y1) = sorted(x_range), sorted(y_range)
+    expected = np.flatnonzero(df[X].between(x0, x1) & df[Y].between(y0, y1))
+    np.testing.assert_array_equal(rows, expected)
+
+
+@pytest.mark.parametrize("frame", ["students", "tiny"])
+def test_lasso_matches_point_in_polygon(request, frame):
+    df = request.getfixturevalue(frame)
+    # A right triangle: x >= 30, y >= 30 and x + y <= 150, points on the hypotenuse excluded.
+    lasso = {"x": [29.5, 29.5, 120.5], "y": [29.5, 120.5, 29.5]}
+    rows = grid_rows(df, {"lasso": [lasso]})
+    x, y = df[X].astype(int), df[Y].astype(int)
+    expected = np.flatnonzero((x >= 30) & (y >= 30) & (x + y < 150))
+    np.testing.assert_array_equal(rows, expected)
+
+
+def test_points_and_union(students):
+    first = students.iloc[0]
+    clicked = {"points": [{"x": float(first[X]) + 0.2, "y": float(first[Y])}, {"x": -5, "y": 10}]}
+    rows = grid_rows(students, clicked)
+    expected = np.flatnonzero((students[X] == first[X]) & (students[Y] == first[Y]))
+    np.testing.assert_array_equal(rows, expected)
+
+    union = {"box": [{"x": [0, 30], "y": [0, 100]}, {"x": [90, 100], "y": [0, 100]}], "points": clicked["points"]}
+    expected = np.flatnonzero(~students[X].between(31, 89))
+    np.testing.assert_array_equal(grid_rows(students, union), expected)
+
+
+def test_empty_selection(tiny):
+    assert len(grid_rows(tiny, {})) == 0
+    assert len(grid_rows(tiny, {"lasso": [{"x": [1, 2], "y": [1, 2]}]})) == 0
@@ -0,0 +1,130 @@
+# tests/test_ingest.py
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import columnar, ingest
+from core.data import CSV_PATH, DTYPES, read_typed_csv
+
+BODY = CSV_PATH.read_bytes().split(b"\n", 1)[1]
+HEADER = CSV_PATH.read_bytes().split(b"\n", 1)[0] + b"\n"
+LINES = BODY.splitlines(keepends=True)
+
+
+def plain(frame):
+    """``frame`` as in-memory numbers and object labels, whatever its categories or storage."""
+    data = {}
+    for col in frame.columns:
+        values = np.array(frame[col])
+        data[col] = values if values.dtype.kind in "iuf" else values.astype(object)
+    return pd.DataFrame(data)
+
+
+def assert_same_rows(frame, expected):
+    pd.testing.assert_frame_equal(plain(frame), plain(expected))
+
+
+def reloaded(csv_path):
+    """Every source of ``csv_path`` parsed from scratch, with plain pandas."""
+    frames = [read_typed_csv(path, DTYPES) for path in ingest.source_paths(csv_path)]
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture
+def csv_path(data_dir):
+    return data_dir / CSV_PATH.name
+
+
+def append(path, data):
+    with open(path, "ab") as fh:
+        fh.write(data)
+
+
+def test_load_builds_the_sidecar(csv_path):
+    frame, states, sidecar = ingest.load(csv_path, DTYPES)
+    assert sidecar is not None and sidecar[0] == columnar.sidecar_dir(csv_path)
+    assert_same_rows(frame, read_typed_csv(CSV_PATH, DTYPES))
+    again, _, _ = ingest.load(csv_path, DTYPES)
+    assert_same_rows(again, frame)
+
+
+@pytest.mark.parametrize("with_sidecar", [True, False])
+def test_refresh_after_append_matches_reload(csv_path, with_sidecar):
+    frame, states, _ = ingest.load(csv_path, DTYPES)
+    if not with_sidecar:
+        shutil.rmtree(columnar.sidecar_dir(csv_path))
+    append(csv_path, b"".join(LINES[:25]))
+    frame, states, rows, _ = ingest.refresh(csv_path, DTYPES, frame, states)
+    assert len(rows) == 25
+    assert_same_rows(frame, reloaded(csv_path))
+    assert ingest.refresh(csv_path, DTYPES, frame, states)[2] is None
+
+
+def test_half_written_line_waits(csv_path):
+    frame, states, _ = ingest.load(csv_path, DTYPES)
+    line = LINES[0]
+    append(csv_path, LINES[1] + line[:10])
+    frame, states, rows, _ = ingest.refresh(csv_path, DTYPES, frame, states)
+    assert len(rows) == 1
+    append(csv_path, line[10:])
+    frame, states, rows, _ = ingest.refresh(csv_path, DTYPES, frame, states)
+    assert len(rows) == 1
+    assert_same_rows(frame, reloaded(csv_path))
+
+
+def test_partitions_in_name_order(csv_path):
+    frame, states, _ = ingest.load(csv_path, DTYPES)
+    folder = ingest.partition_dir(csv_path)
+    folder.mkdir()
+    (folder / "b.csv").write_bytes(HEADER + b"".join(LINES[:10]))
+    frame, states, rows, _ = ingest.refresh(csv_path, DTYPES, frame, states)
+    assert len(rows) == 10
+    # A new partition without a final newline is read whole.
+    (folder / "c.csv").write_bytes(HEADER + b"".join(LINES[10:20]).rstrip(b"\r\n"))
+    frame, states, rows, _ = ingest.refresh(csv_path, DTYPES, frame, states)
+    assert len(rows) == 10
+    assert_same_rows(frame, reloaded(csv_path))
+    # Rows added to b.csv now would have to land before those of c.csv.
+    append(folder / "b.csv", LINES[30])
+    assert ingest.refresh(csv_path, DTYPES, frame, states) is None
+    assert_same_rows(ingest.load(csv_path, DTYPES)[0], reloaded(csv_path))
+
+def test_refresh_needs_a_reload(csv_path):
+    frame, states, _ = ingest.load(csv_path, DTYPES)
+    folder = ingest.partition_dir(csv_path)
+    folder.mkdir()
+    (folder / "b.csv").write_bytes(HEADER + b"".join(LINES[:10]))
+    frame, states, _, _ = ingest.refresh(csv_path, DTYPES, frame, states)
+    # A partition sorting before one already read, or rows added to the CSV.
+    (folder / "a.csv").write_bytes(HEADER + LINES[0])
+    assert ingest.refresh(csv_path, DTYPES, frame, states) is None
+    (folder / "a.csv").unlink()
+    append(csv_path, LINES[0])
+    assert ingest.refresh(csv_path, DTYPES, frame, states) is None
+    # Every reload still gives the sources in order.
+    assert_same_rows(ingest.load(csv_path, DTYPES)[0], reloaded(csv_path))
+
+
+def test_rewritten_file_needs_a_reload(csv_path):
+    frame, states, _ = ingest.load(csv_path, DTYPES)
+    # The last row replaced (inside the tracked tail), then a row appended.
+    data = csv_path.read_bytes()
+    csv_path.write_bytes(data[: len(data) - len(LINES[-1])] + LINES[0] + LINES[1])
+    assert ingest.refresh(csv_path, DTYPES, frame, states) is None
+    frame, _, _ = ingest.load(csv_path, DTYPES)
+    assert_same_rows(frame, reloaded(csv_path))
+
+
+def test_touched_file_reads_nothing(csv_path):
+    frame, states, _ = ingest.load(csv_path, DTYPES)
+    stat = csv_path.stat()
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    refreshed, new_states, rows, sidecar = ingest.refresh(csv_path, DTYPES, frame, states)
+    assert rows is None and sidecar is not None
+    assert new_states[0]["mtime_ns"] == stat.st_mtime_ns + 10**9
+    assert_same_rows(refreshed, frame)
+    # The new state was recorded: the sidecar is used as is from now on.
+    assert ingest.plan(csv_path, columnar.read_manifest(sidecar[0])["sources"]) == []